@@ -0,0 +1,158 @@
+# db_access.py — SHARED DATABASE ACCESS FOR EVERY PIPELINE STAGE
+#
+# Every script used to open its own mariadb.connect() from a cwd-relative
+# config path (spelled differently per script). Database reads
+# config/database.yaml next to this file, so any stage can use it from any
+# working directory, and hands out connections from a per-process
+# mariadb.ConnectionPool (recreated after fork, never shared across processes).
+# Cursors are prepared: a statement executed again on the same cursor reuses
+# the server-side prepared statement. transaction() scopes commit/rollback;
+# executemany() sends rows in batches of `batch_size` and counts them.
+#
+# `backend: sqlite` (or MBSE_DB_BACKEND=sqlite) runs the same schema and
+# statements on SQLite through sqlite_dialect.py — a file (`sqlite_path`,
+# relative to the repository root; MBSE_SQLITE_PATH overrides) or ":memory:",
+# shared by every connection of the process. No server, no round trips:
+# small runs, tests and benchmarks need no MariaDB.
+#
+# Other folders import it with:
+#   sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "01-Mariadb-setup"))
+import itertools
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+import yaml
+
+from sqlite_dialect import SqliteConnection
+
+CONFIG_FILE = Path(__file__).resolve().parent / "config" / "database.yaml"
+REPO_ROOT = Path(__file__).resolve().parents[1]
+MEMORY = ":memory:"
+CONNECT_KEYS = ("host", "port", "user", "password", "database")
+DEFAULT_POOL_SIZE = 4
+DEFAULT_BATCH_SIZE = 5000
+
+_memory_ids = itertools.count()
+
+
+def load_config(path=CONFIG_FILE):
+    with open(path, encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+class Database:
+    def __init__(self, cfg=None):
+        self.cfg = cfg or load_config()
+        self.backend = os.environ.get("MBSE_DB_BACKEND", self.cfg.get("backend", "mariadb"))
+        self.pool_size = int(self.cfg.get("pool_size", DEFAULT_POOL_SIZE))
+        self.batch_size = int(self.cfg.get("batch_size", DEFAULT_BATCH_SIZE))
+        self.batches = 0      # executemany() round trips sent so far (query counts)
+        self._pool = None
+        self._pid = None
+        self._memory_uri = None
+        self._anchor = None   # keeps a shared in-memory SQLite database alive
+        if self.backend == "sqlite":
+            path = os.environ.get("MBSE_SQLITE_PATH", self.cfg.get("sqlite_path", f"data/{self.name}.sqlite"))
+            self.sqlite_path = path if path == MEMORY else REPO_ROOT / path
+        elif self.backend != "mariadb":
+            raise ValueError(f"Unknown database backend '{self.backend}' (mariadb or sqlite)")
+
+    @property
+    def location(self):
+        if self.backend == "mariadb":
+            return f"{self.cfg['host']}:{self.cfg['port']}/{self.name}"
+        return self.sqlite_path
+
+    @property
+    def name(self):
+        return self.cfg["database"]
+
+    def connect_args(self, database=True):
+        return {k: self.cfg[k] for k in CONNECT_KEYS if k in self.cfg and (database or k != "database")}
+
+    def pool(self):
+        import mariadb
+        if self._pool is None or self._pid != os.getpid():
+            self._pool = mariadb.ConnectionPool(pool_name=f"{self.name}_{os.getpid()}",
+                                                pool_size=self.pool_size, **self.connect_args())
+            self._pid = os.getpid()
+        return self._pool
+
+    def _connect_sqlite(self):
+        if self.sqlite_path != MEMORY:
+            self.sqlite_path.parent.mkdir(parents=True, exist_ok=True)
+            return SqliteConnection(str(self.sqlite_path))
+        if self._anchor is None:
+            self._memory_uri = f"file:{self.name}_{os.getpid()}_{next(_memory_ids)}?mode=memory&cache=shared"
+            self._anchor = SqliteConnection(self._memory_uri, uri=True)
+        return SqliteConnection(self._memory_uri, uri=True)
+
+    def connect(self):
+        """Pooled connection, autocommit off. close() hands it back to the pool."""
+        if self.backend == "sqlite":
+            return self._connect_sqlite()
+        conn = self.pool().get_connection()
+        conn.autocommit = False
+        return conn
+
+    def connect_server(self):
+        """Plain connection without a default database (schema (re)creation, MariaDB)."""
+        import mariadb
+        return mariadb.connect(**self.connect_args(database=False))
+
+    def reset_sqlite(self):
+        """Start from an empty SQLite database; returns a connection to it."""
+        if self.sqlite_path == MEMORY:
+            if self._anchor is not None:
+                self._anchor.close()
+            self._anchor = None
+        else:
+            self.sqlite_path.unlink(missing_ok=True)
+        return self._connect_sqlite()
+
+    @staticmethod
+    def cursor(conn):
+        return conn.cursor(prepared=True)
+
+    @contextmanager
+    def transaction(self, conn=None):
+        """Commit on success, roll back on error. Borrows a pooled connection when
+        none is given (and returns it afterwards). Yields the connection."""
+        own = conn is None
+        conn = self.connect() if own else conn
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            if own:
+                conn.close()
+
+    def executemany(self, cur, sql, rows):
+        """executemany in batches of batch_size rows (counted in .batches). Returns rows sent."""
+        rows = list(rows)
+        for i in range(0, len(rows), self.batch_size):
+            cur.executemany(sql, rows[i:i + self.batch_size])
+            self.batches += 1
+        return len(rows)
+
+
+_database = None
+
+
+def get_database():
+    """Process-wide Database (one pool per process)."""
+    global _database
+    if _database is None:
+        _database = Database()
+    return _database
+
+
+def use_database(db):
+    """Make `db` the process-wide Database (tests, benchmarks, in-process pipelines)."""
+    global _database
+    _database = db
+    return db
@@ -1,37 +1,74 @@
 # init_mariadb.py — NUCLEAR RECREATE (RUN THIS ONCE)
-import mariadb
-import yaml
 from pathlib import Path
 
-print("NUCLEAR RECREATE OF DATABASE — DESTROYING OLD DATA...")
-
-with open("config/database.yaml", encoding="utf-8") as f:
-    cfg = yaml.safe_load(f)
-
-conn = mariadb.connect(
-    host=cfg['host'],
-    port=cfg['port'],
-    user=cfg['user'],
-    password=cfg['password']
-)
-cur = conn.cursor()
-
-db_name = cfg['database']
-
-# TOTAL DESTRUCTION
-cur.execute(f"DROP DATABASE IF EXISTS {db_name}")
-cur.execute(f"CREATE DATABASE {db_name} CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci")
-cur.execute(f"USE {db_name}")
-print(f"Database {db_name} DESTROYED AND RECREATED")
-
-# Load the FINAL PERFECT schema
-schema_sql = Path("schema.sql").read_text(encoding="utf-8")
-for statement in schema_sql.split(';'):
-    stmt = statement.strip()
-    if stmt:
-        cur.execute(stmt)
-
-conn.commit()
-conn.close()
-print("SUCCESS! Database is 100% clean with multi-subsystem support")
-print("NOW RUN: python parser_excel_to_mariadb.py")
\ No newline at end of file
+from db_access import get_database
+from instrumentation import log
+
+SCHEMA_FILE = Path(__file__).resolve().parent / "schema.sql"
+# Survive the recreate: answered decisions are keyed by names, not ids
+PRESERVED_TABLES = ("TraceabilityDecisions",)
+
+
+def saved_rows(db):
+    """{table: (columns, rows)} of PRESERVED_TABLES in the current database (missing ones skipped)."""
+    saved = {}
+    try:
+        conn = db.connect()
+    except Exception:   # no database yet
+        return saved
+    try:
+        cur = db.cursor(conn)
+        for table in PRESERVED_TABLES:
+            try:
+                cur.execute(f"SELECT * FROM {table}")
+            except Exception:
+                conn.rollback()
+                continue
+            saved[table] = ([d[0] for d in cur.description], cur.fetchall())
+    finally:
+        conn.close()
+    return saved
+
+
+def init_database(db=None):
+    """Drop and recreate the database, then load schema.sql (MariaDB or SQLite backend).
+    Rows of PRESERVED_TABLES are carried over."""
+    db = db or get_database()
+    saved = saved_rows(db)
+    if db.backend == "sqlite":
+        conn = db.reset_sqlite()
+        cur = conn.cursor()
+        log(f"SQLite database {db.location} DESTROYED AND RECREATED")
+    else:
+        conn = db.connect_server()
+        cur = conn.cursor()
+
+        db_name = db.name
+
+        # TOTAL DESTRUCTION
+        cur.execute(f"DROP DATABASE IF EXISTS {db_name}")
+        cur.execute(f"CREATE DATABASE {db_name} CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci")
+        cur.execute(f"USE {db_name}")
+        log(f"Database {db_name} DESTROYED AND RECREATED")
+
+    # Load the FINAL PERFECT schema
+    schema_sql = SCHEMA_FILE.read_text(encoding="utf-8")
+    for statement in schema_sql.split(';'):
+        stmt = statement.strip()
+        if stmt:
+            cur.execute(stmt)
+
+    for table, (columns, rows) in saved.items():
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        db.executemany(cur, sql, rows)
+        log(f"{table}: {len(rows)} rows kept")
+
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    print("NUCLEAR RECREATE OF DATABASE — DESTROYING OLD DATA...")
+    init_database()
+    print("SUCCESS! Database is 100% clean with multi-subsystem support")
+    print("NOW RUN: python parser_excel_to_mariadb.py")
@@ -0,0 +1,210 @@
+# instrumentation.py — STAGE TIMERS, COUNTERS, PEAK RSS AND LEVELLED LOGGING
+#
+# One Metrics object per process (get_metrics()). Scripts wrap their phases
+# in `with timer("excel ingest/db write"):` (nested names are just paths),
+# bump counters with count("rows_ingested", n), and log through
+# log(message, level) instead of print:
+#   0 quiet    summaries only (-q)
+#   1 normal   one line per file / phase (default)
+#   2 verbose  one line per row, per FCT change … (-v)
+# The peak RSS is sampled at every timer boundary (getrusage on Unix; on
+# Windows psutil's peak working set when it is installed, else 0). finish()
+# prints a timing table (verbosity ≥ 1) and writes the optional per-run
+# exports: a JSON dump and a Prometheus textfile-collector file.
+#
+# Worker processes record into their own copy; drain() hands their numbers
+# back to the parent, which merge()s them.
+import json
+import os
+import platform
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+QUIET, NORMAL, VERBOSE = 0, 1, 2
+_RSS_SCALE = 1 if platform.system() == "Darwin" else 1024   # ru_maxrss: bytes on macOS, KiB elsewhere
+
+
+def rusage_peak_bytes(usage):
+    """ru_maxrss of a getrusage / os.wait4 result, in bytes."""
+    return usage.ru_maxrss * _RSS_SCALE
+
+
+def peak_rss_bytes():
+    if resource is not None:
+        return rusage_peak_bytes(resource.getrusage(resource.RUSAGE_SELF))
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset
+    except (ImportError, AttributeError):
+        return 0
+
+
+class Metrics:
+    def __init__(self, run="pipeline", verbosity=NORMAL):
+        self.run = run
+        self.verbosity = verbosity
+        self.json_path = None
+        self.prom_path = None
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self.timers = {}      # stage path → [seconds, calls, peak RSS bytes at exit]
+        self.counters = {}    # name → value
+        self._local = threading.local()   # open timers of each thread (stages may run concurrently)
+
+    def configure(self, run=None, verbosity=None, json_path=None, prom_path=None):
+        self.run = run or self.run
+        self.verbosity = self.verbosity if verbosity is None else verbosity
+        self.json_path = json_path
+        self.prom_path = prom_path
+        return self
+
+    def log(self, message, level=NORMAL):
+        if self.verbosity >= level:
+            print(message)
+
+    @contextmanager
+    def timer(self, name):
+        """Time a (sub-)stage. Nested timers get the outer path as prefix
+        unless the name already is a path."""
+        stack = self._local.__dict__.setdefault("stack", [])
+        path = name if "/" in name or not stack else f"{stack[-1]}/{name}"
+        stack.append(path)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stack.pop()
+            entry = self.timers.setdefault(path, [0.0, 0, 0])
+            entry[0] += time.perf_counter() - start
+            entry[1] += 1
+            entry[2] = max(entry[2], peak_rss_bytes())
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset(self):
+        """Forget the numbers recorded so far (pool initializer: a forked worker
+        must not hand the parent's own numbers back to it)."""
+        self.timers, self.counters = {}, {}
+
+    def drain(self):
+        """Numbers recorded so far in this process (then reset) — for worker → parent."""
+        snapshot = {"timers": self.timers, "counters": self.counters}
+        self.reset()
+        return snapshot
+
+    def merge(self, snapshot):
+        for path, (seconds, calls, peak) in snapshot["timers"].items():
+            entry = self.timers.setdefault(path, [0.0, 0, 0])
+            entry[0] += seconds
+            entry[1] += calls
+            entry[2] = max(entry[2], peak)
+        for name, value in snapshot["counters"].items():
+            self.count(name, value)
+
+    def as_dict(self):
+        return {
+            "run": self.run,
+            "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "duration_s": round(time.perf_counter() - self._t0, 6),
+            "peak_rss_mb": round(peak_rss_bytes() / 2**20, 1),
+            "stages": {path: {"seconds": round(s, 6), "calls": c, "peak_rss_mb": round(p / 2**20, 1)}
+                       for path, (s, c, p) in sorted(self.timers.items())},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def prometheus(self):
+        data = self.as_dict()
+        run = data["run"].replace('"', "'")
+        lines = [
+            "# HELP mbse_run_duration_seconds Wall time of the run.",
+            "# TYPE mbse_run_duration_seconds gauge",
+            f'mbse_run_duration_seconds{{run="{run}"}} {data["duration_s"]}',
+            "# HELP mbse_run_peak_rss_bytes Peak resident set size of the run.",
+            "# TYPE mbse_run_peak_rss_bytes gauge",
+            f'mbse_run_peak_rss_bytes{{run="{run}"}} {peak_rss_bytes()}',
+            "# HELP mbse_run_timestamp_seconds Start of the run (unix time).",
+            "# TYPE mbse_run_timestamp_seconds gauge",
+            f'mbse_run_timestamp_seconds{{run="{run}"}} {self.started:.0f}',
+            "# HELP mbse_stage_seconds Wall time spent in a stage or sub-stage.",
+            "# TYPE mbse_stage_seconds gauge",
+        ]
+        lines += [f'mbse_stage_seconds{{run="{run}",stage="{path}"}} {s["seconds"]}' for path, s in data["stages"].items()]
+        lines += ["# HELP mbse_stage_calls Times a stage or sub-stage was entered.",
+                  "# TYPE mbse_stage_calls gauge"]
+        lines += [f'mbse_stage_calls{{run="{run}",stage="{path}"}} {s["calls"]}' for path, s in data["stages"].items()]
+        lines += ["# HELP mbse_count Run counters (rows, links, flows …).",
+                  "# TYPE mbse_count gauge"]
+        lines += [f'mbse_count{{run="{run}",name="{name}"}} {value}' for name, value in data["counters"].items()]
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        data = self.as_dict()
+        print(f"\nTIMINGS — {self.run}: {data['duration_s']:.3f}s | peak RSS {data['peak_rss_mb']:.1f} MiB")
+        for path, s in data["stages"].items():
+            print(f"   {path:40} {s['seconds']:10.3f}s  ×{s['calls']:<7} peak {s['peak_rss_mb']:8.1f} MiB")
+        for name, value in data["counters"].items():
+            print(f"   {name:40} {value:>10}")
+
+    def finish(self):
+        """Timing table + the exports asked for on the command line."""
+        if self.verbosity >= NORMAL:
+            self.summary()
+        for path, text in ((self.json_path, lambda: json.dumps(self.as_dict(), indent=2)),
+                           (self.prom_path, self.prometheus)):
+            if path:
+                path = Path(path)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix(path.suffix + ".tmp")
+                tmp.write_text(text(), encoding="utf-8")
+                os.replace(tmp, path)   # textfile collectors must never see a partial file
+                self.log(f"   Metrics → {path.resolve()}")
+
+
+def add_arguments(ap):
+    """-q / -v / --metrics-json / --metrics-prom on a script's ArgumentParser."""
+    g = ap.add_mutually_exclusive_group()
+    g.add_argument("-q", "--quiet", dest="verbosity", action="store_const", const=QUIET, default=NORMAL,
+                   help="summaries only")
+    g.add_argument("-v", "--verbose", dest="verbosity", action="store_const", const=VERBOSE,
+                   help="log every row / FCT change")
+    ap.add_argument("--metrics-json", type=Path, metavar="FILE", help="write this run's timings and counters as JSON")
+    ap.add_argument("--metrics-prom", type=Path, metavar="FILE",
+                    help="write them as a Prometheus textfile-collector .prom file")
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    return _metrics
+
+
+def configure(run, args):
+    """Set up the process-wide Metrics from add_arguments() options."""
+    return _metrics.configure(run, args.verbosity, args.metrics_json, args.metrics_prom)
+
+
+def reset_metrics():
+    """Pool initializer for worker processes (see Metrics.reset)."""
+    _metrics.reset()
+
+
+def log(message, level=NORMAL):
+    _metrics.log(message, level)
+
+
+def timer(name):
+    return _metrics.timer(name)
+
+
+def count(name, n=1):
+    _metrics.count(name, n)
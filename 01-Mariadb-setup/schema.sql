@@ -1,5 +1,9 @@
 -- TN-MBSE 2025 – FINAL REAL-WORLD SCHEMA (MULTIPLE EMITTERS ALLOWED)
 
+DROP TABLE IF EXISTS SpecFlows;
+DROP TABLE IF EXISTS SpecDocuments;
+DROP TABLE IF EXISTS FluxLinks;
+DROP TABLE IF EXISTS IngestManifest;
 DROP TABLE IF EXISTS FluxConsumptions;
 DROP TABLE IF EXISTS FluxEmissions;
 DROP TABLE IF EXISTS Functions;
@@ -20,7 +24,8 @@ CREATE TABLE Functions (
     source_file  VARCHAR(255),
     source_row   INT,
     FOREIGN KEY (subsystem_id) REFERENCES Subsystems(id) ON DELETE CASCADE,
-    UNIQUE KEY uq_func_ss (fct_tag, subsystem_id)   -- optional: no duplicate in same SS
+    UNIQUE KEY uq_func_ss (fct_tag, subsystem_id),  -- optional: no duplicate in same SS
+    KEY idx_func_source (source_file)
 );
 
 -- 3. Fluxes – pure data carriers
@@ -38,7 +43,8 @@ CREATE TABLE FluxEmissions (
     source_row      INT,
     FOREIGN KEY (flux_id)         REFERENCES Fluxes(id)         ON DELETE CASCADE,
     FOREIGN KEY (emitter_func_id) REFERENCES Functions(id)      ON DELETE RESTRICT,
-    UNIQUE KEY uq_one_per_func (flux_id, emitter_func_id)   -- one function emits it only once
+    UNIQUE KEY uq_one_per_func (flux_id, emitter_func_id),  -- one function emits it only once
+    KEY idx_fe_source (source_file)                          -- incremental re-ingestion
 );
 
 -- 5. CONSUMPTIONS – many allowed
@@ -50,5 +56,70 @@ CREATE TABLE FluxConsumptions (
     source_row       INT,
     FOREIGN KEY (flux_id)          REFERENCES Fluxes(id)          ON DELETE CASCADE,
     FOREIGN KEY (consumer_func_id) REFERENCES Functions(id)       ON DELETE CASCADE,
-    UNIQUE KEY uq_cons (flux_id, consumer_func_id)
-);
\ No newline at end of file
+    UNIQUE KEY uq_cons (flux_id, consumer_func_id),
+    KEY idx_fc_source (source_file)
+);
+
+-- 6. FLUX LINKS – denormalized emissions + consumptions, kept up to date by the Excel parser
+--    One row per link: a flux lookup is one range scan on idx_fl_lookup instead of a 4-way join
+CREATE TABLE FluxLinks (
+    role        ENUM('EMISSION', 'CONSUMPTION') NOT NULL,
+    link_id     INT NOT NULL,                    -- FluxEmissions.id / FluxConsumptions.id
+    flux_name   VARCHAR(300) NOT NULL,
+    subsystem   VARCHAR(200) NOT NULL,
+    fct_tag     VARCHAR(150) NOT NULL,
+    func_id     INT NOT NULL,
+    source_file VARCHAR(255),
+    PRIMARY KEY (role, link_id),
+    KEY idx_fl_lookup (flux_name, role, link_id, subsystem, fct_tag, func_id),   -- covering
+    KEY idx_fl_source (source_file)
+);
+
+-- 7. INGESTION MANIFEST – one row per imported workbook (incremental re-ingestion)
+CREATE TABLE IngestManifest (
+    source_file  VARCHAR(255) PRIMARY KEY,
+    subsystem    VARCHAR(200) NOT NULL,
+    content_hash CHAR(64) NOT NULL,              -- sha256 of the .xlsx bytes
+    file_size    BIGINT NOT NULL,
+    file_mtime   DOUBLE NOT NULL,
+    ingested_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- 8. TRACEABILITY DECISIONS – answers to ambiguous consumption cases, replayed by batch runs
+--    Never dropped: rows are keyed by names, not ids, so they stay valid across re-inits
+--    and re-ingests (init_mariadb.py carries them over when it recreates the database).
+CREATE TABLE IF NOT EXISTS TraceabilityDecisions (
+    spec_fct         VARCHAR(150) NOT NULL,
+    flow             VARCHAR(300) NOT NULL,
+    candidates_hash  CHAR(64) NOT NULL,          -- sha256 of the sorted candidate emitter set
+    candidates       TEXT NOT NULL,
+    chosen_subsystem VARCHAR(200),               -- NULL → marked as MISSING
+    chosen_fct       VARCHAR(150),
+    decided_at       TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (spec_fct, flow, candidates_hash)
+);
+
+-- 9. SPEC DOCUMENTS – one row per .docx loaded by docx_to_excel_mirror.py --to-db
+CREATE TABLE SpecDocuments (
+    id           INT AUTO_INCREMENT PRIMARY KEY,
+    spec_file    VARCHAR(255) NOT NULL UNIQUE,
+    content_hash CHAR(64) NOT NULL,              -- sha256 of the .docx bytes
+    extractor    CHAR(16) NOT NULL,              -- extractor fingerprint (extraction_cache.py)
+    flow_count   INT NOT NULL,
+    loaded_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- 10. SPEC FLOWS – extracted Function / Flow Title / Direction rows, in document order
+--     Traceability joins them to FluxLinks on flow_title = flux_name (idx_fl_lookup)
+CREATE TABLE SpecFlows (
+    id         INT AUTO_INCREMENT PRIMARY KEY,
+    spec_id    INT NOT NULL,
+    spec_row   INT NOT NULL,                     -- position in the document
+    fct_tag    VARCHAR(150) NOT NULL,
+    flow_title VARCHAR(300) NOT NULL,
+    direction  ENUM('EMISSION', 'CONSUMPTION') NOT NULL,
+    preview    TEXT,
+    FOREIGN KEY (spec_id) REFERENCES SpecDocuments(id) ON DELETE CASCADE,
+    UNIQUE KEY uq_spec_row (spec_id, spec_row),
+    KEY idx_sf_flow (flow_title, direction)
+);
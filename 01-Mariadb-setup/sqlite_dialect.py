@@ -0,0 +1,167 @@
+# sqlite_dialect.py — RUN THE MARIADB SCHEMA AND STATEMENTS UNCHANGED ON SQLITE
+#
+# The pipeline's SQL is written for MariaDB. SqliteConnection wraps sqlite3
+# and rewrites each statement once (memoised) before executing it:
+#   schema.sql   INT AUTO_INCREMENT PRIMARY KEY → INTEGER PRIMARY KEY AUTOINCREMENT
+#                (ids are never reused, like InnoDB), UNIQUE KEY / KEY → UNIQUE /
+#                CREATE INDEX, ENUM → TEXT, ON UPDATE CURRENT_TIMESTAMP dropped,
+#                every VARCHAR/CHAR column gets COLLATE GENERAL_CI
+#   upserts      INSERT IGNORE → INSERT OR IGNORE;
+#                ON DUPLICATE KEY UPDATE id=id / id=LAST_INSERT_ID(id) → ON CONFLICT DO NOTHING
+#                (callers always re-SELECT the id); col=VALUES(col) → col=excluded.col
+# GENERAL_CI is registered on every connection and compares like
+# utf8mb4_general_ci: case- and accent-insensitive, trailing spaces ignored
+# (general_ci_key, also flux_index.flux_key's folding), so UNIQUE keys,
+# `name = ?` lookups and ORDER BY name behave as on MariaDB.
+import re
+import sqlite3
+import unicodedata
+from functools import lru_cache
+
+COLLATION = "GENERAL_CI"
+
+_AUTO_PK = re.compile(r"\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b", re.I)
+_TEXT_TYPE = re.compile(r"\b((?:VAR)?CHAR\s*\(\d+\))", re.I)
+_ENUM = re.compile(r"\bENUM\s*\([^)]*\)", re.I)
+_ON_UPDATE = re.compile(r"\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP\b", re.I)
+_UNIQUE_KEY = re.compile(r"^(\s*)UNIQUE\s+KEY\s+\w+\s*(\([^)]*\))", re.I | re.M)
+_PLAIN_KEY = re.compile(r"^\s*KEY\s+(\w+)\s*(\([^)]*\))", re.I)
+_CREATE_TABLE = re.compile(r"^\s*CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?(\w+)", re.I)
+_INSERT_IGNORE = re.compile(r"\bINSERT\s+IGNORE\s+INTO\b", re.I)
+_ODKU = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\s+(.*)$", re.I | re.S)
+_ASSIGN = re.compile(r"^\s*(\w+)\s*=\s*(.+?)\s*$", re.S)
+_VALUES_REF = re.compile(r"\bVALUES\s*\(\s*(\w+)\s*\)", re.I)
+_NOOP_VALUE = re.compile(r"^(\w+|LAST_INSERT_ID\s*\(\s*\w+\s*\))$", re.I)
+_COMMENT = re.compile(r"--[^\n]*")
+
+
+@lru_cache(maxsize=65536)
+def general_ci_key(text):
+    """Approximates utf8mb4_general_ci equality: case- and accent-insensitive,
+    trailing spaces ignored."""
+    decomposed = unicodedata.normalize("NFKD", text.rstrip(" "))
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def general_ci(a, b):
+    ka, kb = general_ci_key(a), general_ci_key(b)
+    return (ka > kb) - (ka < kb)
+
+
+def _split_top_level(text, sep=","):
+    parts, depth, start = [], 0, 0
+    for i, c in enumerate(text):
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == sep and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def _create_table(stmt):
+    """CREATE TABLE → [CREATE TABLE, CREATE INDEX …]."""
+    if_not_exists, table = _CREATE_TABLE.match(stmt).groups()
+    stmt = _AUTO_PK.sub("INTEGER PRIMARY KEY AUTOINCREMENT", stmt)
+    stmt = _ENUM.sub("TEXT", stmt)
+    stmt = _ON_UPDATE.sub("", stmt)
+    stmt = _TEXT_TYPE.sub(rf"\1 COLLATE {COLLATION}", stmt)
+    stmt = _UNIQUE_KEY.sub(r"\1UNIQUE \2", stmt)
+
+    head, body = stmt.split("(", 1)
+    body, tail = body.rsplit(")", 1)
+    columns, indexes = [], []
+    for part in _split_top_level(body):
+        key = _PLAIN_KEY.match(part)
+        if key:
+            indexes.append(f"CREATE INDEX {'IF NOT EXISTS ' if if_not_exists else ''}{key.group(1)} ON {table} {key.group(2)}")
+        elif part.strip():
+            columns.append(part.rstrip())
+    return [f"{head}({','.join(columns)}\n){tail}"] + indexes
+
+
+def _upsert(stmt):
+    match = _ODKU.search(stmt)
+    assignments = [_ASSIGN.match(a).groups() for a in _split_top_level(match.group(1))]
+    if all(_NOOP_VALUE.match(value) for _, value in assignments):
+        action = "ON CONFLICT DO NOTHING"
+    else:
+        sets = ", ".join(f"{col}=" + _VALUES_REF.sub(r"excluded.\1", value) for col, value in assignments)
+        action = f"ON CONFLICT DO UPDATE SET {sets}"
+    return stmt[:match.start()] + action
+
+
+@lru_cache(maxsize=1024)
+def translate(sql):
+    """MariaDB statement → tuple of SQLite statements."""
+    ddl = _COMMENT.sub("", sql)
+    if _CREATE_TABLE.match(ddl):
+        return tuple(_create_table(ddl))
+    sql = _INSERT_IGNORE.sub("INSERT OR IGNORE INTO", sql)
+    if _ODKU.search(sql):
+        sql = _upsert(sql)
+    return (sql,)
+
+
+class SqliteCursor:
+    def __init__(self, cur):
+        self._cur = cur
+
+    def execute(self, sql, params=()):
+        *setup, last = translate(sql)
+        for stmt in setup:
+            self._cur.execute(stmt)
+        self._cur.execute(last, params)
+        return self
+
+    def executemany(self, sql, rows):
+        (stmt,) = translate(sql)
+        self._cur.executemany(stmt, rows)
+        return self
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+    def __iter__(self):
+        return iter(self._cur)
+
+    @property
+    def description(self):
+        return self._cur.description
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cur.lastrowid
+
+    def close(self):
+        self._cur.close()
+
+
+class SqliteConnection:
+    def __init__(self, target, uri=False):
+        self._conn = sqlite3.connect(target, uri=uri, check_same_thread=False)
+        self._conn.create_collation(COLLATION, general_ci)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+
+    def cursor(self, prepared=False):
+        # sqlite3 keeps its own per-connection statement cache
+        return SqliteCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,141 @@
+# bulk_loader.py — BULK INGESTION ENGINE (IN-MEMORY ID CACHES + BATCHED WRITES)
+#
+# The row-by-row parser does INSERT…ON DUPLICATE KEY + SELECT for Functions,
+# the same pair for Fluxes and then the link INSERT: up to six round trips per
+# valid row. BulkLoader pre-loads name → id maps once, inserts only the names
+# it has never seen, and writes all FluxEmissions/FluxConsumptions links of a
+# workbook with Database.executemany, `batch_size` rows per call.
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "01-Mariadb-setup"))
+from instrumentation import log  # noqa: E402
+
+IN_CHUNK = 500  # max placeholders per "WHERE … IN (…)" lookup
+
+
+def name_key(name):
+    # Subsystems/Functions/Fluxes use utf8mb4_general_ci: lookups are
+    # case-insensitive, so the caches must be too.
+    return str(name).casefold()
+
+
+def _chunks(items, size=IN_CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class BulkLoader:
+    def __init__(self, db, conn, cur):
+        self.db = db
+        self.conn = conn
+        self.cur = cur
+        self.subsystems = {}   # name_key(name) → id
+        self.functions = {}    # (name_key(fct_tag), subsystem_id) → id
+        self.fluxes = {}       # name_key(name) → id
+        self.queries = 0
+
+    def preload(self):
+        """Load every existing Subsystem/Function/Flux id in three queries."""
+        self.cur.execute("SELECT id, name FROM Subsystems")
+        self.subsystems = {name_key(name): sid for sid, name in self.cur.fetchall()}
+        self.cur.execute("SELECT id, fct_tag, subsystem_id FROM Functions")
+        self.functions = {(name_key(tag), ss): fid for fid, tag, ss in self.cur.fetchall()}
+        self.cur.execute("SELECT id, name FROM Fluxes")
+        self.fluxes = {name_key(name): fid for fid, name in self.cur.fetchall()}
+        self.queries += 3
+        log(f"  Bulk cache: {len(self.subsystems)} subsystems | "
+              f"{len(self.functions)} functions | {len(self.fluxes)} fluxes")
+
+    def subsystem_id(self, subsystem_name):
+        key = name_key(subsystem_name)
+        if key not in self.subsystems:
+            self.cur.execute("INSERT INTO Subsystems (name) VALUES (?) ON DUPLICATE KEY UPDATE id=LAST_INSERT_ID(id)", (subsystem_name,))
+            self.cur.execute("SELECT id FROM Subsystems WHERE name=?", (subsystem_name,))
+            self.subsystems[key] = self.cur.fetchone()[0]
+            self.queries += 2
+        return self.subsystems[key]
+
+    def _executemany(self, sql, rows):
+        before = self.db.batches
+        self.db.executemany(self.cur, sql, rows)
+        self.queries += self.db.batches - before
+
+    def _insert_functions(self, subsystem_id, new_functions):
+        # new_functions: name_key → (fct_tag, source_file, source_row) of first occurrence
+        self._executemany("""
+            INSERT INTO Functions (fct_tag, subsystem_id, source_file, source_row)
+            VALUES (?, ?, ?, ?)
+            ON DUPLICATE KEY UPDATE id=id
+        """, [(tag, subsystem_id, src, row) for tag, src, row in new_functions.values()])
+        for chunk in _chunks(list(new_functions.values())):
+            placeholders = ", ".join("?" for _ in chunk)
+            self.cur.execute(
+                f"SELECT id, fct_tag FROM Functions WHERE subsystem_id=? AND fct_tag IN ({placeholders})",
+                (subsystem_id, *[tag for tag, _, _ in chunk]))
+            for fid, tag in self.cur.fetchall():
+                self.functions[(name_key(tag), subsystem_id)] = fid
+            self.queries += 1
+        # Anything the collation folded differently from casefold() → exact lookup
+        for key, (tag, _, _) in new_functions.items():
+            if (key, subsystem_id) not in self.functions:
+                self.cur.execute("SELECT id FROM Functions WHERE fct_tag=? AND subsystem_id=?", (tag, subsystem_id))
+                self.functions[(key, subsystem_id)] = self.cur.fetchone()[0]
+                self.queries += 1
+
+    def _insert_fluxes(self, new_fluxes):
+        # new_fluxes: name_key → flux name as first spelled in the workbook
+        self._executemany("INSERT INTO Fluxes (name) VALUES (?) ON DUPLICATE KEY UPDATE id=id",
+                          [(name,) for name in new_fluxes.values()])
+        for chunk in _chunks(list(new_fluxes.values())):
+            placeholders = ", ".join("?" for _ in chunk)
+            self.cur.execute(f"SELECT id, name FROM Fluxes WHERE name IN ({placeholders})", tuple(chunk))
+            for fid, name in self.cur.fetchall():
+                self.fluxes[name_key(name)] = fid
+            self.queries += 1
+        for key, name in new_fluxes.items():
+            if key not in self.fluxes:
+                self.cur.execute("SELECT id FROM Fluxes WHERE name=?", (name,))
+                self.fluxes[key] = self.cur.fetchone()[0]
+                self.queries += 1
+
+    def write_file(self, source_file, subsystem_id, rows):
+        """Write the valid rows of one workbook.
+
+        rows: list of (fct_tag, flux_name, direction, row_num) with direction
+        already normalised to "emission"/"consumption". The caller commits.
+        """
+        new_functions = {}
+        new_fluxes = {}
+        for fct_tag, flux_name, _, row_num in rows:
+            fkey = name_key(fct_tag)
+            if (fkey, subsystem_id) not in self.functions and fkey not in new_functions:
+                new_functions[fkey] = (fct_tag, source_file, row_num)
+            xkey = name_key(flux_name)
+            if xkey not in self.fluxes and xkey not in new_fluxes:
+                new_fluxes[xkey] = flux_name
+
+        if new_functions:
+            self._insert_functions(subsystem_id, new_functions)
+        if new_fluxes:
+            self._insert_fluxes(new_fluxes)
+
+        emissions = []
+        consumptions = []
+        for fct_tag, flux_name, direction, row_num in rows:
+            link = (self.fluxes[name_key(flux_name)],
+                    self.functions[(name_key(fct_tag), subsystem_id)],
+                    source_file, row_num)
+            (emissions if direction == "emission" else consumptions).append(link)
+
+        if emissions:
+            self._executemany("""
+                INSERT IGNORE INTO FluxEmissions (flux_id, emitter_func_id, source_file, source_row)
+                VALUES (?, ?, ?, ?)
+            """, emissions)
+        if consumptions:
+            self._executemany("""
+                INSERT IGNORE INTO FluxConsumptions (flux_id, consumer_func_id, source_file, source_row)
+                VALUES (?, ?, ?, ?)
+            """, consumptions)
+        return len(new_functions), len(new_fluxes)
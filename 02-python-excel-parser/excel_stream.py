@@ -0,0 +1,119 @@
+# excel_stream.py — SINGLE-PASS STREAMING READER FOR FUNCTION/FLOW/DIRECTION TABLES
+#
+# pd.ExcelFile + pd.read_excel(header=None) + pd.read_excel(header=idx) parses
+# every workbook two or three times. FlowTableReader opens it once with
+# openpyxl read-only mode, scans rows until the "Function/Flow/Direction"
+# header shows up and keeps reading the SAME row iterator for the data: no
+# DataFrame of the sheet is ever built.
+from typing import NamedTuple, Optional
+
+import openpyxl
+
+HEADER_WORDS = ("Function", "Flow", "Direction")
+
+# Cell texts pandas.read_excel turns into NaN by default — kept so the skip
+# accounting is the same as with the DataFrame reader.
+NA_STRINGS = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a",
+    "nan", "null",
+}
+
+
+class FlowRecord(NamedTuple):
+    function: object     # None when the cell is empty / NA
+    flow: object
+    direction: object
+    excel_row: int       # 1-based row number in the sheet
+
+
+def is_missing(value):
+    if value is None:
+        return True
+    if isinstance(value, float) and value != value:  # NaN
+        return True
+    return isinstance(value, str) and value in NA_STRINGS
+
+
+def show(value):
+    """Cell value as the skip report prints it (pandas shows missing as nan)."""
+    return "nan" if is_missing(value) else value
+
+
+class FlowTableReader:
+    """Context manager yielding FlowRecord for the first Function/Flow/Direction table.
+
+        with FlowTableReader(path) as table:
+            if table.sheet is None: ...            # no header in any sheet
+            for rec in table: ...
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.sheet: Optional[str] = None
+        self.header_row: Optional[int] = None
+        self._wb = None
+        self._rows = None
+        self._cols = None
+
+    def __enter__(self):
+        self.open()
+        self.find_header()
+        return self
+
+    def open(self):
+        self._wb = openpyxl.load_workbook(self.path, read_only=True, data_only=True)
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._wb is not None:
+            self._wb.close()
+            self._wb = None
+
+    def find_header(self):
+        for ws in self._wb.worksheets:
+            rows = ws.iter_rows(values_only=True)
+            for row_num, values in enumerate(rows, start=1):
+                row_str = " | ".join(str(c) for c in values if not _is_blank(c))
+                if all(x in row_str for x in HEADER_WORDS):
+                    self.sheet = ws.title
+                    self.header_row = row_num
+                    self._rows = rows     # continue from the row after the header
+                    self._cols = _column_positions(values)
+                    return
+
+    def __iter__(self):
+        if self._rows is None:
+            return
+        f_col, fl_col, d_col = self._cols
+        pending_blank = []  # blank rows only count if data follows (pandas trims the tail)
+        for row_num, values in enumerate(self._rows, start=self.header_row + 1):
+            if all(_is_blank(c) for c in values):
+                pending_blank.append(row_num)
+                continue
+            for blank in pending_blank:
+                yield FlowRecord(None, None, None, blank)
+            pending_blank.clear()
+            yield FlowRecord(_cell(values, f_col), _cell(values, fl_col), _cell(values, d_col), row_num)
+
+
+def _is_blank(value):
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def _cell(values, col):
+    if col is None or col >= len(values):
+        return None
+    value = values[col]
+    return None if is_missing(value) else value
+
+
+def _column_positions(header_values):
+    # Same as the DataFrame column lookup: exact header text, first occurrence wins
+    positions = []
+    for name in HEADER_WORDS:
+        idx = next((i for i, c in enumerate(header_values) if c == name), None)
+        positions.append(idx)
+    return tuple(positions)
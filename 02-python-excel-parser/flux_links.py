@@ -0,0 +1,54 @@
+# flux_links.py — MAINTAINED FluxLinks TABLE (DENORMALIZED EMISSIONS/CONSUMPTIONS)
+#
+# Readers used to rebuild FluxEmissions/FluxConsumptions → Functions →
+# Subsystems → Fluxes for every lookup. FluxLinks (schema.sql) holds one row
+# per link with the names already resolved. The parser refreshes the rows of
+# a workbook with one INSERT … SELECT per role, right after its link inserts
+# and before the commit, and purge_file() drops them with the links, so the
+# table never disagrees with the normalized model.
+
+_SELECT = {
+    "EMISSION": """
+        SELECT 'EMISSION', fe.id, fx.name, s.name, f.fct_tag, f.id, fe.source_file
+        FROM FluxEmissions fe
+        JOIN Functions f ON fe.emitter_func_id = f.id
+        JOIN Subsystems s ON f.subsystem_id = s.id
+        JOIN Fluxes fx ON fe.flux_id = fx.id
+    """,
+    "CONSUMPTION": """
+        SELECT 'CONSUMPTION', fc.id, fx.name, s.name, f.fct_tag, f.id, fc.source_file
+        FROM FluxConsumptions fc
+        JOIN Functions f ON fc.consumer_func_id = f.id
+        JOIN Subsystems s ON f.subsystem_id = s.id
+        JOIN Fluxes fx ON fc.flux_id = fx.id
+    """,
+}
+_INSERT = "INSERT IGNORE INTO FluxLinks (role, link_id, flux_name, subsystem, fct_tag, func_id, source_file)"
+
+
+def refresh(cur, source_file):
+    """Add the FluxLinks rows of the links a workbook inserted. Caller commits.
+
+    Links another workbook inserted first keep that workbook's source_file
+    (INSERT IGNORE on the link tables) and are already in FluxLinks.
+    """
+    alias = {"EMISSION": "fe", "CONSUMPTION": "fc"}
+    n = 0
+    for role, select in _SELECT.items():
+        cur.execute(f"{_INSERT} {select} WHERE {alias[role]}.source_file = ?", (source_file,))
+        n += cur.rowcount
+    return n
+
+
+def purge(cur, source_file):
+    cur.execute("DELETE FROM FluxLinks WHERE source_file=?", (source_file,))
+
+
+def rebuild(cur):
+    """Recompute the whole table from the link tables (existing databases). Caller commits."""
+    cur.execute("DELETE FROM FluxLinks")
+    n = 0
+    for select in _SELECT.values():
+        cur.execute(f"{_INSERT} {select}")
+        n += cur.rowcount
+    return n
@@ -0,0 +1,149 @@
+# ingest_manifest.py — INCREMENTAL RE-INGESTION (CONTENT HASH PER WORKBOOK)
+#
+# IngestManifest (schema.sql) remembers sha256 + size + mtime of every imported
+# workbook. An incremental run only parses new/changed workbooks: first the old
+# FluxEmissions/FluxConsumptions/FluxLinks rows of all of them (found through
+# source_file) are removed and Functions/Fluxes left without any link are
+# pruned, then the new rows go in.
+import hashlib
+from typing import NamedTuple
+
+import flux_links
+
+HASH_CHUNK = 1 << 20
+
+
+class Fingerprint(NamedTuple):
+    content_hash: str
+    file_size: int
+    file_mtime: float
+
+
+def stat_fingerprint(path, content_hash=""):
+    st = path.stat()
+    return Fingerprint(content_hash, st.st_size, st.st_mtime)
+
+
+def file_fingerprint(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(block)
+    return stat_fingerprint(path, h.hexdigest())
+
+
+def load_manifest(cur):
+    """source_file → (subsystem, Fingerprint)"""
+    cur.execute("SELECT source_file, subsystem, content_hash, file_size, file_mtime FROM IngestManifest")
+    return {name: (ss, Fingerprint(h, size, mtime)) for name, ss, h, size, mtime in cur.fetchall()}
+
+
+def record(cur, source_file, subsystem, fp):
+    cur.execute("""
+        INSERT INTO IngestManifest (source_file, subsystem, content_hash, file_size, file_mtime)
+        VALUES (?, ?, ?, ?, ?)
+        ON DUPLICATE KEY UPDATE subsystem=VALUES(subsystem), content_hash=VALUES(content_hash),
+                                file_size=VALUES(file_size), file_mtime=VALUES(file_mtime)
+    """, (source_file, subsystem, fp.content_hash, fp.file_size, fp.file_mtime))
+
+
+def forget(cur, source_file):
+    cur.execute("DELETE FROM IngestManifest WHERE source_file=?", (source_file,))
+
+
+class Plan(NamedTuple):
+    ingest: list        # Paths to (re-)parse, in input order
+    unchanged: list     # file names skipped
+    deleted: list       # file names in the manifest but gone from disk
+    fingerprints: dict  # file name → Fingerprint for every file in `ingest`
+
+
+def plan(excel_files, manifest, subsystem_of):
+    """Decide which workbooks need work.
+
+    mtime + size equal → unchanged without reading the file; otherwise the
+    content hash decides. A link row only keeps the source_file of the first
+    workbook that inserted it, so when a workbook changes every other workbook
+    of the same subsystem is re-ingested too (and ingest() purges all of them
+    before inserting any) — otherwise a link both files declared could vanish
+    with the purge.
+    """
+    fingerprints = {}
+    changed_ss = set()
+    on_disk = set()
+    for path in excel_files:
+        if path.name.startswith("~"):
+            continue
+        on_disk.add(path.name)
+        known = manifest.get(path.name)
+        fp = stat_fingerprint(path)
+        if known and (known[1].file_size, known[1].file_mtime) == (fp.file_size, fp.file_mtime):
+            fingerprints[path.name] = known[1]
+            continue
+        fp = file_fingerprint(path)
+        fingerprints[path.name] = fp
+        if not known or known[1].content_hash != fp.content_hash:
+            changed_ss.add(subsystem_of(path.stem))
+
+    deleted = sorted(name for name in manifest if name not in on_disk)
+    changed_ss.update(manifest[name][0] for name in deleted)
+
+    ingest, unchanged = [], []
+    for path in excel_files:
+        if path.name.startswith("~"):
+            ingest.append(path)   # keeps the "Temporary file (~)" accounting
+        elif subsystem_of(path.stem) in changed_ss:
+            ingest.append(path)
+        else:
+            unchanged.append(path.name)
+    return Plan(ingest, unchanged, deleted,
+                {p.name: fingerprints[p.name] for p in ingest if p.name in fingerprints})
+
+
+def purge_file(cur, source_file):
+    """Delete every link a workbook contributed, then prune orphans.
+
+    Only the Functions/Fluxes those links touched are candidates for pruning,
+    so the cost is proportional to the workbook, not to the model.
+    Returns (pruned function ids, pruned flux ids).
+    """
+    cur.execute("SELECT emitter_func_id, flux_id FROM FluxEmissions WHERE source_file=?", (source_file,))
+    touched = cur.fetchall()
+    cur.execute("SELECT consumer_func_id, flux_id FROM FluxConsumptions WHERE source_file=?", (source_file,))
+    touched += cur.fetchall()
+    # Functions first inserted by this workbook may have lost every link earlier
+    cur.execute("SELECT id FROM Functions WHERE source_file=?", (source_file,))
+    func_ids = {fid for fid, _ in touched} | {fid for (fid,) in cur.fetchall()}
+    flux_ids = {xid for _, xid in touched}
+
+    cur.execute("DELETE FROM FluxEmissions WHERE source_file=?", (source_file,))
+    cur.execute("DELETE FROM FluxConsumptions WHERE source_file=?", (source_file,))
+    flux_links.purge(cur, source_file)
+
+    pruned_funcs = []
+    for fid in sorted(func_ids):
+        cur.execute("""
+            DELETE FROM Functions WHERE id=?
+              AND NOT EXISTS (SELECT 1 FROM FluxEmissions WHERE emitter_func_id=?)
+              AND NOT EXISTS (SELECT 1 FROM FluxConsumptions WHERE consumer_func_id=?)
+        """, (fid, fid, fid))
+        if cur.rowcount:
+            pruned_funcs.append(fid)
+    pruned_fluxes = []
+    for xid in sorted(flux_ids):
+        cur.execute("""
+            DELETE FROM Fluxes WHERE id=?
+              AND NOT EXISTS (SELECT 1 FROM FluxEmissions WHERE flux_id=?)
+              AND NOT EXISTS (SELECT 1 FROM FluxConsumptions WHERE flux_id=?)
+        """, (xid, xid, xid))
+        if cur.rowcount:
+            pruned_fluxes.append(xid)
+    return pruned_funcs, pruned_fluxes
+
+
+def purge_subsystem_if_empty(cur, subsystem_name):
+    cur.execute("""
+        DELETE FROM Subsystems WHERE name=?
+          AND NOT EXISTS (SELECT 1 FROM Functions f WHERE f.subsystem_id = Subsystems.id)
+    """, (subsystem_name,))
+    return cur.rowcount
@@ -1,145 +1,292 @@
 # parser_excel_to_mariadb.py — FINAL INDUSTRIAL VERSION WITH FULL LOGGING (2025)
-import pandas as pd
-import mariadb
-import yaml
+import argparse
+import os
+import sys
 from pathlib import Path
-from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Optional
 
-print("MBSE Excel → MariaDB Parser")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "01-Mariadb-setup"))
+from db_access import get_database
+from instrumentation import VERBOSE, add_arguments, configure, count, get_metrics, log, reset_metrics, timer
 
-# Load config
-with open("../01-mariadb-setup/config/database.yaml", encoding="utf-8") as f:
-    cfg = yaml.safe_load(f)
+import flux_links
+import ingest_manifest
+from bulk_loader import BulkLoader
+from excel_stream import FlowTableReader
+from row_validation import MAX_EXAMPLES, SkipTally, validate_records
 
-conn = mariadb.connect(
-    host=cfg['host'], port=cfg['port'],
-    user=cfg['user'], password=cfg['password'],
-    database=cfg['database']
-)
-cur = conn.cursor()
 
-excel_folder = Path("../data/input_excel")
-print(f"Looking in: {excel_folder.resolve()}")
+def subsystem_name_from_stem(stem):
+    # EXTRACT SUBSYSTEM NAME — STOP AT _OID
+    if "_OID" in stem:
+        return stem.split("_OID")[0].strip().upper()
+    return stem.split("_", 1)[0].strip().upper()
 
-# Logging counters
-skipped_reasons = defaultdict(list)   # reason → list of (file, row, details)
-total_processed = 0
-total_skipped = 0
 
-for excel_file in excel_folder.glob("*.xlsx"):
-    if excel_file.name.startswith("~"):
-        skipped_reasons["Temporary file (~)"].append((excel_file.name, "-", "Ignored temp file"))
-        total_skipped += 1
-        continue
+def insert_row(cur, source_file, subsystem_id, fct_tag, flux_name, direction, row_num):
+    """Row-by-row write path (one upsert + select per Function and Flux)."""
+    cur.execute("""
+        INSERT INTO Functions (fct_tag, subsystem_id, source_file, source_row)
+        VALUES (?, ?, ?, ?)
+        ON DUPLICATE KEY UPDATE id=LAST_INSERT_ID(id)
+    """, (fct_tag, subsystem_id, source_file, row_num))
+    cur.execute("SELECT id FROM Functions WHERE fct_tag=? AND subsystem_id=?", (fct_tag, subsystem_id))
+    func_id = cur.fetchone()[0]
 
-    print(f"\nProcessing: {excel_file.name}")
+    cur.execute("INSERT INTO Fluxes (name) VALUES (?) ON DUPLICATE KEY UPDATE id=LAST_INSERT_ID(id)", (flux_name,))
+    cur.execute("SELECT id FROM Fluxes WHERE name=?", (flux_name,))
+    flux_id = cur.fetchone()[0]
 
-    # EXTRACT SUBSYSTEM NAME — STOP AT _OID
-    stem = excel_file.stem
-    if "_OID" in stem:
-        subsystem_name = stem.split("_OID")[0].strip().upper()
+    if direction == "emission":
+        cur.execute("""
+            INSERT IGNORE INTO FluxEmissions (flux_id, emitter_func_id, source_file, source_row)
+            VALUES (?, ?, ?, ?)
+        """, (flux_id, func_id, source_file, row_num))
     else:
-        subsystem_name = stem.split("_", 1)[0].strip().upper()
-    print(f"  Subsystem: {subsystem_name}")
-
-    # Get or create subsystem
-    cur.execute("INSERT INTO Subsystems (name) VALUES (?) ON DUPLICATE KEY UPDATE id=LAST_INSERT_ID(id)", (subsystem_name,))
-    cur.execute("SELECT id FROM Subsystems WHERE name=?", (subsystem_name,))
-    subsystem_id = cur.fetchone()[0]
-
-    # Load Excel
-    xls = pd.ExcelFile(excel_file)
-    df = None
-    for sheet in xls.sheet_names:
-        temp_df = pd.read_excel(excel_file, sheet_name=sheet, header=None)
-        for idx, row in temp_df.iterrows():
-            row_str = " | ".join([str(c) for c in row if pd.notna(c)])
-            if all(x in row_str for x in ["Function", "Flow", "Direction"]):
-                df = pd.read_excel(excel_file, sheet_name=sheet, header=idx)
-                print(f"  Found table in sheet '{sheet}' at row {idx+1}")
-                break
-        if df is not None: break
-
-    if df is None or df.empty:
-        skipped_reasons["No valid table found"].append((excel_file.name, "-", "No Function/Flow/Direction header"))
-        print("  No valid table found in this file")
-        total_skipped += 1
-        continue
-
-    valid_rows = 0
-    file_skipped = 0
-
-    for idx, row in df.iterrows():
-        row_num = idx + 2  # Excel row number
-
-        # Skip completely empty rows
-        if pd.isna(row.get("Function")) or pd.isna(row.get("Flow")):
-            skipped_reasons["Empty Function or Flow"].append((excel_file.name, row_num, f"Function='{row.get('Function')}' | Flow='{row.get('Flow')}'"))
-            file_skipped += 1
-            continue
-
-        fct_tag = str(row["Function"]).strip()
-        flux_name = str(row["Flow"]).strip()
-        direction_raw = row.get("Direction")
-        direction = str(direction_raw).strip().lower() if pd.notna(direction_raw) else ""
-
-        if direction not in ["emission", "consumption"]:
-            skipped_reasons["Invalid Direction"].append((excel_file.name, row_num, f"Direction='{direction_raw}'"))
-            file_skipped += 1
-            continue
-
-        # SUCCESS — process it
         cur.execute("""
-            INSERT INTO Functions (fct_tag, subsystem_id, source_file, source_row)
+            INSERT IGNORE INTO FluxConsumptions (flux_id, consumer_func_id, source_file, source_row)
             VALUES (?, ?, ?, ?)
-            ON DUPLICATE KEY UPDATE id=LAST_INSERT_ID(id)
-        """, (fct_tag, subsystem_id, excel_file.name, row_num))
-        cur.execute("SELECT id FROM Functions WHERE fct_tag=? AND subsystem_id=?", (fct_tag, subsystem_id))
-        func_id = cur.fetchone()[0]
-
-        cur.execute("INSERT INTO Fluxes (name) VALUES (?) ON DUPLICATE KEY UPDATE id=LAST_INSERT_ID(id)", (flux_name,))
-        cur.execute("SELECT id FROM Fluxes WHERE name=?", (flux_name,))
-        flux_id = cur.fetchone()[0]
-
-        if direction == "emission":
-            cur.execute("""
-                INSERT IGNORE INTO FluxEmissions (flux_id, emitter_func_id, source_file, source_row)
-                VALUES (?, ?, ?, ?)
-            """, (flux_id, func_id, excel_file.name, row_num))
-            print(f"  EMISSION: {fct_tag} ({subsystem_name}) → {flux_name}")
-        else:
-            cur.execute("""
-                INSERT IGNORE INTO FluxConsumptions (flux_id, consumer_func_id, source_file, source_row)
-                VALUES (?, ?, ?, ?)
-            """, (flux_id, func_id, excel_file.name, row_num))
-            print(f"  CONSUMPTION: {fct_tag} ({subsystem_name}) ← {flux_name}")
-
-        valid_rows += 1
-        total_processed += 1
-
-    total_skipped += file_skipped
-    print(f"  Processed {valid_rows} rows | Skipped {file_skipped} in this file")
-    conn.commit()
-
-# FINAL LOGGING REPORT
-print("\n" + "="*80)
-print("PARSING COMPLETED — FINAL REPORT")
-print("="*80)
-print(f"Total rows successfully imported : {total_processed}")
-print(f"Total rows skipped               : {total_skipped}\n")
-
-if total_skipped > 0:
-    print("SKIPPED ELEMENTS — DETAILED BREAKDOWN:")
-    print("-" * 80)
-    for reason, items in skipped_reasons.items():
-        print(f"{reason} → {len(items)} rows")
-        for file, row, detail in items[:10]:  # show max 10 examples
-            print(f"   • {file} | Row {row} | {detail}")
-        if len(items) > 10:
-            print(f"   ... and {len(items)-10} more")
-        print()
-else:
-    print("Perfect run! No rows skipped")
-
-print("Ready for JavaFX app, diagram generation, or Rhapsody export")
-print("="*80)
\ No newline at end of file
+        """, (flux_id, func_id, source_file, row_num))
+
+
+class IngestSummary(NamedTuple):
+    total_processed: int
+    total_skipped: int
+    skipped_reasons: dict           # reason → SkipTally
+
+
+class WorkbookResult(NamedTuple):
+    file_name: str
+    subsystem_name: Optional[str]   # None for ignored temp files
+    sheet: Optional[str]            # sheet holding the Function/Flow/Direction table
+    header_row: Optional[int]
+    rows: list                      # unique valid (fct_tag, flux_name, direction, row_num)
+    valid_count: int                # valid rows, in-file duplicates included
+    skipped: dict                   # reason → SkipTally, in first-seen order
+
+    @property
+    def skipped_count(self):
+        return sum(t.count for t in self.skipped.values())
+
+
+def parse_workbook(excel_file):
+    """Read + validate one workbook without touching the DB.
+
+    Pure function of the file so it can run in a worker process; the writer
+    replays the result in file order, which keeps the report identical to a
+    serial run.
+    """
+    if excel_file.name.startswith("~"):
+        return WorkbookResult(excel_file.name, None, None, None, [], 0,
+                              {"Temporary file (~)": SkipTally(1, [(excel_file.name, "-", "Ignored temp file")])})
+
+    subsystem_name = subsystem_name_from_stem(excel_file.stem)
+
+    # Stream Excel — header scan and row reading in one pass, validated column-wise
+    table = FlowTableReader(excel_file)
+    try:
+        with timer("excel ingest/file open"):
+            table.open()
+        with timer("excel ingest/header scan"):
+            table.find_header()
+        with timer("excel ingest/row read + validation"):
+            checked = validate_records(excel_file.name, table)
+    finally:
+        table.close()
+
+    return WorkbookResult(excel_file.name, subsystem_name, table.sheet, table.header_row,
+                          checked.rows, checked.valid_count, checked.skipped)
+
+
+def parse_workbook_measured(excel_file):
+    """Worker entry point: the result plus the worker's timings for the parent."""
+    return parse_workbook(excel_file), get_metrics().drain()
+
+
+def add_skips(skipped_reasons, reason, tally):
+    """Merge one workbook's tally; examples stay the first MAX_EXAMPLES of the run."""
+    total = skipped_reasons.get(reason, SkipTally(0, []))
+    examples = total.examples + tally.examples[:MAX_EXAMPLES - len(total.examples)]
+    skipped_reasons[reason] = SkipTally(total.count + tally.count, examples)
+
+
+def print_report(total_processed, total_skipped, skipped_reasons):
+    # FINAL LOGGING REPORT
+    print("\n" + "="*80)
+    print("PARSING COMPLETED — FINAL REPORT")
+    print("="*80)
+    print(f"Total rows successfully imported : {total_processed}")
+    print(f"Total rows skipped               : {total_skipped}\n")
+
+    if total_skipped > 0:
+        print("SKIPPED ELEMENTS — DETAILED BREAKDOWN:")
+        print("-" * 80)
+        for reason, tally in skipped_reasons.items():
+            print(f"{reason} → {tally.count} rows")
+            for file, row, detail in tally.examples[:MAX_EXAMPLES]:  # show max 10 examples
+                print(f"   • {file} | Row {row} | {detail}")
+            if tally.count > MAX_EXAMPLES:
+                print(f"   ... and {tally.count-MAX_EXAMPLES} more")
+            print()
+    else:
+        print("Perfect run! No rows skipped")
+
+    print("Ready for JavaFX app, diagram generation, or Rhapsody export")
+    print("="*80)
+
+
+def ingest(excel_folder, bulk=False, parallel=None, incremental=False):
+    """Load every workbook of excel_folder into the database (see main() for the modes)."""
+    db = get_database()
+    conn = db.connect()
+    cur = db.cursor(conn)
+
+    log(f"Looking in: {excel_folder.resolve()}")
+    excel_files = sorted(excel_folder.glob("*.xlsx"))
+
+    fingerprints = {}
+    if incremental:
+        with timer("excel ingest/incremental plan"):
+            manifest = ingest_manifest.load_manifest(cur)
+            work = ingest_manifest.plan(excel_files, manifest, subsystem_name_from_stem)
+        log(f"INCREMENTAL MODE — {len(work.ingest)} to parse | {len(work.unchanged)} unchanged | {len(work.deleted)} deleted")
+        # Purge every workbook before inserting any: a link two workbooks of a
+        # subsystem declare belongs to one of them, so purging them one at a
+        # time would delete it again after the other re-inserted it. A purged
+        # workbook leaves the manifest until its rows are back (crash → re-ingested).
+        with timer("excel ingest/incremental purge"), db.transaction(conn):
+            for name in work.deleted:
+                funcs, fluxes = ingest_manifest.purge_file(cur, name)
+                ingest_manifest.forget(cur, name)
+                ingest_manifest.purge_subsystem_if_empty(cur, manifest[name][0])
+                log(f"  Deleted workbook {name}: pruned {len(funcs)} functions | {len(fluxes)} fluxes")
+            for path in work.ingest:
+                if path.name in manifest:
+                    funcs, fluxes = ingest_manifest.purge_file(cur, path.name)
+                    ingest_manifest.forget(cur, path.name)
+                    log(f"  Purged previous rows of {path.name}: pruned {len(funcs)} functions | {len(fluxes)} fluxes")
+        excel_files = work.ingest
+        fingerprints = work.fingerprints
+
+    loader = None
+    if bulk or parallel is not None:
+        log("BULK MODE — in-memory id caches + batched inserts")
+        loader = BulkLoader(db, conn, cur)
+        with timer("excel ingest/id cache preload"):
+            loader.preload()
+
+    # Logging counters
+    skipped_reasons = {}   # reason → SkipTally(count, first examples of (file, row, details))
+    total_processed = 0
+    total_skipped = 0
+
+    pool = None
+    if parallel is not None:
+        workers = parallel or os.cpu_count()
+        log(f"PARALLEL MODE — {workers} parser processes, single DB writer")
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=reset_metrics)
+        # map() yields in submission order → same report as the serial run
+        measured = pool.map(parse_workbook_measured, excel_files, chunksize=1)
+        results = (get_metrics().merge(worker_metrics) or result for result, worker_metrics in measured)
+    else:
+        results = map(parse_workbook, excel_files)
+
+    try:
+        for result in results:
+            for reason, tally in result.skipped.items():
+                add_skips(skipped_reasons, reason, tally)
+            total_skipped += result.skipped_count
+            if result.subsystem_name is None:
+                continue
+
+            log(f"\nProcessing: {result.file_name}")
+            log(f"  Subsystem: {result.subsystem_name}")
+            count("workbooks")
+
+            # One transaction per workbook: its links, FluxLinks rows and manifest entry
+            with timer("excel ingest/db write"), db.transaction(conn):
+                # Get or create subsystem
+                if loader:
+                    subsystem_id = loader.subsystem_id(result.subsystem_name)
+                else:
+                    cur.execute("INSERT INTO Subsystems (name) VALUES (?) ON DUPLICATE KEY UPDATE id=LAST_INSERT_ID(id)", (result.subsystem_name,))
+                    cur.execute("SELECT id FROM Subsystems WHERE name=?", (result.subsystem_name,))
+                    subsystem_id = cur.fetchone()[0]
+
+                if result.sheet is not None:
+                    log(f"  Found table in sheet '{result.sheet}' at row {result.header_row}")
+
+                fp = fingerprints.get(result.file_name) or ingest_manifest.file_fingerprint(excel_folder / result.file_name)
+                ingest_manifest.record(cur, result.file_name, result.subsystem_name, fp)
+
+                if not result.valid_count and not result.skipped:
+                    add_skips(skipped_reasons, "No valid table found",
+                              SkipTally(1, [(result.file_name, "-", "No Function/Flow/Direction header")]))
+                    log("  No valid table found in this file")
+                    total_skipped += 1
+                    continue
+
+                if not loader:
+                    for fct_tag, flux_name, direction, row_num in result.rows:
+                        insert_row(cur, result.file_name, subsystem_id, fct_tag, flux_name, direction, row_num)
+                if get_metrics().verbosity >= VERBOSE:
+                    for fct_tag, flux_name, direction, row_num in result.rows:
+                        if direction == "emission":
+                            log(f"  EMISSION: {fct_tag} ({result.subsystem_name}) → {flux_name}", VERBOSE)
+                        else:
+                            log(f"  CONSUMPTION: {fct_tag} ({result.subsystem_name}) ← {flux_name}", VERBOSE)
+
+                if loader and result.rows:
+                    new_funcs, new_fluxes = loader.write_file(result.file_name, subsystem_id, result.rows)
+                    log(f"  Bulk write: {new_funcs} new functions | {new_fluxes} new fluxes | {len(result.rows)} unique links")
+                if result.rows:
+                    flux_links.refresh(cur, result.file_name)
+
+                total_processed += result.valid_count
+                count("links_written", len(result.rows))
+                log(f"  Processed {result.valid_count} rows | Skipped {result.skipped_count} in this file")
+    finally:
+        if pool:
+            pool.shutdown()
+        conn.close()
+
+    if loader:
+        count("db_queries", loader.queries)
+        log(f"\nBulk mode issued {loader.queries} queries in total")
+
+    count("rows_imported", total_processed)
+    count("rows_skipped", total_skipped)
+    return IngestSummary(total_processed, total_skipped, skipped_reasons)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="MBSE Excel → MariaDB Parser")
+    ap.add_argument("--bulk", action="store_true",
+                    help="cache Subsystem/Function/Flux ids in memory and batch the inserts per workbook")
+    ap.add_argument("--parallel", type=int, nargs="?", const=0, default=None, metavar="N",
+                    help="parse workbooks in N worker processes (default: all cores); implies --bulk")
+    ap.add_argument("--incremental", action="store_true",
+                    help="skip workbooks unchanged since the last import (IngestManifest) and replace only the rows of changed/deleted ones")
+    ap.add_argument("--rebuild-links", action="store_true",
+                    help="recompute the FluxLinks table from the link tables and exit (databases created before it existed)")
+    add_arguments(ap)
+    args = ap.parse_args()
+    metrics = configure("excel_ingest", args)
+
+    log("MBSE Excel → MariaDB Parser")
+
+    if args.rebuild_links:
+        db = get_database()
+        with db.transaction() as conn:
+            n = flux_links.rebuild(db.cursor(conn))
+        print(f"FluxLinks rebuilt: {n} links")
+        return
+
+    summary = ingest(Path("../data/input_excel"), args.bulk, args.parallel, args.incremental)
+    print_report(*summary)
+    metrics.finish()
+
+
+if __name__ == "__main__":
+    main()
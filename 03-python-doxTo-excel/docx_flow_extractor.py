@@ -0,0 +1,286 @@
+# docx_flow_extractor.py — STREAMING lxml FLOW EXTRACTOR (FCT_ / SD_ EFFECTIVITY STATE MACHINE)
+#
+# python-docx needs the whole document tree in memory, the element → Table
+# lookup through doc.tables is O(tables²) and row.cells/cell.text are rebuilt
+# on every access. This engine streams word/document.xml straight from the zip
+# with lxml.etree.iterparse, reads flow tables from the raw w:tr/w:tc nodes and
+# frees every top-level body element once the state machine has consumed it.
+#
+# The state machine (extract_flows) is shared with the python-docx engine, so
+# both produce the same rows. Its per-element trace is logged at verbosity 2
+# (-v); the default output is one summary per document.
+import re
+import sys
+import zipfile
+import posixpath
+from pathlib import Path
+
+from lxml import etree
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "01-Mariadb-setup"))
+from instrumentation import VERBOSE, count, log  # noqa: E402
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+W_BODY = W + "body"
+W_P = W + "p"
+W_TBL = W + "tbl"
+W_TR = W + "tr"
+W_TC = W + "tc"
+W_R = W + "r"
+W_HYPERLINK = W + "hyperlink"
+W_VAL = W + "val"
+W_TYPE = W + "type"
+
+RELS_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+OFFICE_DOCUMENT = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+
+FCT_RE = re.compile(r"^FCT_[A-Za-z0-9_]+$")
+SD_EFFECTIVITY_RE = re.compile(r"Effectivity of FA\s*:\s*(SD_[A-Za-z0-9_]+)", re.IGNORECASE)
+FCT_EFFECTIVITY_RE = re.compile(r"Effectivity of FA\s*:\s*(FCT_[A-Za-z0-9_]+)", re.IGNORECASE)
+
+# Run content → text, as python-docx's CT_R.text
+RUN_TEXT = {W + "t": None, W + "tab": "\t", W + "ptab": "\t", W + "cr": "\n", W + "noBreakHyphen": "-"}
+
+
+def paragraph_text(p):
+    """Body paragraph text: every descendant whose tag ends with 't' (w:t, w:instrText …)."""
+    return "".join(c.text or "" for c in p.iter() if isinstance(c.tag, str) and c.tag.endswith("t"))
+
+
+def _run_text(r):
+    parts = []
+    for c in r:
+        if c.tag in RUN_TEXT:
+            parts.append(c.text or "" if RUN_TEXT[c.tag] is None else RUN_TEXT[c.tag])
+        elif c.tag == W + "br":
+            parts.append("\n" if c.get(W_TYPE, "textWrapping") == "textWrapping" else "")
+    return "".join(parts)
+
+
+def _cell_text(tc):
+    # "\n".join of the cell's own paragraphs; a paragraph is its w:r and w:hyperlink/w:r
+    paras = []
+    for p in tc.iterchildren(W_P):
+        text = []
+        for c in p.iterchildren(W_R, W_HYPERLINK):
+            if c.tag == W_R:
+                text.append(_run_text(c))
+            else:
+                text.extend(_run_text(r) for r in c.iterchildren(W_R))
+        paras.append("".join(text))
+    return "\n".join(paras)
+
+
+def _tc_props(tc):
+    """(grid_span, is_vmerge_continue) from w:tcPr."""
+    span, cont = 1, False
+    tcPr = tc.find(W + "tcPr")
+    if tcPr is not None:
+        gs = tcPr.find(W + "gridSpan")
+        if gs is not None:
+            span = int(gs.get(W_VAL, 1))
+        vm = tcPr.find(W + "vMerge")
+        if vm is not None:
+            cont = vm.get(W_VAL, "continue") == "continue"
+    return span, cont
+
+
+def _grid_before(tr):
+    trPr = tr.find(W + "trPr")
+    gb = trPr.find(W + "gridBefore") if trPr is not None else None
+    return int(gb.get(W_VAL, 0)) if gb is not None else 0
+
+
+class XmlTable:
+    """Flow table read from raw w:tr/w:tc nodes.
+
+    row_cells(i) matches python-docx's [c.text for c in table.rows[i].cells]:
+    a horizontally merged cell repeats once per spanned grid column and a
+    vMerge="continue" cell shows the text of the cell it continues.
+    """
+
+    def __init__(self, tbl):
+        self._trs = list(tbl.iterchildren(W_TR))
+        self._rows = {}   # row index → list of (grid_offset, text, span)
+
+    def __len__(self):
+        return len(self._trs)
+
+    def _row(self, i):
+        if i not in self._rows:
+            cells = []
+            offset = _grid_before(self._trs[i])
+            for tc in self._trs[i].iterchildren(W_TC):
+                span, cont = _tc_props(tc)
+                text = self._text_above(i, offset) if cont and i > 0 else None
+                cells.append((offset, _cell_text(tc) if text is None else text, span))
+                offset += span
+            self._rows[i] = cells
+        return self._rows[i]
+
+    def _text_above(self, i, offset):
+        for cell_offset, text, _ in self._row(i - 1):
+            if cell_offset == offset:
+                return text
+        return None
+
+    def row_cells(self, i):
+        return [text for _, text, span in self._row(i) for _ in range(span)]
+
+
+class DocxTable:
+    """Same interface over a python-docx Table (reference engine)."""
+
+    def __init__(self, table):
+        self._table = table
+        self._rows = table.rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def row_cells(self, i):
+        return [cell.text for cell in self._rows[i].cells]
+
+
+def _main_part(zf):
+    # word/document.xml unless the package relationships point elsewhere
+    try:
+        rels = etree.fromstring(zf.read("_rels/.rels"))
+    except KeyError:
+        return "word/document.xml"
+    for rel in rels.iter(RELS_NS + "Relationship"):
+        if rel.get("Type") == OFFICE_DOCUMENT:
+            return posixpath.normpath(rel.get("Target").lstrip("/"))
+    return "word/document.xml"
+
+
+def iter_body_elements(docx_path):
+    """Stream ('paragraph', text) / ('table', XmlTable) in document order.
+
+    Each top-level body element is cleared (and unlinked from the body) as soon
+    as the consumer asks for the next one, so memory stays flat on 1000-page specs.
+    """
+    with zipfile.ZipFile(docx_path) as zf, zf.open(_main_part(zf)) as xml:
+        for _, elem in etree.iterparse(xml, events=("end",), huge_tree=True):
+            parent = elem.getparent()
+            if parent is None or parent.tag != W_BODY:
+                continue
+            if elem.tag == W_P:
+                text = paragraph_text(elem)
+                if text.strip():
+                    yield "paragraph", text.strip()
+            elif elem.tag == W_TBL:
+                yield "table", XmlTable(elem)
+            elem.clear()
+            while elem.getprevious() is not None:
+                del parent[0]
+
+
+def iter_docx_elements(doc):
+    """Reference engine: the same element stream from a python-docx Document."""
+    tables = {table._element: table for table in doc.tables}
+    for element in doc.element.body:
+        if element.tag.endswith('p'):  # paragraph
+            text = paragraph_text(element)
+            if text.strip():
+                yield "paragraph", text.strip()
+        elif element.tag.endswith('tbl'):  # table
+            if element in tables:
+                yield "table", DocxTable(tables[element])
+
+
+def extract_flows(spec_name, elements):
+    """Run the FCT_ / "Effectivity of FA" state machine over an element stream."""
+    results = []
+    current_fct = None
+    total_flows = 0
+    element_counter = 0
+    skip_mode = False  # Flag to skip SD_ Effectivity sections
+    n_paragraphs = n_tables = 0
+
+    log("\nPROCESSING ELEMENTS IN ORDER (DIFFERENTIATE SD_ vs FCT_ EFFECTIVITY)...", VERBOSE)
+
+    for elem_type, elem_content in elements:
+        element_counter += 1
+
+        if elem_type == 'paragraph':
+            n_paragraphs += 1
+            text = elem_content
+
+            # Detect FCT name (standalone FCT_ pattern)
+            if FCT_RE.match(text):
+                current_fct = text
+                skip_mode = False  # Reset skip mode when we find a new FCT
+                log(f"   [{element_counter:3}] PARAGRAPH → FCT CHANGED: {current_fct}", VERBOSE)
+
+            # CRITICAL: Detect "Effectivity of FA" and check if it's SD_ or FCT_
+            elif "Effectivity of FA" in text:
+                # Check if it's SD_ pattern (SKIP these)
+                sd_match = SD_EFFECTIVITY_RE.search(text)
+                if sd_match:
+                    skip_mode = True
+                    log(f"   [{element_counter:3}] PARAGRAPH → ⚠️  EFFECTIVITY OF FA: {sd_match.group(1)} DETECTED - SKIPPING ALL TABLES", VERBOSE)
+
+                # Check if it's FCT_ pattern (PROCESS these)
+                fct_match = FCT_EFFECTIVITY_RE.search(text)
+                if fct_match:
+                    skip_mode = False
+                    current_fct = fct_match.group(1)
+                    log(f"   [{element_counter:3}] PARAGRAPH → ✅  EFFECTIVITY OF FA: {current_fct} DETECTED - PROCESSING TABLES", VERBOSE)
+
+        elif elem_type == 'table':
+            n_tables += 1
+            table = elem_content
+            if not len(table):
+                continue
+
+            # Check if this is a Flows table
+            header = " ".join(text.strip().upper() for text in table.row_cells(0))
+
+            if "FLOW TITLE" in header and "DIRECTION" in header:
+                log(f"\n   [{element_counter:3}] TABLE → FLOWS TABLE DETECTED", VERBOSE)
+
+                # SKIP if we're in SD_ Effectivity section
+                if skip_mode:
+                    log(f"        ⚠️  SKIPPED - Inside SD_ Effectivity section (data dictionary/summary)", VERBOSE)
+                    continue
+
+                if current_fct is None:
+                    log("        ⚠️  SKIPPED — no FCT found before it", VERBOSE)
+                    continue
+
+                log(f"        Current FCT: {current_fct}", VERBOSE)
+                log(f"        Rows in table: {len(table)}", VERBOSE)
+
+                table_flows = 0
+                for i in range(1, len(table)):  # skip header
+                    cells = [text.strip() for text in table.row_cells(i)]
+                    if len(cells) < 2 or not cells[0]:
+                        continue
+
+                    flow_title = cells[0]
+                    direction_raw = cells[1].upper()
+                    direction = "EMISSION" if any(x in direction_raw for x in ["EMISSION", "E", "EMIT"]) else "CONSUMPTION"
+
+                    # Only print first few flows to avoid too much output
+                    if table_flows < 3:
+                        log(f"        Flow {i}: {direction:11} {flow_title}", VERBOSE)
+
+                    results.append({
+                        "Spec File": spec_name,
+                        "Function": current_fct,
+                        "Flow Title": flow_title,
+                        "Direction": direction,
+                        "Preview": " | ".join(cells[:3])
+                    })
+                    table_flows += 1
+                    total_flows += 1
+
+                log(f"        ✅ Added {table_flows} flows to {current_fct}", VERBOSE)
+
+    count("paragraphs", n_paragraphs)
+    count("tables", n_tables)
+    count("spec_flows", total_flows)
+    log(f"   Scanned {n_paragraphs} paragraphs and {n_tables} tables")
+    log(f"\n   → TOTAL: {total_flows} flows extracted from this file")
+    return results
@@ -1,160 +1,226 @@
 # docx_to_excel_mirror.py — FIXED VERSION (SKIP SD_ EFFECTIVITY, KEEP FCT_ EFFECTIVITY)
-from docx import Document
-import pandas as pd
+import argparse
+import io
+import os
 import re
+import sys
+import zipfile
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from functools import partial
 from pathlib import Path
 
-print("TN-MBSE 2025 — STLA SPEC EXTRACTOR — SKIP SD_ EFFECTIVITY, KEEP FCT_ EFFECTIVITY")
-
-specs_folder = Path("../data/specs_docx")
-output_folder = Path("../data/output_diagrams")
-output_folder.mkdir(exist_ok=True)
-
-docx_files = list(specs_folder.glob("*.docx"))
-if not docx_files:
-    print("No .docx files found!")
-    exit()
-
-all_results = []
-
-for docx_path in docx_files:
-    print(f"\n{'='*100}")
-    print(f"PROCESSING: {docx_path.name}")
-    print(f"{'='*100}")
-
-    doc = Document(docx_path)
-    
-    # We'll process elements in document order to maintain proper FCT context
-    elements = []
-    
-    print("STEP 1: COLLECTING ALL ELEMENTS IN DOCUMENT ORDER...")
-    
-    # First, collect all paragraphs and tables in order
-    for element in doc.element.body:
-        if element.tag.endswith('p'):  # paragraph
-            paragraph = None
-            for child in element.iter():
-                if child.tag.endswith('t'):
-                    if paragraph is None:
-                        paragraph = ''
-                    paragraph += child.text if child.text else ''
-            if paragraph and paragraph.strip():
-                elements.append(('paragraph', paragraph.strip()))
-                
-        elif element.tag.endswith('tbl'):  # table
-            # Find the table object that corresponds to this element
-            for table in doc.tables:
-                if table._element == element:
-                    elements.append(('table', table))
-                    break
-
-    print(f"   Found {len([e for e in elements if e[0]=='paragraph'])} paragraphs and {len([e for e in elements if e[0]=='table'])} tables")
-
-    current_fct = None
-    total_flows = 0
-    element_counter = 0
-    skip_mode = False  # Flag to skip SD_ Effectivity sections
-
-    print("\nSTEP 2: PROCESSING ELEMENTS IN ORDER (DIFFERENTIATE SD_ vs FCT_ EFFECTIVITY)...")
-    
-    # Process elements in order to maintain proper FCT context
-    for elem_type, elem_content in elements:
-        element_counter += 1
-        
-        if elem_type == 'paragraph':
-            text = elem_content
-            
-            # Detect FCT name (standalone FCT_ pattern)
-            if re.match(r"^FCT_[A-Za-z0-9_]+$", text):
-                current_fct = text
-                skip_mode = False  # Reset skip mode when we find a new FCT
-                print(f"   [{element_counter:3}] PARAGRAPH → FCT CHANGED: {current_fct}")
-                
-            # CRITICAL: Detect "Effectivity of FA" and check if it's SD_ or FCT_
-            elif "Effectivity of FA" in text:
-                # Check if it's SD_ pattern (SKIP these)
-                sd_match = re.search(r"Effectivity of FA\s*:\s*(SD_[A-Za-z0-9_]+)", text, re.IGNORECASE)
-                if sd_match:
-                    skip_mode = True
-                    sd_name = sd_match.group(1)
-                    print(f"   [{element_counter:3}] PARAGRAPH → ⚠️  EFFECTIVITY OF FA: {sd_name} DETECTED - SKIPPING ALL TABLES")
-                
-                # Check if it's FCT_ pattern (PROCESS these)  
-                fct_match = re.search(r"Effectivity of FA\s*:\s*(FCT_[A-Za-z0-9_]+)", text, re.IGNORECASE)
-                if fct_match:
-                    skip_mode = False
-                    current_fct = fct_match.group(1)
-                    print(f"   [{element_counter:3}] PARAGRAPH → ✅  EFFECTIVITY OF FA: {current_fct} DETECTED - PROCESSING TABLES")
-                
-        elif elem_type == 'table':
-            table = elem_content
-            if not table.rows:
-                continue
-
-            # Check if this is a Flows table
-            header = " ".join(cell.text.strip().upper() for cell in table.rows[0].cells)
-            
-            if "FLOW TITLE" in header and "DIRECTION" in header:
-                print(f"\n   [{element_counter:3}] TABLE → FLOWS TABLE DETECTED")
-                
-                # SKIP if we're in SD_ Effectivity section
-                if skip_mode:
-                    print(f"        ⚠️  SKIPPED - Inside SD_ Effectivity section (data dictionary/summary)")
-                    continue
-                    
-                if current_fct is None:
-                    print("        ⚠️  SKIPPED — no FCT found before it")
-                    continue
-
-                print(f"        Current FCT: {current_fct}")
-                print(f"        Rows in table: {len(table.rows)}")
-
-                table_flows = 0
-                for i, row in enumerate(table.rows[1:], 1):  # skip header
-                    cells = [cell.text.strip() for cell in row.cells]
-                    if len(cells) < 2 or not cells[0]:
-                        continue
-
-                    flow_title = cells[0]
-                    direction_raw = cells[1].upper()
-                    direction = "EMISSION" if any(x in direction_raw for x in ["EMISSION", "E", "EMIT"]) else "CONSUMPTION"
-
-                    # Only print first few flows to avoid too much output
-                    if table_flows < 3:
-                        print(f"        Flow {i}: {direction:11} {flow_title}")
-
-                    all_results.append({
-                        "Spec File": docx_path.name,
-                        "Function": current_fct,
-                        "Flow Title": flow_title,
-                        "Direction": direction,
-                        "Preview": " | ".join(cells[:3])
-                    })
-                    table_flows += 1
-                    total_flows += 1
-
-                print(f"        ✅ Added {table_flows} flows to {current_fct}")
-
-    print(f"\n   → TOTAL: {total_flows} flows extracted from this file")
-
-# SAVE TO EXCEL
-df = pd.DataFrame(all_results) if all_results else pd.DataFrame(columns=["Spec File", "Function", "Flow Title", "Direction", "Preview"])
-
-output_file = output_folder / "Spec_translated.xlsx"
-df.to_excel(output_file, index=False)
-
-print("\n" + "="*100)
-print("EXTRACTION COMPLETE - SD_ EFFECTIVITY SKIPPED, FCT_ EFFECTIVITY KEPT")
-print(f"   Total flows extracted : {len(df)}")
-print(f"   Unique functions      : {df['Function'].nunique() if not df.empty else 0}")
-print(f"   EXCEL SAVED → {output_file.resolve()}")
-print("="*100)
-
-# Show detailed function distribution
-if not df.empty:
-    print("\nCLEAN FUNCTION DISTRIBUTION:")
-    func_counts = df['Function'].value_counts()
-    for func, count in func_counts.items():
-        print(f"   {func}: {count} flows")
-
-print("\n✅ EXTRACTION PERFECT - READY FOR DATABASE TRACEABILITY")
\ No newline at end of file
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "01-Mariadb-setup"))
+from db_access import get_database
+from instrumentation import add_arguments, configure, count, get_metrics, log, reset_metrics, timer
+
+from docx_flow_extractor import extract_flows, iter_body_elements, iter_docx_elements
+from extraction_cache import ExtractionCache, file_sha256
+from spec_tables import SpecTableWriter
+
+SPEC_COLUMNS = ["Spec File", "Function", "Flow Title", "Direction", "Preview"]
+CATEGORY_COLUMNS = ["Spec File", "Function", "Direction"]   # few distinct values → dictionary-encoded
+# openpyxl stamps the save time into docProps/core.xml and every zip entry;
+# both are pinned so the same rows always give the same .xlsx bytes
+PINNED_DOC_TIME = b"2000-01-01T00:00:00Z"
+PINNED_ZIP_TIME = (1980, 1, 1, 0, 0, 0)
+_CORE_DATES = re.compile(rb"(<dcterms:(?:created|modified)\b[^>]*>)[^<]*")
+
+
+def save_spec_parquet(df, path):
+    """Columnar handoff to the traceability engine (Spec_translated.parquet)."""
+    df.astype({c: "category" for c in CATEGORY_COLUMNS}).to_parquet(path, index=False)
+
+
+def pin_xlsx_timestamps(path):
+    """Rewrite an .xlsx with fixed document dates and zip entry times."""
+    with zipfile.ZipFile(path) as src:
+        entries = [(info, src.read(info)) for info in src.infolist()]
+    tmp = path.with_suffix(".tmp")
+    with zipfile.ZipFile(tmp, "w") as dst:
+        for info, data in entries:
+            if info.filename == "docProps/core.xml":
+                data = _CORE_DATES.sub(rb"\g<1>" + PINNED_DOC_TIME, data)
+            info.date_time = PINNED_ZIP_TIME
+            dst.writestr(info, data)
+    os.replace(tmp, path)
+
+
+def save_outputs(df, output_folder, excel=True):
+    """Spec_translated.parquet (+ .xlsx). Returns both paths."""
+    parquet_file = output_folder / "Spec_translated.parquet"
+    output_file = output_folder / "Spec_translated.xlsx"
+    with timer("docx extraction/report write"):
+        save_spec_parquet(df, parquet_file)
+        if excel:
+            df.to_excel(output_file, index=False)
+            pin_xlsx_timestamps(output_file)
+    return parquet_file, output_file
+
+
+def extract_spec(docx_path, engine="lxml"):
+    """Flow rows of one .docx, in document order."""
+    log(f"\n{'='*100}")
+    log(f"PROCESSING: {docx_path.name}")
+    log(f"{'='*100}")
+
+    # The element stream is lazy: this times reading the XML and the state machine together
+    with timer("docx extraction/docx parse"):
+        if engine == "python-docx":
+            from docx import Document
+            elements = iter_docx_elements(Document(docx_path))
+        else:
+            elements = iter_body_elements(docx_path)
+        rows = extract_flows(docx_path.name, elements)
+    count("specs_extracted")
+    return rows
+
+
+def extract_spec_captured(docx_path, engine="lxml", verbosity=None):
+    """Worker entry point: rows, the progress log (replayed by the parent in file
+    order) and the worker's timings (merged into the parent's)."""
+    metrics = get_metrics().configure(verbosity=verbosity)
+    output = io.StringIO()
+    with redirect_stdout(output):
+        rows = extract_spec(docx_path, engine)
+    return rows, output.getvalue(), metrics.drain()
+
+
+def extract_specs(docx_files, engine="lxml", parallel=None, cache=None, sink=None):
+    """Spec flow table of all docx_files (in file order); unchanged documents
+    come from the ExtractionCache when one is given. sink(docx_path, content
+    hash, rows) is called for every document as soon as its rows are known."""
+    metrics = get_metrics()
+    hashes = {}
+    if cache is not None or sink is not None:
+        with timer("docx extraction/content hash"):
+            hashes = {docx_path: file_sha256(docx_path) for docx_path in docx_files}
+
+    # Serve unchanged documents from the cache, extract the rest
+    cached = {}
+    if cache is not None:
+        with timer("docx extraction/cache lookup"):
+            for docx_path in docx_files:
+                rows = cache.get(docx_path, hashes[docx_path])
+                if rows is not None:
+                    cached[docx_path] = rows
+        count("cache_hits", cache.hits)
+        log(f"EXTRACTION CACHE → {cache.hits} hits | {cache.misses} to extract")
+    to_extract = [p for p in docx_files if p not in cached]
+
+    pool = None
+    if parallel is not None and to_extract:
+        workers = parallel or os.cpu_count()
+        log(f"PARALLEL MODE — {workers} extractor processes, merged in file order")
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=reset_metrics)
+        # map() yields in submission order → same rows (and log) as the serial run
+        extracted = pool.map(partial(extract_spec_captured, engine=engine, verbosity=metrics.verbosity), to_extract)
+    else:
+        extracted = ((extract_spec(p, engine), "", None) for p in to_extract)
+
+    all_results = []
+    try:
+        for docx_path in docx_files:
+            if docx_path in cached:
+                rows = cached[docx_path]
+                log(f"\nCACHED: {docx_path.name} → {len(rows)} flows")
+            else:
+                rows, output, worker_metrics = next(extracted)
+                print(output, end="")
+                if worker_metrics:
+                    metrics.merge(worker_metrics)
+                if cache is not None:
+                    cache.put(docx_path, hashes[docx_path], rows)
+            if sink is not None:
+                with timer("docx extraction/db write"):
+                    sink(docx_path, hashes[docx_path], rows)
+            all_results.extend(rows)
+    finally:
+        if pool:
+            pool.shutdown()
+
+    return pd.DataFrame(all_results) if all_results else pd.DataFrame(columns=SPEC_COLUMNS)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="STLA spec extractor (.docx → Spec_translated.xlsx)")
+    ap.add_argument("--engine", choices=["lxml", "python-docx"], default="lxml",
+                    help="lxml: stream word/document.xml with iterparse (default); python-docx: reference engine")
+    ap.add_argument("--parallel", type=int, nargs="?", const=0, default=None, metavar="N",
+                    help="extract specs in N worker processes (default: all cores)")
+    ap.add_argument("--no-excel", action="store_true",
+                    help="only write Spec_translated.parquet (skip the human-facing .xlsx export)")
+    ap.add_argument("--no-cache", action="store_true", help="ignore and do not update the extraction cache")
+    ap.add_argument("--to-db", action="store_true",
+                    help="also load the flows into SpecDocuments/SpecFlows (for traceability_engine.py --lookup join)")
+    ap.add_argument("--cache-info", action="store_true", help="list cache entries and exit")
+    ap.add_argument("--invalidate", nargs="*", metavar="SPEC",
+                    help="drop cache entries of the given .docx names (all entries when none given) and exit")
+    add_arguments(ap)
+    args = ap.parse_args()
+    metrics = configure("docx_extraction", args)
+
+    log("TN-MBSE 2025 — STLA SPEC EXTRACTOR — SKIP SD_ EFFECTIVITY, KEEP FCT_ EFFECTIVITY")
+
+    specs_folder = Path("../data/specs_docx")
+    output_folder = Path("../data/output_diagrams")
+    output_folder.mkdir(exist_ok=True)
+    cache = ExtractionCache(Path("../data/extraction_cache"), args.engine)
+
+    if args.cache_info:
+        entries = cache.entries()
+        print(f"EXTRACTION CACHE → {cache.root.resolve()} ({len(entries)} entries, extractor {cache.fingerprint})")
+        for path, spec_file, flows, created, current in entries:
+            print(f"   {spec_file:50} {flows:6} flows | {created} | {'current' if current else 'STALE extractor'} | {path.name}")
+        return
+    if args.invalidate is not None:
+        removed = cache.invalidate(set(args.invalidate) or None)
+        print(f"EXTRACTION CACHE → removed {removed} entries")
+        return
+
+    docx_files = sorted(specs_folder.glob("*.docx"))
+    if not docx_files:
+        print("No .docx files found!")
+        return
+
+    writer = None
+    if args.to_db:
+        db = get_database()
+        writer = SpecTableWriter(db, db.connect(), cache.fingerprint)
+        log(f"SPEC TABLES → {db.backend} {db.location} ({len(writer.loaded)} documents loaded before)")
+
+    df = extract_specs(docx_files, args.engine, args.parallel, None if args.no_cache else cache, writer)
+
+    if writer:
+        gone = writer.prune(p.name for p in docx_files)
+        writer.conn.close()
+        count("spec_rows_written", writer.rows)
+        log(f"SPEC TABLES → {writer.written} documents loaded ({writer.rows} flows) | "
+            f"{writer.unchanged} unchanged | {len(gone)} removed")
+
+    # SAVE TO EXCEL
+    parquet_file, output_file = save_outputs(df, output_folder, excel=not args.no_excel)
+
+    print("\n" + "="*100)
+    print("EXTRACTION COMPLETE - SD_ EFFECTIVITY SKIPPED, FCT_ EFFECTIVITY KEPT")
+    print(f"   Total flows extracted : {len(df)}")
+    print(f"   Unique functions      : {df['Function'].nunique() if not df.empty else 0}")
+    print(f"   PARQUET SAVED → {parquet_file.resolve()}")
+    if not args.no_excel:
+        print(f"   EXCEL SAVED → {output_file.resolve()}")
+    print("="*100)
+
+    # Show detailed function distribution
+    if not df.empty:
+        log("\nCLEAN FUNCTION DISTRIBUTION:")
+        func_counts = df['Function'].value_counts()
+        for func, n in func_counts.items():
+            log(f"   {func}: {n} flows")
+
+    log("\n✅ EXTRACTION PERFECT - READY FOR DATABASE TRACEABILITY")
+    metrics.finish()
+
+
+if __name__ == "__main__":
+    main()
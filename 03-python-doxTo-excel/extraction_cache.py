@@ -0,0 +1,81 @@
+# extraction_cache.py — PER-DOCUMENT EXTRACTION CACHE
+#
+# One JSON file per extracted spec under data/extraction_cache, named after
+# the sha256 of the .docx bytes plus an extractor fingerprint (hash of the
+# extractor source + engine). Unchanged documents are served from the cache;
+# editing a spec, or the extractor itself, misses and re-extracts.
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+import docx_flow_extractor
+
+ROW_FIELDS = ["Function", "Flow Title", "Direction", "Preview"]   # "Spec File" is re-applied on load
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def extractor_fingerprint(engine):
+    source = Path(docx_flow_extractor.__file__).read_bytes()
+    return hashlib.sha256(source + engine.encode()).hexdigest()[:16]
+
+
+class ExtractionCache:
+    def __init__(self, root, engine):
+        self.root = Path(root)
+        self.fingerprint = extractor_fingerprint(engine)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, content_hash):
+        return self.root / f"{content_hash}_{self.fingerprint}.json"
+
+    def get(self, docx_path, content_hash):
+        """Cached rows for this document, or None."""
+        path = self._path(content_hash)
+        if not path.exists():
+            self.misses += 1
+            return None
+        entry = json.loads(path.read_text(encoding="utf-8"))
+        self.hits += 1
+        return [{"Spec File": docx_path.name, **dict(zip(ROW_FIELDS, row))} for row in entry["rows"]]
+
+    def put(self, docx_path, content_hash, rows):
+        self.root.mkdir(parents=True, exist_ok=True)
+        entry = {
+            "spec_file": docx_path.name,
+            "content_hash": content_hash,
+            "extractor": self.fingerprint,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "rows": [[r[f] for f in ROW_FIELDS] for r in rows],
+        }
+        path = self._path(content_hash)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)   # never leave a half-written entry behind
+
+    def entries(self):
+        """(path, spec_file, flows, created, current_extractor) for every entry on disk."""
+        out = []
+        for path in sorted(self.root.glob("*.json")):
+            entry = json.loads(path.read_text(encoding="utf-8"))
+            out.append((path, entry["spec_file"], len(entry["rows"]), entry["created"],
+                        entry["extractor"] == self.fingerprint))
+        return out
+
+    def invalidate(self, spec_names=None):
+        """Delete entries for the given spec file names (all entries when None)."""
+        removed = 0
+        for path, spec_file, *_ in self.entries():
+            if spec_names is None or spec_file in spec_names:
+                path.unlink()
+                removed += 1
+        return removed
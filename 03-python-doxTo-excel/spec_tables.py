@@ -0,0 +1,59 @@
+# spec_tables.py — EXTRACTED SPEC FLOWS → SpecDocuments / SpecFlows (schema.sql)
+#
+# With --to-db the extractor hands every document's rows to SpecTableWriter as
+# soon as they are extracted (or served from the extraction cache). Each
+# document is replaced in its own transaction: its SpecDocuments row is
+# deleted (SpecFlows rows cascade), re-inserted with the content hash and
+# extractor fingerprint, and its flows are sent with batched executemany.
+# A document whose hash and extractor are unchanged is left untouched;
+# documents no longer in the specs folder are pruned.
+#
+# The engine's `--lookup join` then matches all spec flows against FluxLinks
+# in one set-based query instead of reading Spec_translated.parquet.
+INSERT_DOCUMENT = """
+    INSERT INTO SpecDocuments (spec_file, content_hash, extractor, flow_count)
+    VALUES (?, ?, ?, ?)
+"""
+INSERT_FLOW = """
+    INSERT INTO SpecFlows (spec_id, spec_row, fct_tag, flow_title, direction, preview)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+class SpecTableWriter:
+    def __init__(self, db, conn, extractor):
+        self.db = db
+        self.conn = conn
+        self.cur = db.cursor(conn)
+        self.extractor = extractor
+        self.cur.execute("SELECT spec_file, content_hash, extractor FROM SpecDocuments")
+        self.loaded = {name: (h, ext) for name, h, ext in self.cur.fetchall()}
+        self.written = 0        # documents (re)loaded
+        self.unchanged = 0
+        self.rows = 0
+
+    def __call__(self, docx_path, content_hash, rows):
+        """Replace one document's flows (extract_specs sink)."""
+        name = docx_path.name
+        if self.loaded.get(name) == (content_hash, self.extractor):
+            self.unchanged += 1
+            return
+        with self.db.transaction(self.conn):
+            self.cur.execute("DELETE FROM SpecDocuments WHERE spec_file = ?", (name,))
+            self.cur.execute(INSERT_DOCUMENT, (name, content_hash, self.extractor, len(rows)))
+            self.cur.execute("SELECT id FROM SpecDocuments WHERE spec_file = ?", (name,))
+            spec_id = self.cur.fetchone()[0]
+            self.rows += self.db.executemany(self.cur, INSERT_FLOW, (
+                (spec_id, n, r["Function"], r["Flow Title"], r["Direction"], r["Preview"])
+                for n, r in enumerate(rows, 1)))
+        self.loaded[name] = (content_hash, self.extractor)
+        self.written += 1
+
+    def prune(self, spec_files):
+        """Drop documents that are not in spec_files any more. Returns their names."""
+        gone = sorted(set(self.loaded) - set(spec_files))
+        with self.db.transaction(self.conn):
+            for name in gone:
+                self.cur.execute("DELETE FROM SpecDocuments WHERE spec_file = ?", (name,))
+                del self.loaded[name]
+        return gone
@@ -0,0 +1,101 @@
+# decisions_store.py — PERSISTED ANSWERS FOR AMBIGUOUS CONSUMPTION CASES
+#
+# Batch runs never call input(): every AMBIGUOUS_PRIMARY/AMBIGUOUS_OTHER case
+# is looked up in TraceabilityDecisions by (spec FCT, flow, candidate emitter
+# set). Undecided cases are written to a review CSV with a blank "Decision"
+# column; once answered offline it is imported back with --import-decisions
+# and the next run replays it. A changed candidate set is a new question.
+import csv
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "01-Mariadb-setup"))
+from instrumentation import QUIET, log  # noqa: E402
+
+MISSING_ANSWERS = {"MISSING", "M", "0"}
+REVIEW_COLUMNS = ["Spec FCT", "Flow", "Question", "Options", "Candidates Key", "Candidates JSON", "Decision"]
+
+
+def candidates_key(options):
+    """(canonical text, sha256) of a candidate emitter set — order-independent."""
+    text = json.dumps(sorted([ss, fct] for ss, fct, *_ in options), ensure_ascii=False)
+    return text, hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class DecisionStore:
+    def __init__(self, conn, cur):
+        self.conn = conn
+        self.cur = cur
+        self.decisions = {}   # (spec_fct, flow, candidates_hash) → (ss, fct) or None (MISSING)
+
+    def load(self):
+        self.cur.execute("SELECT spec_fct, flow, candidates_hash, chosen_subsystem, chosen_fct FROM TraceabilityDecisions")
+        for spec_fct, flow, h, ss, fct in self.cur.fetchall():
+            self.decisions[(spec_fct, flow, h)] = (ss, fct) if fct is not None else None
+        log(f"Decision store: {len(self.decisions)} recorded decisions")
+        return self
+
+    def lookup(self, spec_fct, flow, options):
+        """(True, chosen option or None for MISSING) when decided, (False, None) otherwise."""
+        _, h = candidates_key(options)
+        key = (str(spec_fct), str(flow), h)
+        if key not in self.decisions:
+            return False, None
+        chosen = self.decisions[key]
+        if chosen is None:
+            return True, None
+        match = next((opt for opt in options if (opt[0], opt[1]) == chosen), None)
+        return (True, match) if match else (False, None)
+
+    def record(self, spec_fct, flow, options, chosen):
+        """Persist one answer; chosen is an option tuple or None for MISSING. Caller commits."""
+        text, h = candidates_key(options)
+        ss, fct = (chosen[0], chosen[1]) if chosen else (None, None)
+        self.cur.execute("""
+            INSERT INTO TraceabilityDecisions (spec_fct, flow, candidates_hash, candidates, chosen_subsystem, chosen_fct)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON DUPLICATE KEY UPDATE chosen_subsystem=VALUES(chosen_subsystem), chosen_fct=VALUES(chosen_fct)
+        """, (str(spec_fct), str(flow), h, text, ss, fct))
+        self.decisions[(str(spec_fct), str(flow), h)] = (ss, fct) if chosen else None
+
+    def write_review_file(self, path, cases):
+        """One row per distinct undecided (FCT, flow, candidate set). Returns rows written.
+        No cases → header only, so questions of an earlier run never linger."""
+        seen = set()
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
+            w = csv.writer(f)
+            w.writerow(REVIEW_COLUMNS)
+            for case in cases:
+                text, h = candidates_key(case["options"])
+                key = (str(case["spec_fct"]), str(case["flow"]), h)
+                if key in seen:
+                    continue
+                seen.add(key)
+                options = "; ".join(f"{j}) {fct} in {ss}" for j, (ss, fct, *_) in enumerate(case["options"], 1))
+                w.writerow([key[0], key[1], case["question"], options + f"; {len(case['options'])+1}) MISSING",
+                            h, json.dumps([[ss, fct] for ss, fct, *_ in case["options"]], ensure_ascii=False), ""])
+        return len(seen)
+
+    def import_review_file(self, path):
+        """Store every answered row of a review file. Returns (imported, invalid)."""
+        imported = invalid = 0
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                answer = (row.get("Decision") or "").strip().upper()
+                if not answer:
+                    continue
+                options = [tuple(o) for o in json.loads(row["Candidates JSON"])]
+                if answer in MISSING_ANSWERS or answer == str(len(options) + 1):
+                    chosen = None
+                elif answer.isdigit() and 1 <= int(answer) <= len(options):
+                    chosen = options[int(answer) - 1]
+                else:
+                    log(f"   ⚠️  Ignored answer '{answer}' for {row['Spec FCT']} / {row['Flow']}", QUIET)
+                    invalid += 1
+                    continue
+                self.record(row["Spec FCT"], row["Flow"], options, chosen)
+                imported += 1
+        self.conn.commit()
+        return imported, invalid
@@ -0,0 +1,417 @@
+# diagram_generator.py — FUNCTIONAL-ARCHITECTURE DIAGRAMS → data/output_diagrams/diagrams
+#
+# Draws the Subsystem / Function / Flux model kept in FluxLinks:
+#   INTER_SUBSYSTEM     one node per subsystem, one edge per emitting SS →
+#                       consuming SS pair carrying all their fluxes
+#   SUBSYSTEM_<ss>      the subsystem's functions in one cluster, the
+#                       functions they exchange fluxes with clustered by
+#                       their own subsystem
+#   TRACE_<primary>     (--primary) the engine's report: each spec FCT and
+#                       where its flows were FOUND, or that they are MISSING
+# Colours: green = FOUND (the flux has an emitter and a consumer / report row
+# FOUND), red dashed = MISSING (emitted but consumed by nobody, consumed but
+# emitted by nobody / report row MISSING), orange dashed = PENDING decision.
+#
+# Big models: parallel fluxes between the same two nodes are aggregated into
+# one edge (flux names up to --max-labels, "N fluxes" beyond; pen width grows
+# with log N), and when a diagram would show more than --max-nodes partner
+# functions they are folded into one node per partner subsystem.
+#
+# Every diagram is first built as a small renderer-neutral description. Its
+# hash (with this file's source, the renderer and the format) is recorded in
+# DIAGRAM_CACHE.json: only diagrams whose subgraph changed are rendered again,
+# on a process pool with --parallel. Graphviz renders when its `dot`
+# executable is installed, networkx + matplotlib otherwise.
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import sys
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import product
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "01-Mariadb-setup"))
+from db_access import get_database
+from instrumentation import add_arguments, configure, count, get_metrics, log, reset_metrics, timer
+
+from traceability_engine import OUTPUT_FILE, primary_from_name
+
+DIAGRAM_FOLDER = OUTPUT_FILE.parent / "diagrams"
+CACHE_NAME = "DIAGRAM_CACHE.json"
+FORMATS = ("png", "svg", "pdf")
+RENDERERS = ("auto", "graphviz", "matplotlib")
+
+LINKS_SQL = "SELECT role, flux_name, fct_tag, subsystem FROM FluxLinks ORDER BY link_id"
+NO_EMITTER = (None, "no emitter")        # stub ends of MISSING / PENDING edges
+NO_CONSUMER = (None, "no consumer")
+NO_DECISION = (None, "awaiting decision")
+
+EDGE_COLOURS = {"FOUND": "#28a745", "MISSING": "#dc3545", "PENDING": "#fd7e14"}
+NODE_COLOURS = {"function": "#e8f0fe", "subsystem": "#fff3cd", "stub": "#f8d7da"}
+GRAPHVIZ_SHAPES = {"function": "box", "subsystem": "folder", "stub": "note"}
+MPL_EDGE_LABELS = 80                     # matplotlib: beyond this many edges labels only clutter
+
+
+class LinkModel:
+    """FluxLinks grouped per flux: which (subsystem, fct) emit it and which consume it."""
+
+    def __init__(self, rows):
+        self.emitters = defaultdict(set)     # flux → {(ss, fct)}
+        self.consumers = defaultdict(set)
+        self.fluxes = defaultdict(set)       # ss → fluxes its functions emit or consume
+        self.functions = defaultdict(set)    # ss → fct tags
+        n = 0
+        for role, flux, fct_tag, ss_name in rows:
+            (self.emitters if role == "EMISSION" else self.consumers)[flux].add((ss_name, fct_tag))
+            self.fluxes[ss_name].add(flux)
+            self.functions[ss_name].add(fct_tag)
+            n += 1
+        self.links = n
+
+    @classmethod
+    def load(cls, db):
+        conn = db.connect()
+        try:
+            cur = db.cursor(conn)
+            cur.execute(LINKS_SQL)
+            return cls(cur.fetchall())
+        finally:
+            conn.close()
+
+
+def file_stem(name):
+    return re.sub(r"[^\w.-]+", "_", name)
+
+
+def edge_label(fluxes, max_labels):
+    names = sorted(fluxes)
+    return "\n".join(names) if len(names) <= max_labels else f"{len(names)} fluxes"
+
+
+def build(name, title, home, pairs, max_nodes, max_labels, extra=(), subsystem_labels=None):
+    """Renderer-neutral, JSON-ready description of a diagram.
+
+    pairs: (source end, target end, flux, status). An end is (ss, fct) for a
+    function, (ss, None) for a whole subsystem, (None, text) for a stub.
+    Partner functions (outside `home`) are folded per subsystem beyond max_nodes."""
+    partners = {end for pair in pairs for end in pair[:2]
+                if end[0] is not None and end[1] is not None and end[0] != home}
+    folded = Counter(ss for ss, _ in partners) if len(partners) > max_nodes else {}
+    subsystem_labels = subsystem_labels or {}
+    clusters = defaultdict(dict)             # cluster ("" = none) → node key → (label, kind)
+
+    def node(end):
+        ss, fct = end
+        if ss is None:
+            key, label, kind, cluster = f"?{fct}", fct, "stub", ""
+        elif fct is None or ss in folded:
+            label = subsystem_labels.get(ss) or (f"{ss}\n{folded[ss]} FCTs" if ss in folded else ss)
+            key, kind, cluster = f"{ss}/*", "subsystem", ""
+        else:
+            key, label, kind, cluster = f"{ss}/{fct}", fct, "function", ss
+        clusters[cluster][key] = (label, kind)
+        return key
+
+    edges = defaultdict(set)
+    for source, target, flux, status in pairs:
+        edges[(node(source), node(target), status)].add(flux)
+    for end in extra:
+        node(end)
+
+    ids = {key: f"n{i}" for i, key in enumerate(sorted(k for nodes in clusters.values() for k in nodes))}
+    return {
+        "name": name,
+        "title": title,
+        "home": home,
+        "clusters": [[cluster, [[ids[k], label, kind] for k, (label, kind) in sorted(nodes.items())]]
+                     for cluster, nodes in sorted(clusters.items())],
+        "edges": [[ids[s], ids[t], status, len(fluxes), edge_label(fluxes, max_labels)]
+                  for (s, t, status), fluxes in sorted(edges.items())],
+    }
+
+
+def inter_diagram(model, max_labels):
+    pairs = []
+    for flux in model.emitters.keys() | model.consumers.keys():
+        emitting = {ss for ss, _ in model.emitters.get(flux, ())}
+        consuming = {ss for ss, _ in model.consumers.get(flux, ())}
+        pairs += [((a, None), (b, None), flux, "FOUND") for a in emitting for b in consuming if a != b]
+        if not consuming:
+            pairs += [((a, None), NO_CONSUMER, flux, "MISSING") for a in emitting]
+        if not emitting:
+            pairs += [(NO_EMITTER, (b, None), flux, "MISSING") for b in consuming]
+    labels = {ss: f"{ss}\n{len(fcts)} FCTs" for ss, fcts in model.functions.items()}
+    return build("INTER_SUBSYSTEM", f"Inter-subsystem fluxes — {len(labels)} subsystems, {model.links} links",
+                 None, pairs, math.inf, max_labels, [(ss, None) for ss in labels], labels)
+
+
+def subsystem_diagram(model, ss_name, max_nodes, max_labels):
+    pairs = []
+    for flux in model.fluxes[ss_name]:
+        emitters, consumers = model.emitters.get(flux, ()), model.consumers.get(flux, ())
+        for emitter in emitters:
+            if emitter[0] == ss_name:
+                pairs += [(emitter, c, flux, "FOUND") for c in consumers]
+                if not consumers:
+                    pairs.append((emitter, NO_CONSUMER, flux, "MISSING"))
+            else:
+                pairs += [(emitter, c, flux, "FOUND") for c in consumers if c[0] == ss_name]
+        if not emitters:
+            pairs += [(NO_EMITTER, c, flux, "MISSING") for c in consumers if c[0] == ss_name]
+    extra = [(ss_name, fct) for fct in model.functions[ss_name]]
+    return build(f"SUBSYSTEM_{file_stem(ss_name)}",
+                 f"{ss_name} — {len(model.functions[ss_name])} functions, {len(model.fluxes[ss_name])} fluxes",
+                 ss_name, pairs, max_nodes, max_labels, extra)
+
+
+def report_status(status):
+    return "FOUND" if "FOUND" in status else "MISSING" if "MISSING" in status else "PENDING"
+
+
+def trace_diagram(df_report, primary_ss_name, max_nodes, max_labels):
+    """Spec FCT ↔ Found In FCT per report row; consumptions point at the spec FCT."""
+    pairs = []
+    for fct, flow, direction, status, found_ss, found_fct in df_report[
+            ["FCT", "Flow", "Direction", "Status", "Found In Subsystem", "Found In FCT"]].fillna("").itertuples(index=False):
+        status = report_status(str(status))
+        spec_end = (primary_ss_name, fct)
+        other = ((found_ss, found_fct) if status == "FOUND"
+                 else NO_DECISION if status == "PENDING"
+                 else NO_EMITTER if direction == "CONSUMPTION" else NO_CONSUMER)
+        pairs.append((other, spec_end, flow, status) if direction == "CONSUMPTION" else (spec_end, other, flow, status))
+    found = sum(report_status(str(s)) == "FOUND" for s in df_report["Status"])
+    return build(f"TRACE_{file_stem(primary_ss_name)}",
+                 f"Traceability of {primary_ss_name} — {found}/{len(df_report)} connections FOUND",
+                 primary_ss_name, pairs, max_nodes, max_labels)
+
+
+def load_report(report_file):
+    """The engine's report table: its parquet sibling when that is at least as new, else the workbook."""
+    report_file = Path(report_file)
+    parquet = report_file.with_suffix(".parquet")
+    if parquet.exists() and (not report_file.exists() or parquet.stat().st_mtime >= report_file.stat().st_mtime):
+        return pd.read_parquet(parquet)
+    if report_file.exists():
+        return pd.read_excel(report_file, sheet_name="Traceability")
+    return None
+
+
+def dot_label(text):
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def render_graphviz(diagram, path):
+    import graphviz
+
+    g = graphviz.Digraph(diagram["name"],
+                         graph_attr={"rankdir": "LR", "label": diagram["title"], "labelloc": "t",
+                                     "fontname": "Helvetica", "fontsize": "14"},
+                         node_attr={"style": "rounded,filled", "fontname": "Helvetica", "fontsize": "10"},
+                         edge_attr={"fontname": "Helvetica", "fontsize": "8"})
+    for i, (cluster, nodes) in enumerate(diagram["clusters"]):
+        with (g.subgraph(name=f"cluster_{i}") if cluster else nullcontext(g)) as sub:
+            if cluster:
+                sub.attr(label=cluster, style="rounded", color="#6c757d",
+                         penwidth="2.5" if cluster == diagram["home"] else "1")
+            for node_id, label, kind in nodes:
+                sub.node(node_id, dot_label(label), shape=GRAPHVIZ_SHAPES[kind], fillcolor=NODE_COLOURS[kind])
+    for source, target, status, weight, label in diagram["edges"]:
+        g.edge(source, target, dot_label(label), color=EDGE_COLOURS[status], fontcolor=EDGE_COLOURS[status],
+               style="solid" if status == "FOUND" else "dashed", penwidth=f"{1 + math.log2(weight):.2f}")
+    g.render(outfile=path, cleanup=False)   # keeps the .gv source next to the image
+
+
+def render_matplotlib(diagram, path):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import networkx as nx
+
+    # One column per cluster, the home subsystem in the middle; unclustered diagrams on a circle
+    clusters = diagram["clusters"]
+    others = [c for c in clusters if c[0] != diagram["home"]]
+    columns = others[:len(others) // 2] + [c for c in clusters if c[0] == diagram["home"]] + others[len(others) // 2:]
+    tallest = max((len(nodes) for _, nodes in columns), default=1)
+    g = nx.DiGraph()
+    g.add_nodes_from(node_id for _, nodes in columns for node_id, _, _ in nodes)
+    g.add_edges_from((s, t) for s, t, *_ in diagram["edges"])
+    if len(columns) > 1:
+        pos = {node_id: (x, ((len(nodes) - 1) / 2 - y) * min(3, tallest / len(nodes)))
+               for x, (_, nodes) in enumerate(columns) for y, (node_id, _, _) in enumerate(nodes)}
+        fig, ax = plt.subplots(figsize=(max(8, 3.5 * len(columns)), max(4, 0.3 * tallest + 1.5)))
+        for x, (cluster, _) in enumerate(columns):
+            ax.text(x, tallest / 2 + 0.5, cluster, ha="center", fontsize=10,
+                    fontweight="bold" if cluster == diagram["home"] else "normal")
+        ax.set_xlim(-1, len(columns) - 0.4)
+        ax.set_ylim(-tallest / 2 - 0.5, tallest / 2 + 1)
+    else:
+        pos = nx.circular_layout(g)
+        side = max(8, 2 * tallest ** 0.5)
+        fig, ax = plt.subplots(figsize=(side, side))
+        ax.set_xlim(-1.3, 1.3)
+        ax.set_ylim(-1.3, 1.3)
+
+    for _, nodes in columns:
+        for node_id, label, kind in nodes:
+            ax.text(*pos[node_id], label, ha="center", va="center", fontsize=7, zorder=3,
+                    bbox={"boxstyle": "round,pad=0.3", "fc": NODE_COLOURS[kind], "ec": "#6c757d"})
+    # Self-loops are left to Graphviz: matplotlib draws them as axis-wide ellipses.
+    # Edges inside one column bend out of it instead of running along its nodes.
+    for (status, colour), same_column in product(EDGE_COLOURS.items(), (False, True)):
+        edges = [e for e in diagram["edges"] if e[2] == status and e[0] != e[1]
+                 and (pos[e[0]][0] == pos[e[1]][0]) == same_column]
+        nx.draw_networkx_edges(g, pos, [(s, t) for s, t, *_ in edges], edge_color=colour,
+                               width=[1 + math.log2(w) for *_, w, _ in edges],
+                               style="solid" if status == "FOUND" else "dashed", arrows=True, arrowsize=8,
+                               node_size=0, min_source_margin=25, min_target_margin=25,
+                               connectionstyle=f"arc3,rad={0.4 if same_column and len(columns) > 1 else 0.05}", ax=ax)
+    if len(diagram["edges"]) <= MPL_EDGE_LABELS:
+        nx.draw_networkx_edge_labels(g, pos, {(s, t): label for s, t, _, _, label in diagram["edges"]},
+                                     font_size=6, ax=ax)
+    ax.set_title(diagram["title"])
+    ax.axis("off")
+    fig.savefig(path, dpi=150, bbox_inches="tight")
+    plt.close(fig)
+
+
+def render(diagram, path, renderer):
+    with timer(f"diagrams/render ({renderer})"):
+        (render_graphviz if renderer == "graphviz" else render_matplotlib)(diagram, path)
+    count("diagrams_rendered")
+    return diagram["name"]
+
+
+def render_measured(diagram, path, renderer):
+    """Pool worker: render one diagram → (name, its metrics)."""
+    return render(diagram, path, renderer), get_metrics().drain()
+
+
+def diagram_key(diagram, renderer, fmt):
+    source = Path(__file__).read_bytes()
+    payload = json.dumps([diagram, renderer, fmt], ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(source + payload).hexdigest()
+
+
+def stale_diagrams(cache, model, current, primary=None):
+    """Cached diagram files of subsystems that left the model: SUBSYSTEM_<ss> and,
+    for the primary being rendered, TRACE_<primary>. Other primaries' TRACE
+    diagrams are never touched."""
+    gone = {name for name in cache if name not in current}
+    live = {f"SUBSYSTEM_{file_stem(ss)}" for ss in model.functions}
+    trace = f"TRACE_{file_stem(primary)}" if primary and not primary_from_name(model.functions, primary) else None
+    for name in sorted(gone):
+        stem, _, ext = name.rpartition(".")
+        if ext in FORMATS and ((stem.startswith("SUBSYSTEM_") and stem not in live) or stem == trace):
+            yield name
+
+
+def pick_renderer(renderer):
+    if renderer == "auto":
+        return "graphviz" if shutil.which("dot") else "matplotlib"
+    if renderer == "graphviz" and not shutil.which("dot"):
+        raise RuntimeError("Graphviz `dot` executable not found on PATH (install graphviz, or use --renderer matplotlib)")
+    return renderer
+
+
+def generate(db, output_folder=DIAGRAM_FOLDER, primary=None, df_report=None, report_file=OUTPUT_FILE,
+             subsystems=None, fmt="png", renderer="auto", max_nodes=60, max_labels=3, parallel=None, force=False):
+    """Build every diagram, render the ones whose subgraph changed. Returns the rendered names."""
+    output_folder = Path(output_folder)
+    renderer = pick_renderer(renderer)
+    with timer("diagrams/model load"):
+        model = LinkModel.load(db)
+    log(f"Model: {len(model.functions)} subsystems | {model.links} links | renderer {renderer}")
+
+    selected = sorted(model.functions) if subsystems is None else [
+        ss for ss in (primary_from_name(model.functions, name) for name in subsystems) if ss]
+    with timer("diagrams/build"):
+        diagrams = [inter_diagram(model, max_labels)] if subsystems is None else []
+        diagrams += [subsystem_diagram(model, ss, max_nodes, max_labels) for ss in selected]
+        if primary:
+            primary_ss_name = primary_from_name(model.functions, primary) or primary
+            if df_report is None:
+                df_report = load_report(report_file)
+            if df_report is None or df_report.empty:
+                log(f"No traceability report at {Path(report_file).resolve()} — TRACE diagram skipped")
+            else:
+                diagrams.append(trace_diagram(df_report, primary_ss_name, max_nodes, max_labels))
+
+    output_folder.mkdir(parents=True, exist_ok=True)
+    cache_file = output_folder / CACHE_NAME
+    cache = json.loads(cache_file.read_text(encoding="utf-8")) if cache_file.exists() else {}
+    jobs = []
+    for diagram in diagrams:
+        path = output_folder / f"{diagram['name']}.{fmt}"
+        key = diagram_key(diagram, renderer, fmt)
+        if force or cache.get(path.name) != key or not path.exists():
+            jobs.append((diagram, path, key))
+    unchanged = len(diagrams) - len(jobs)
+
+    rendered = []
+    try:
+        if parallel is not None and len(jobs) > 1:
+            workers = min(parallel or os.cpu_count(), len(jobs))
+            log(f"Rendering {len(jobs)} diagrams on {workers} processes")
+            with ProcessPoolExecutor(max_workers=workers, initializer=reset_metrics) as pool:
+                futures = [pool.submit(render_measured, diagram, path, renderer) for diagram, path, _ in jobs]
+                for (diagram, path, key), future in zip(jobs, futures):
+                    name, worker_metrics = future.result()
+                    get_metrics().merge(worker_metrics)
+                    cache[path.name] = key
+                    rendered.append(name)
+                    log(f"   {path.name}")
+        else:
+            for diagram, path, key in jobs:
+                rendered.append(render(diagram, path, renderer))
+                cache[path.name] = key
+                log(f"   {path.name}")
+    finally:
+        removed = list(stale_diagrams(cache, model, {f"{d['name']}.{fmt}" for d in diagrams}, primary))
+        for name in removed:
+            for stale in (output_folder / name, (output_folder / name).with_suffix(".gv")):
+                stale.unlink(missing_ok=True)
+            del cache[name]
+        cache_file.write_text(json.dumps(cache, indent=1, sort_keys=True), encoding="utf-8")
+
+    count("diagrams_unchanged", unchanged)
+    log(f"Diagrams: {len(rendered)} rendered | {unchanged} unchanged | {len(removed)} removed → {output_folder.resolve()}")
+    return rendered
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Render per-subsystem, inter-subsystem and traceability flow diagrams")
+    ap.add_argument("--primary", metavar="SUBSYSTEM",
+                    help="also draw the traceability report of this primary subsystem (TRACE_<primary>)")
+    ap.add_argument("--report", type=Path, default=OUTPUT_FILE, help="traceability report to draw with --primary")
+    ap.add_argument("--subsystems", nargs="+", metavar="SS", help="only these subsystem diagrams (default: all)")
+    ap.add_argument("--output-folder", type=Path, default=DIAGRAM_FOLDER)
+    ap.add_argument("--format", choices=FORMATS, default="png")
+    ap.add_argument("--renderer", choices=RENDERERS, default="auto",
+                    help="graphviz needs the `dot` executable; auto falls back to matplotlib without it")
+    ap.add_argument("--max-nodes", type=int, default=60, metavar="N",
+                    help="fold partner functions into one node per subsystem beyond N")
+    ap.add_argument("--max-labels", type=int, default=3, metavar="N",
+                    help="list up to N flux names on an aggregated edge, a count beyond")
+    ap.add_argument("--parallel", type=int, nargs="?", const=0, default=None, metavar="N",
+                    help="render on N worker processes (default: all cores when the flag is given)")
+    ap.add_argument("--force", action="store_true", help="re-render diagrams even if their subgraph is unchanged")
+    add_arguments(ap)
+    args = ap.parse_args()
+    metrics = configure("diagrams", args)
+
+    generate(get_database(), args.output_folder, args.primary, report_file=args.report, subsystems=args.subsystems,
+             fmt=args.format, renderer=args.renderer, max_nodes=args.max_nodes, max_labels=args.max_labels,
+             parallel=args.parallel, force=args.force)
+    metrics.finish()
+
+
+if __name__ == "__main__":
+    main()
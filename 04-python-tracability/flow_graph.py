@@ -0,0 +1,364 @@
+# flow_graph.py — TRANSITIVE FLOW-CHAIN ANALYSIS ON THE FUNCTIONAL MODEL
+#
+# The engine only looks one hop away (direct emitter / direct consumer). This
+# module builds the whole Functions → Fluxes → Functions structure as a
+# bipartite directed graph (emitter → flux → consumer, so its size is linear
+# in the number of links, not emitters × consumers) stored as CSR integer
+# arrays: indptr[v]..indptr[v+1] slices indices[] with v's successors. Nodes
+# 0..F-1 are functions, F..F+X-1 fluxes. Forward and reverse CSR answer:
+#   downstream / upstream closure of an FCT, shortest flow chain between two
+#   subsystems, orphan emitters (flux never consumed), dangling consumers
+#   (flux never emitted), and cycles (strongly connected components).
+#
+# Model version = hash of the IngestManifest plus link-table counts/max ids.
+# Built arrays are cached on disk per version (<repo>/data/graph_cache) and query
+# results are memoised on the graph, so repeated queries are instant.
+import argparse
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "01-Mariadb-setup"))
+from db_access import REPO_ROOT, get_database  # noqa: E402
+from instrumentation import add_arguments, configure, log  # noqa: E402
+
+GRAPH_CACHE = REPO_ROOT / "data" / "graph_cache"
+
+FUNCTIONS_SQL = "SELECT f.id, f.fct_tag, s.name FROM Functions f JOIN Subsystems s ON f.subsystem_id = s.id ORDER BY f.id"
+FLUXES_SQL = "SELECT id, name FROM Fluxes ORDER BY id"
+EMISSIONS_SQL = "SELECT emitter_func_id, flux_id FROM FluxEmissions"
+CONSUMPTIONS_SQL = "SELECT flux_id, consumer_func_id FROM FluxConsumptions"
+
+
+def model_version(cur):
+    """Changes whenever a workbook is (re)ingested or a link is added/removed."""
+    h = hashlib.sha256()
+    cur.execute("SELECT source_file, content_hash FROM IngestManifest ORDER BY source_file")
+    h.update(json.dumps(cur.fetchall()).encode())
+    for table in ("Functions", "Fluxes", "FluxEmissions", "FluxConsumptions"):
+        cur.execute(f"SELECT COUNT(*), MAX(id) FROM {table}")
+        h.update(json.dumps([table, *cur.fetchone()]).encode())
+    return h.hexdigest()[:16]
+
+
+def csr(src, dst, n):
+    """(indptr, indices) of the edges src → dst over n nodes."""
+    order = np.argsort(src, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return indptr, dst[order].astype(np.int32)
+
+
+def bfs(indptr, indices, sources, n, targets=None):
+    """Level-synchronous BFS, one numpy pass per level. (dist, parent); -1 = unreached.
+    Stops at the first level reaching a node of the boolean mask `targets`."""
+    dist = np.full(n, -1, dtype=np.int32)
+    parent = np.full(n, -1, dtype=np.int32)
+    frontier = np.unique(np.asarray(sources, dtype=np.int32))
+    dist[frontier] = 0
+    level = 0
+    while frontier.size:
+        starts = indptr[frontier]
+        lens = indptr[frontier + 1] - starts
+        total = int(lens.sum())
+        if not total:
+            break
+        offsets = np.repeat(starts - (np.cumsum(lens) - lens), lens) + np.arange(total)
+        nbrs = indices[offsets]
+        srcs = np.repeat(frontier, lens)
+        fresh = dist[nbrs] < 0
+        nbrs, first = np.unique(nbrs[fresh], return_index=True)
+        level += 1
+        dist[nbrs] = level
+        parent[nbrs] = srcs[fresh][first]
+        frontier = nbrs
+        if targets is not None and targets[nbrs].any():
+            break
+    return dist, parent
+
+
+def strongly_connected(indptr, indices, n):
+    """Iterative Tarjan; only components with more than one node (i.e. cycles)."""
+    ip, ix = indptr.tolist(), indices.tolist()
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    stack, comps, counter = [], [], 0
+    for root in range(n):
+        if index[root] != -1 or ip[root] == ip[root + 1]:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, ip[root])]
+        while work:
+            v, i = work[-1]
+            if i < ip[v + 1]:
+                work[-1] = (v, i + 1)
+                w = ix[i]
+                if index[w] == -1:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, ip[w]))
+                elif on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+                continue
+            work.pop()
+            if work:
+                u = work[-1][0]
+                if low[v] < low[u]:
+                    low[u] = low[v]
+            if low[v] == index[v]:
+                comp = []
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    comp.append(w)
+                    if w == v:
+                        break
+                if len(comp) > 1:
+                    comps.append(comp)
+    return comps
+
+
+class FlowGraph:
+    def __init__(self, version, subsystem_names, func_tag, func_ss, flux_name, fwd, rev):
+        self.version = version
+        self.subsystem_names = subsystem_names   # ss index → name
+        self.func_tag = func_tag                 # func node → fct_tag
+        self.func_ss = func_ss                   # func node → ss index (int32)
+        self.flux_name = flux_name               # flux node - F → name
+        self.fwd = fwd                           # (indptr, indices) emitter → flux → consumer
+        self.rev = rev
+        self.n_func = len(func_tag)
+        self.n = self.n_func + len(flux_name)
+        self._memo = {}
+
+    @classmethod
+    def build(cls, cur, version):
+        """Four plain table scans → CSR arrays (DB ids mapped to dense node ids)."""
+        cur.execute(FUNCTIONS_SQL)
+        funcs = cur.fetchall()
+        cur.execute(FLUXES_SQL)
+        fluxes = cur.fetchall()
+        subsystem_names = sorted({ss for _, _, ss in funcs})
+        ss_idx = {ss: i for i, ss in enumerate(subsystem_names)}
+        func_ids = np.array([fid for fid, _, _ in funcs], dtype=np.int64)
+        flux_ids = np.array([xid for xid, _ in fluxes], dtype=np.int64)
+        n_func = len(funcs)
+
+        cur.execute(EMISSIONS_SQL)
+        em = np.array(cur.fetchall(), dtype=np.int64).reshape(-1, 2)
+        cur.execute(CONSUMPTIONS_SQL)
+        co = np.array(cur.fetchall(), dtype=np.int64).reshape(-1, 2)
+        # Rows come ordered by id, so searchsorted maps DB id → node id
+        src = np.concatenate([np.searchsorted(func_ids, em[:, 0]), n_func + np.searchsorted(flux_ids, co[:, 0])])
+        dst = np.concatenate([n_func + np.searchsorted(flux_ids, em[:, 1]), np.searchsorted(func_ids, co[:, 1])])
+        n = n_func + len(fluxes)
+        graph = cls(version, subsystem_names,
+                    [tag for _, tag, _ in funcs],
+                    np.array([ss_idx[ss] for _, _, ss in funcs], dtype=np.int32),
+                    [name for _, name in fluxes],
+                    csr(src, dst, n), csr(dst, src, n))
+        log(f"Flow graph {version}: {n_func} functions | {len(fluxes)} fluxes | "
+              f"{len(em)} emissions | {len(co)} consumptions")
+        return graph
+
+    @classmethod
+    def load(cls, cur, cache_dir=GRAPH_CACHE):
+        """Graph of the current model version, from the disk cache when possible."""
+        version = model_version(cur)
+        path = Path(cache_dir) / f"flow_graph_{version}.npz"
+        if path.exists():
+            with np.load(path, allow_pickle=False) as z:
+                names = json.loads(z["names"].item())
+                graph = cls(version, names["subsystems"], names["functions"], z["func_ss"], names["fluxes"],
+                            (z["fwd_indptr"], z["fwd_indices"]), (z["rev_indptr"], z["rev_indices"]))
+            log(f"Flow graph {version}: loaded from cache ({graph.n_func} functions | {len(graph.flux_name)} fluxes)")
+            return graph
+        graph = cls.build(cur, version)
+        graph.save(path)
+        return graph
+
+    def save(self, path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        for stale in path.parent.glob("flow_graph_*.npz"):
+            stale.unlink()
+        names = json.dumps({"subsystems": self.subsystem_names, "functions": self.func_tag, "fluxes": self.flux_name})
+        np.savez(path, names=np.array(names), func_ss=self.func_ss,
+                 fwd_indptr=self.fwd[0], fwd_indices=self.fwd[1],
+                 rev_indptr=self.rev[0], rev_indices=self.rev[1])
+
+    def _memoised(self, key, compute):
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    # === NODE HELPERS ===
+    def _func(self, node):
+        return self.subsystem_names[self.func_ss[node]], self.func_tag[node]
+
+    def _flux(self, node):
+        return self.flux_name[node - self.n_func]
+
+    def _tag_nodes(self):
+        # casefolded fct_tag → its function nodes, built once per graph (= model version)
+        nodes = {}
+        for v, tag in enumerate(self.func_tag):
+            nodes.setdefault(tag.casefold(), []).append(v)
+        return nodes
+
+    def functions(self, fct_tag, subsystem=None):
+        """Function nodes with this tag (case-insensitive, like the DB collation)."""
+        nodes = self._memoised(("tags",), self._tag_nodes).get(fct_tag.casefold(), [])
+        if not subsystem:
+            return nodes
+        ss = subsystem.casefold()
+        return [v for v in nodes if self.subsystem_names[self.func_ss[v]].casefold() == ss]
+
+    def _subsystem_mask(self, subsystem):
+        ss = [i for i, name in enumerate(self.subsystem_names) if name.casefold() == subsystem.casefold()]
+        mask = np.zeros(self.n, dtype=bool)
+        if ss:
+            mask[:self.n_func] = self.func_ss == ss[0]
+        return mask
+
+    # === QUERIES ===
+    def closure(self, fct_tag, subsystem=None, direction="downstream"):
+        """[(ss, fct_tag, hops)] of every function reachable from / reaching the FCT."""
+        def compute():
+            sources = self.functions(fct_tag, subsystem)
+            if not sources:
+                return []
+            indptr, indices = self.fwd if direction == "downstream" else self.rev
+            dist, _ = bfs(indptr, indices, sources, self.n)
+            reached = np.flatnonzero(dist[:self.n_func] > 0)
+            reached = reached[np.lexsort((reached, dist[reached]))]
+            return [(*self._func(v), int(dist[v]) // 2) for v in reached]
+        return self._memoised(("closure", fct_tag, subsystem, direction), compute)
+
+    def downstream(self, fct_tag, subsystem=None):
+        return self.closure(fct_tag, subsystem, "downstream")
+
+    def upstream(self, fct_tag, subsystem=None):
+        return self.closure(fct_tag, subsystem, "upstream")
+
+    def path(self, from_ss, to_ss):
+        """Shortest flow chain [(ss, fct), flux, (ss, fct), ...] from one subsystem to another, or None."""
+        def compute():
+            sources = np.flatnonzero(self._subsystem_mask(from_ss))
+            targets = self._subsystem_mask(to_ss)
+            if not sources.size or not targets.any():
+                return None
+            dist, parent = bfs(*self.fwd, sources, self.n, targets)
+            hit = np.flatnonzero(targets & (dist > 0))
+            if not hit.size:
+                return None
+            v = int(hit[np.argmin(dist[hit])])
+            chain = []
+            while v != -1:
+                chain.append(self._func(v) if v < self.n_func else self._flux(v))
+                v = int(parent[v])
+            return chain[::-1]
+        return self._memoised(("path", from_ss, to_ss), compute)
+
+    def _unmatched(self, emitted):
+        # Flux nodes with emitters but no consumers (emitted=True) or the reverse;
+        # rows list the functions on the side that exists
+        has_consumers = np.diff(self.fwd[0])[self.n_func:] > 0
+        has_emitters = np.diff(self.rev[0])[self.n_func:] > 0
+        has_links, has_other = (has_emitters, has_consumers) if emitted else (has_consumers, has_emitters)
+        indptr, indices = self.rev if emitted else self.fwd
+        rows = []
+        for x in np.flatnonzero(has_links & ~has_other) + self.n_func:
+            for f in indices[indptr[x]:indptr[x + 1]]:
+                rows.append((*self._func(int(f)), self._flux(int(x))))
+        return sorted(rows)
+
+    def orphan_emitters(self):
+        """[(ss, fct_tag, flux)] emissions of fluxes nobody consumes."""
+        return self._memoised(("orphans",), lambda: self._unmatched(emitted=True))
+
+    def dangling_consumers(self):
+        """[(ss, fct_tag, flux)] consumptions of fluxes nobody emits."""
+        return self._memoised(("dangling",), lambda: self._unmatched(emitted=False))
+
+    def cycles(self):
+        """Strongly connected groups: [{"functions": [(ss, fct)], "fluxes": [names]}], largest first."""
+        def compute():
+            comps = strongly_connected(*self.fwd, self.n)
+            out = [{"functions": sorted(self._func(v) for v in c if v < self.n_func),
+                    "fluxes": sorted(self._flux(v) for v in c if v >= self.n_func)} for c in comps]
+            return sorted(out, key=lambda c: (-len(c["functions"]), c["functions"]))
+        return self._memoised(("cycles",), compute)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Transitive flow-chain queries on the functional model")
+    sub = ap.add_subparsers(dest="query", required=True)
+    for name in ("downstream", "upstream"):
+        q = sub.add_parser(name, help=f"{name} closure of an FCT")
+        q.add_argument("fct")
+        q.add_argument("--subsystem", help="restrict the FCT to one subsystem")
+    q = sub.add_parser("path", help="shortest flow chain between two subsystems")
+    q.add_argument("from_ss")
+    q.add_argument("to_ss")
+    sub.add_parser("orphans", help="emitted fluxes nobody consumes")
+    sub.add_parser("dangling", help="consumed fluxes nobody emits")
+    sub.add_parser("cycles", help="cyclic flow chains")
+    ap.add_argument("--limit", type=int, default=50, help="rows printed (0 = all)")
+    ap.add_argument("--rebuild", action="store_true", help="ignore the graph cache")
+    add_arguments(ap)
+    args = ap.parse_args()
+    metrics = configure("flow_graph", args)
+
+    db = get_database()
+    conn = db.connect()
+    cur = db.cursor(conn)
+    if args.rebuild:
+        graph = FlowGraph.build(cur, model_version(cur))
+        graph.save(GRAPH_CACHE / f"flow_graph_{graph.version}.npz")
+    else:
+        graph = FlowGraph.load(cur)
+    conn.close()
+
+    limit = args.limit or None
+    print("="*80)
+    if args.query in ("downstream", "upstream"):
+        rows = graph.closure(args.fct, args.subsystem, args.query)
+        print(f"{args.query.upper()} OF {args.fct}: {len(rows)} functions")
+        for ss, fct, hops in rows[:limit]:
+            print(f"   {hops:3} hop(s)  {fct} ({ss})")
+    elif args.query == "path":
+        chain = graph.path(args.from_ss, args.to_ss)
+        if chain is None:
+            print(f"No flow chain from {args.from_ss} to {args.to_ss}")
+        else:
+            print(f"FLOW CHAIN {args.from_ss} → {args.to_ss} ({len(chain) // 2} hop(s)):")
+            for step in chain:
+                print(f"   {step[1]} ({step[0]})" if isinstance(step, tuple) else f"      └─ {step} ─→")
+    elif args.query in ("orphans", "dangling"):
+        rows = graph.orphan_emitters() if args.query == "orphans" else graph.dangling_consumers()
+        label = "ORPHAN EMITTERS (never consumed)" if args.query == "orphans" else "DANGLING CONSUMERS (never emitted)"
+        print(f"{label}: {len(rows)}")
+        for ss, fct, flux in rows[:limit]:
+            print(f"   {flux}  ←  {fct} ({ss})")
+    else:
+        cycles = graph.cycles()
+        print(f"CYCLES: {len(cycles)}")
+        for i, c in enumerate(cycles[:limit], 1):
+            members = ", ".join(f"{fct} ({ss})" for ss, fct in c["functions"])
+            print(f"   {i}. {len(c['functions'])} functions: {members}")
+            print(f"      via {', '.join(c['fluxes'])}")
+    print("="*80)
+    metrics.finish()
+
+
+if __name__ == "__main__":
+    main()
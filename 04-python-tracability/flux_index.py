@@ -0,0 +1,235 @@
+# flux_index.py — IN-MEMORY FLUX → EMITTERS/CONSUMERS INDEX
+#
+# find_emitters/find_all_consumers used to run a 4-table JOIN per spec row,
+# re-querying the same flux for every FCT using it. FluxIndex loads every
+# emission and consumption in two bulk queries at startup; each lookup is then
+# a dictionary hit, and the primary-subsystem partitioning / SD_ filtering is
+# memoised per flux so it is done once per run, not once per spec row.
+#
+# Memory layout for models with millions of links: functions get dense integer
+# indices, names are interned, and each flux keeps its emitters/consumers as
+# array('i') of function indices instead of lists of tuples.
+import hashlib
+import sys
+from array import array
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "01-Mariadb-setup"))
+from instrumentation import log  # noqa: E402
+from sqlite_dialect import general_ci_key  # noqa: E402
+
+# FluxLinks (schema.sql) is the denormalized link table the Excel parser keeps
+# up to date: a flux lookup is one range scan on its covering index.
+EMISSIONS_SQL = """
+    SELECT flux_name, func_id, fct_tag, subsystem
+    FROM FluxLinks
+    WHERE role = 'EMISSION'
+    ORDER BY link_id
+"""
+CONSUMPTIONS_SQL = """
+    SELECT flux_name, func_id, fct_tag, subsystem
+    FROM FluxLinks
+    WHERE role = 'CONSUMPTION'
+    ORDER BY link_id
+"""
+# The same two scans restricted to one flux (SqlFluxLookup, --lookup sql)
+FLUX_EMISSIONS_SQL = """
+    SELECT flux_name, func_id, fct_tag, subsystem
+    FROM FluxLinks
+    WHERE role = 'EMISSION' AND flux_name = ?
+    ORDER BY link_id
+"""
+FLUX_CONSUMPTIONS_SQL = """
+    SELECT flux_name, func_id, fct_tag, subsystem
+    FROM FluxLinks
+    WHERE role = 'CONSUMPTION' AND flux_name = ?
+    ORDER BY link_id
+"""
+# Every distinct spec flow (SpecFlows, loaded by docx_to_excel_mirror.py --to-db)
+# with the links on the other side of it: consumed flows ⟕ emissions, emitted
+# flows ⟕ consumptions. One set-based query, NULL link = nothing found.
+SPEC_JOIN_SQL = """
+    SELECT s.flow_title, s.direction, fl.flux_name, fl.subsystem, fl.fct_tag
+    FROM (SELECT DISTINCT flow_title, direction FROM SpecFlows) s
+    LEFT JOIN FluxLinks fl
+           ON fl.flux_name = s.flow_title
+          AND fl.role = CASE s.direction WHEN 'CONSUMPTION' THEN 'EMISSION' ELSE 'CONSUMPTION' END
+    ORDER BY fl.link_id
+"""
+
+
+def flux_key(name):
+    """Collation key of a flux name: equal keys ⇔ `WHERE flux_name = ?` matches
+    (the GENERAL_CI folding the SQLite backend compares with)."""
+    return general_ci_key(str(name))
+
+
+def consumer_is_valid(fct_tag, primary_ss_name):
+    # Skip SD_ tagged functions and functions named exactly like the subsystem
+    return not fct_tag.startswith('SD_') and fct_tag.upper() != primary_ss_name.upper()
+
+
+class SqlFluxLookup:
+    """Per-row SQL lookups (one FluxLinks range scan each), same interface as FluxIndex."""
+
+    def __init__(self, cur):
+        self.cur = cur
+
+    def _query(self, sql, flow_name):
+        self.cur.execute(sql, (flow_name,))
+        return [(ss, tag, flux) for flux, _, tag, ss in self.cur.fetchall()]
+
+    def emitters(self, flow_name, primary_ss_name):
+        """(emitters in primary SS, emitters elsewhere) as (ss, fct_tag, flux) tuples."""
+        matches = self._query(FLUX_EMISSIONS_SQL, flow_name)
+        return ([m for m in matches if m[0] == primary_ss_name],
+                [m for m in matches if m[0] != primary_ss_name])
+
+    def consumers(self, flow_name, primary_ss_name):
+        """Valid consumers, or None when the flux has no consumer at all."""
+        matches = self._query(FLUX_CONSUMPTIONS_SQL, flow_name)
+        if not matches:
+            return None
+        return [m for m in matches if consumer_is_valid(m[1], primary_ss_name)]
+
+
+class SpecJoinLookup:
+    """Links of the spec's own flows, fetched with SPEC_JOIN_SQL in one query.
+    Same interface as FluxIndex; fluxes no spec row uses are never loaded."""
+
+    def __init__(self):
+        self.emitter_links = {}        # flux_key → [(ss, fct_tag, flux)]
+        self.consumer_links = {}
+        self._title = {}               # (flux_key, direction) → spec title that filled it
+
+    @classmethod
+    def load(cls, cur):
+        lookup = cls()
+        cur.execute(SPEC_JOIN_SQL)
+        n = 0
+        for flow_title, direction, flux, ss_name, fct_tag in cur:
+            key = flux_key(flow_title)
+            # Titles differing only in case/accents may come back as separate DISTINCT rows
+            if lookup._title.setdefault((key, direction), flow_title) != flow_title:
+                continue
+            links = lookup.emitter_links if direction == "CONSUMPTION" else lookup.consumer_links
+            matches = links.setdefault(key, [])
+            if flux is not None:
+                matches.append((ss_name, fct_tag, flux))
+                n += 1
+        log(f"Spec join: {len(lookup._title)} distinct spec flows | {n} matching links")
+        return lookup
+
+    def emitters(self, flow_name, primary_ss_name):
+        """(emitters in primary SS, emitters elsewhere) as (ss, fct_tag, flux) tuples."""
+        matches = self.emitter_links.get(flux_key(flow_name), [])
+        return ([m for m in matches if m[0] == primary_ss_name],
+                [m for m in matches if m[0] != primary_ss_name])
+
+    def consumers(self, flow_name, primary_ss_name):
+        """Valid consumers, or None when the flux has no consumer at all."""
+        matches = self.consumer_links.get(flux_key(flow_name))
+        if not matches:
+            return None
+        return [m for m in matches if consumer_is_valid(m[1], primary_ss_name)]
+
+
+class FluxIndex:
+    def __init__(self):
+        self.subsystem_names = []      # ss index → name
+        self.func_tag = []             # func index → interned fct_tag
+        self.func_ss = array('i')      # func index → ss index
+        self.flux_name = {}            # flux_key → flux name as stored
+        self.emitter_links = {}        # flux_key → array('i') of func indices
+        self.consumer_links = {}
+        self._func_idx = {}            # DB function id → func index
+        self._ss_idx = {}
+        self._emitters_memo = {}       # (flux_key, primary) → (primary, other)
+        self._consumers_memo = {}
+        self._versions_memo = {}       # flux_key → (emitters version, consumers version)
+
+    def _func(self, func_id, fct_tag, ss_name):
+        idx = self._func_idx.get(func_id)
+        if idx is None:
+            ss = self._ss_idx.get(ss_name)
+            if ss is None:
+                ss = self._ss_idx[ss_name] = len(self.subsystem_names)
+                self.subsystem_names.append(sys.intern(ss_name))
+            idx = self._func_idx[func_id] = len(self.func_tag)
+            self.func_tag.append(sys.intern(fct_tag))
+            self.func_ss.append(ss)
+        return idx
+
+    def _load(self, rows, links):
+        n = 0
+        for flux, func_id, fct_tag, ss_name in rows:
+            key = flux_key(flux)
+            self.flux_name.setdefault(key, flux)
+            links.setdefault(key, array('i')).append(self._func(func_id, fct_tag, ss_name))
+            n += 1
+        return n
+
+    def _loaded(self, n_em, n_co, quiet=False):
+        self._func_idx = {}   # only needed while loading
+        if not quiet:
+            log(f"Flux index: {len(self.flux_name)} fluxes | {len(self.func_tag)} functions | "
+                  f"{n_em} emissions | {n_co} consumptions")
+        return self
+
+    @classmethod
+    def load(cls, cur):
+        """Two bulk queries → full index."""
+        index = cls()
+        cur.execute(EMISSIONS_SQL)
+        n_em = index._load(cur, index.emitter_links)
+        cur.execute(CONSUMPTIONS_SQL)
+        n_co = index._load(cur, index.consumer_links)
+        return index._loaded(n_em, n_co)
+
+    @classmethod
+    def from_links(cls, emissions, consumptions, quiet=False):
+        """Index of in-memory (flux_name, func_id, fct_tag, subsystem) rows, each in link_id order."""
+        index = cls()
+        n_em = index._load(emissions, index.emitter_links)
+        n_co = index._load(consumptions, index.consumer_links)
+        return index._loaded(n_em, n_co, quiet)
+
+    def _tuples(self, key, links):
+        name = self.flux_name[key]
+        return [(self.subsystem_names[self.func_ss[i]], self.func_tag[i], name) for i in links]
+
+    def emitters(self, flow_name, primary_ss_name):
+        """(emitters in primary SS, emitters elsewhere) as (ss, fct_tag, flux) tuples."""
+        key = flux_key(flow_name)
+        memo = self._emitters_memo.get((key, primary_ss_name))
+        if memo is None:
+            matches = self._tuples(key, self.emitter_links[key]) if key in self.emitter_links else []
+            memo = ([m for m in matches if m[0] == primary_ss_name],
+                    [m for m in matches if m[0] != primary_ss_name])
+            self._emitters_memo[(key, primary_ss_name)] = memo
+        return memo
+
+    def consumers(self, flow_name, primary_ss_name):
+        """Valid consumers, or None when the flux has no consumer at all."""
+        key = flux_key(flow_name)
+        if key not in self.consumer_links:
+            return None
+        memo = self._consumers_memo.get((key, primary_ss_name))
+        if memo is None:
+            memo = [m for m in self._tuples(key, self.consumer_links[key])
+                    if consumer_is_valid(m[1], primary_ss_name)]
+            self._consumers_memo[(key, primary_ss_name)] = memo
+        return memo
+
+    def link_versions(self, flow_name):
+        """(emitters version, consumers version) of a flux — short hashes of its
+        (subsystem, fct_tag) sets, so any link added or removed changes them."""
+        key = flux_key(flow_name)
+        memo = self._versions_memo.get(key)
+        if memo is None:
+            memo = tuple(
+                hashlib.sha256(repr(sorted(self._tuples(key, links[key])) if key in links else None)
+                               .encode("utf-8")).hexdigest()[:16]
+                for links in (self.emitter_links, self.consumer_links))
+            self._versions_memo[key] = memo
+        return memo
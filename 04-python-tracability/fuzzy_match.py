@@ -0,0 +1,198 @@
+# fuzzy_match.py — INDEXED APPROXIMATE FLUX-NAME MATCHING FOR MISSING ROWS
+#
+# Many MISSING spec rows are case / whitespace / punctuation / abbreviation
+# variants of a flux that exists. Comparing every spec flow with 100k+ flux
+# names pairwise is far too slow, so FluxNameMatcher precomputes:
+#   - a normalised-name map (lowercase, punctuation and spacing removed) that
+#     answers pure spelling variants with one dict hit (score 1.0);
+#   - the token vocabulary of all names ("Veh_Spd_Raw" → veh, spd, raw) with a
+#     trigram index over it, and token → names postings.
+# Flux names reuse a small vocabulary, so a query first matches each of its
+# tokens against the vocabulary (trigram Dice or abbreviation), then
+# intersects the names holding those tokens, smallest set first. Only the few
+# surviving names are scored. Suggestions are advisory: they go to a separate
+# report column, never into Status.
+import math
+import re
+
+from flux_index import flux_key
+from instrumentation import log
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+TOKEN_MIN_SCORE = 0.7     # vocabulary token counts as a match of a query token
+MAX_CANDIDATES = 2000     # names scored per query; more means the query is too vague
+
+
+def tokens(name):
+    # "VehSpd_Raw-Value" → ["veh", "spd", "raw", "value"]; camelCase is split too
+    spaced = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", str(name))
+    return TOKEN_RE.findall(flux_key(spaced))
+
+
+def trigrams(toks):
+    grams = set()
+    for tok in toks:
+        padded = f"  {tok} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def dice(a, b):
+    return 2 * len(a & b) / (len(a) + len(b)) if a or b else 0.0
+
+
+def _is_abbreviation(short, full):
+    """'spd' abbreviates 'speed': same first letter, letters in order."""
+    if not short or short[0] != full[0] or len(short) > len(full):
+        return False
+    it = iter(full)
+    return all(c in it for c in short)
+
+
+def abbreviation_score(q_toks, c_toks):
+    if len(q_toks) != len(c_toks) or not q_toks:
+        return 0.0
+    if all(_is_abbreviation(a, b) or _is_abbreviation(b, a) for a, b in zip(q_toks, c_toks)):
+        return 0.9
+    return 0.0
+
+
+class FluxNameMatcher:
+    def __init__(self, names, min_score=0.6, top_k=3):
+        self.min_score = min_score
+        self.top_k = top_k
+        self.names = []                 # name id → flux name
+        self.name_tokens = []           # name id → tuple of token ids
+        self.by_normalized = {}         # normalised name → [name ids]
+        self.vocab = []                 # token id → token
+        self.vocab_grams = []           # token id → trigram set
+        self._token_id = {}
+        self.token_names = []           # token id → set of name ids
+        self.gram_tokens = {}           # trigram → [token ids]
+        self._token_memo = {}           # query token → (close token ids, names holding them)
+        self._names_memo = {}           # query token → frozenset of name ids
+        for name in dict.fromkeys(names):
+            nid = len(self.names)
+            toks = tokens(name)
+            ids = tuple(self._vocab_id(t) for t in toks)
+            self.names.append(name)
+            self.name_tokens.append(ids)
+            self.by_normalized.setdefault("".join(toks), []).append(nid)
+            for tid in set(ids):
+                self.token_names[tid].add(nid)
+        log(f"Fuzzy flux matcher: {len(self.names)} names | {len(self.vocab)} distinct tokens")
+
+    @classmethod
+    def load(cls, cur, **kwargs):
+        """Every Fluxes.name, linked or not, in one query."""
+        cur.execute("SELECT name FROM Fluxes ORDER BY id")
+        return cls((name for (name,) in cur.fetchall()), **kwargs)
+
+    def _vocab_id(self, tok):
+        tid = self._token_id.get(tok)
+        if tid is None:
+            tid = self._token_id[tok] = len(self.vocab)
+            grams = trigrams([tok])
+            self.vocab.append(tok)
+            self.vocab_grams.append(grams)
+            self.token_names.append(set())
+            for g in grams:
+                self.gram_tokens.setdefault(g, []).append(tid)
+        return tid
+
+    def _matching_tokens(self, tok):
+        """Vocabulary tokens close to one query token (spelling or abbreviation)
+        and how many names hold them. Memoised: spec flows share most tokens."""
+        memo = self._token_memo.get(tok)
+        if memo is None:
+            grams = trigrams([tok])
+            # Prefix filter: a token with Dice ≥ t shares at least t·|q|/(2-t)
+            # trigrams with the query, so it appears in the postings of the
+            # len - need + 1 rarest ones.
+            need = max(1, math.ceil(TOKEN_MIN_SCORE * len(grams) / (2 - TOKEN_MIN_SCORE)))
+            ordered = sorted(grams, key=lambda g: len(self.gram_tokens.get(g, ())))
+            seen = set()
+            for g in ordered[:len(ordered) - need + 1]:
+                seen.update(self.gram_tokens.get(g, ()))
+            close = {tid for tid in seen
+                     if dice(grams, self.vocab_grams[tid]) >= TOKEN_MIN_SCORE}
+            if tok.isalpha():
+                close.update(tid for tid in self.gram_tokens.get(f" {tok[:2]}", ())
+                             if self.vocab[tid].isalpha()
+                             and (_is_abbreviation(tok, self.vocab[tid]) or _is_abbreviation(self.vocab[tid], tok)))
+            memo = self._token_memo[tok] = (frozenset(close), sum(len(self.token_names[tid]) for tid in close))
+        return memo
+
+    def _matching_names(self, tok):
+        names = self._names_memo.get(tok)
+        if names is None:
+            close, _ = self._matching_tokens(tok)
+            names = self._names_memo[tok] = frozenset().union(*(self.token_names[tid] for tid in close))
+        return names
+
+    def _intersect(self, q_toks):
+        candidates = self._matching_names(q_toks[0])
+        for tok in q_toks[1:]:
+            if not candidates:
+                break
+            close, size = self._matching_tokens(tok)
+            if tok in self._names_memo or size < 10 * len(candidates):
+                candidates = candidates & self._matching_names(tok)
+            else:
+                candidates = {nid for nid in candidates if not close.isdisjoint(self.name_tokens[nid])}
+        return candidates
+
+    def _candidates(self, q_toks):
+        """Names holding a close token for every query token, smallest set first.
+        Once few candidates are left, checking their own tokens is cheaper than
+        building the name set of a common query token. With no such name, one
+        query token may be left out (a typo in a short token)."""
+        q_set = sorted(set(q_toks), key=lambda t: self._matching_tokens(t)[1])
+        if not q_set:
+            return set()
+        candidates = self._intersect(q_set)
+        if not candidates and len(q_set) > 1:
+            for i in range(len(q_set)):
+                candidates |= self._intersect(q_set[:i] + q_set[i + 1:])
+        return candidates
+
+    def suggest(self, flow_name):
+        """[(flux name, score)] best first; the exact (collation-equal) flux is never suggested."""
+        exact = flux_key(flow_name)
+        q_toks = tokens(flow_name)
+        scores = {nid: 1.0 for nid in self.by_normalized.get("".join(q_toks), ())}
+
+        candidates = self._candidates(q_toks)
+        if len(candidates) <= MAX_CANDIDATES:
+            q_grams = trigrams(q_toks)
+            for nid in candidates:
+                if nid in scores:
+                    continue
+                c_ids = self.name_tokens[nid]
+                score = dice(q_grams, set().union(*(self.vocab_grams[tid] for tid in c_ids)))
+                if score < 0.9:
+                    score = max(score, abbreviation_score(q_toks, [self.vocab[tid] for tid in c_ids]))
+                if score >= self.min_score:
+                    scores[nid] = round(score, 2)
+
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], self.names[kv[0]]))
+        suggestions = []
+        for nid, score in ranked:
+            if flux_key(self.names[nid]) != exact:
+                suggestions.append((self.names[nid], score))
+                if len(suggestions) == self.top_k:
+                    break
+        return suggestions
+
+
+def add_suggestions(df_final, matcher):
+    """Fill a 'Suggested Flux' column for MISSING rows (one lookup per distinct flow)."""
+    if df_final.empty:
+        return df_final
+    missing = df_final["Status"].str.contains("MISSING")
+    memo = {}
+    for flow in df_final.loc[missing, "Flow"].unique():
+        memo[flow] = "; ".join(f"{name} ({score:.2f})" for name, score in matcher.suggest(flow))
+    df_final["Suggested Flux"] = ""
+    df_final.loc[missing, "Suggested Flux"] = df_final.loc[missing, "Flow"].map(memo)
+    return df_final
@@ -0,0 +1,125 @@
+# incremental_trace.py — INCREMENTAL TRACEABILITY RECOMPUTE AGAINST THE LAST REPORT
+#
+# Every spec row gets a fingerprint of everything its phase-1 classification
+# depends on: spec file, FCT, flow, direction, primary subsystem and the
+# versions of the flux's emitter/consumer sets in the FluxIndex. The result
+# store (one JSON file next to the report) keeps the phase-1 rows and the
+# ambiguous case of every fingerprint; a re-run only classifies rows whose
+# fingerprint is new and carries the others over. Phase 2 (recorded decisions,
+# prompts) then runs on all ambiguous cases exactly as in a full run.
+# The final rows of the previous run are kept as well, to diff statuses.
+# Editing the engine or the index invalidates every stored row.
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+import flux_index
+import traceability_engine
+from instrumentation import log
+from traceability_engine import classify
+
+KEY_COLUMNS = ["Spec File", "FCT", "Flow", "Direction"]
+CHANGE_COLUMNS = KEY_COLUMNS + ["Previous Status", "Status", "Previous Found In", "Found In", "Change"]
+
+
+def engine_fingerprint():
+    source = b"".join(Path(m.__file__).read_bytes() for m in (traceability_engine, flux_index))
+    return hashlib.sha256(source).hexdigest()[:16]
+
+
+def row_fingerprint(row, lookup, primary_ss_name):
+    em_version, co_version = lookup.link_versions(row["Flow Title"])
+    parts = [row["Spec File"], row["Function"], row["Flow Title"], row["Direction"], primary_ss_name,
+             em_version, co_version]
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+class ResultStore:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.engine = engine_fingerprint()
+        self.rows = {}      # fingerprint → {"results": [...], "case": {...} or None}
+        self.final = []     # final report rows of the previous run
+        self.reused = 0
+        self.recomputed = 0
+
+    def load(self):
+        if self.path.exists():
+            state = json.loads(self.path.read_text(encoding="utf-8"))
+            self.final = state["final"]
+            if state["engine"] == self.engine:
+                self.rows = state["rows"]
+        log(f"Result store: {len(self.rows)} stored spec rows | {len(self.final)} previous connections")
+        return self
+
+    def analyze(self, df_spec, lookup, primary_ss_name):
+        """Same output as traceability_engine.analyze, reclassifying only changed rows."""
+        results = []
+        ambiguous_cases = []
+        rows = {}
+        for row in df_spec.to_dict("records"):
+            fp = row_fingerprint(row, lookup, primary_ss_name)
+            entry = rows.get(fp) or self.rows.get(fp)
+            if entry is None:
+                start, n_cases = len(results), len(ambiguous_cases)
+                classify([row], lookup, primary_ss_name, results, ambiguous_cases)
+                case = dict(ambiguous_cases[-1]) if len(ambiguous_cases) > n_cases else None
+                if case:
+                    case["result_idx"] -= start
+                entry = {"results": [dict(r) for r in results[start:]], "case": case}
+                self.recomputed += 1
+            else:
+                # Copies: phase 2 updates the result rows in place
+                if entry["case"]:
+                    case = dict(entry["case"])
+                    case["result_idx"] += len(results)
+                    case["options"] = [tuple(opt) for opt in case["options"]]
+                    ambiguous_cases.append(case)
+                results.extend(dict(r) for r in entry["results"])
+                self.reused += 1
+            rows[fp] = entry
+        self.rows = rows   # rows of spec flows that are gone are dropped
+        return results, ambiguous_cases
+
+    def save(self, df_final):
+        self.final = df_final.reindex(columns=KEY_COLUMNS + ["Status", "Found In Subsystem", "Found In FCT"]).to_dict("records")
+        state = {"engine": self.engine, "rows": self.rows, "final": self.final}
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state, ensure_ascii=False, default=str), encoding="utf-8")
+        os.replace(tmp, self.path)   # never leave a half-written store behind
+
+
+def _by_spec_row(rows):
+    """(Spec File, FCT, Flow, Direction) → (statuses, found-in connections) as text."""
+    grouped = {}
+    for r in rows:
+        key = tuple(str(r[c]) for c in KEY_COLUMNS)
+        statuses, found = grouped.setdefault(key, (set(), set()))
+        statuses.add(r["Status"])
+        if r["Found In FCT"]:
+            found.add(f"{r['Found In FCT']} in {r['Found In Subsystem']}")
+    return {key: (" / ".join(sorted(s)), "; ".join(sorted(f))) for key, (s, f) in grouped.items()}
+
+
+def status_changes(previous_rows, df_final):
+    """One row per spec flow whose status or connections differ from the previous run."""
+    before = _by_spec_row(previous_rows)
+    after = _by_spec_row(df_final.to_dict("records"))
+    changes = []
+    for key in sorted(before.keys() | after.keys()):
+        old, new = before.get(key, ("", "")), after.get(key, ("", ""))
+        if old == new:
+            continue
+        if key not in before:
+            change = "NEW"
+        elif key not in after:
+            change = "REMOVED"
+        elif old[0] != new[0]:
+            change = f"{old[0]}→{new[0]}"
+        else:
+            change = "CONNECTIONS CHANGED"
+        changes.append(dict(zip(CHANGE_COLUMNS, key + (old[0], new[0], old[1], new[1], change))))
+    return pd.DataFrame(changes, columns=CHANGE_COLUMNS)
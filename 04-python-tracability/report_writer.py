@@ -0,0 +1,99 @@
+# report_writer.py — STREAMING WRITER FOR LARGE TRACEABILITY REPORTS
+#
+# The first version loaded the whole sheet into a normal openpyxl workbook,
+# set a PatternFill on every Status cell and then visited every cell again to
+# size the columns. Here rows are streamed through an openpyxl write-only
+# workbook (constant memory), Status colours are two conditional-formatting
+# rules covering the whole column, and column widths come from the
+# DataFrame's string lengths (vectorised). Machine consumers can ask for
+# CSV / Parquet siblings of the same table.
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+MAX_WIDTH = 50
+GREEN_FILL = PatternFill(start_color='d4edda', end_color='d4edda', fill_type='solid')
+RED_FILL = PatternFill(start_color='f8d7da', end_color='f8d7da', fill_type='solid')
+HEADER_FONT = Font(bold=True)
+HEADER_BORDER = Border(*(Side(style='thin'),) * 4)
+HEADER_ALIGN = Alignment(horizontal='center', vertical='top')
+SIBLING_FORMATS = ("csv", "parquet")
+
+
+def column_widths(frames):
+    """Width per column position: longest header/value + 2, capped at MAX_WIDTH."""
+    widths = {}
+    for df in frames:
+        for pos, col in enumerate(df.columns):
+            longest = max(len(str(col)), int(df[col].astype("string").str.len().fillna(0).max()) if len(df) else 0)
+            widths[pos] = max(widths.get(pos, 0), min(longest + 2, MAX_WIDTH))
+    return widths
+
+
+class ReportWriter:
+    """Write-only workbook; use as a context manager, one add_sheet() per sheet."""
+
+    def __init__(self, output_file):
+        self.output_file = Path(output_file)
+        self.wb = Workbook(write_only=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.wb.save(self.output_file)
+
+    def _header(self, ws, columns):
+        cells = []
+        for col in columns:
+            cell = WriteOnlyCell(ws, value=str(col))
+            cell.font, cell.border, cell.alignment = HEADER_FONT, HEADER_BORDER, HEADER_ALIGN
+            cells.append(cell)
+        ws.append(cells)
+
+    def add_sheet(self, sheet_name, *frames, gap=2):
+        """Stream one or more DataFrames into a sheet, `gap` blank rows apart.
+        A 'Status' column gets FOUND (green) / MISSING (red) rules."""
+        ws = self.wb.create_sheet(title=sheet_name)
+        for pos, width in column_widths(frames).items():
+            ws.column_dimensions[get_column_letter(pos + 1)].width = width
+
+        row = 1
+        for i, df in enumerate(frames):
+            if i:
+                for _ in range(gap):
+                    ws.append([])
+                row += gap
+            self._header(ws, df.columns)
+            values = df.astype(object).where(df.notna(), None)
+            for record in values.itertuples(index=False, name=None):
+                ws.append(record)
+            if "Status" in df.columns and len(df):
+                col = get_column_letter(list(df.columns).index("Status") + 1)
+                cells = f"{col}{row + 1}:{col}{row + len(df)}"
+                first = f"{col}{row + 1}"
+                ws.conditional_formatting.add(cells, FormulaRule(
+                    formula=[f'ISNUMBER(FIND("FOUND",{first}))'], fill=GREEN_FILL, stopIfTrue=True))
+                ws.conditional_formatting.add(cells, FormulaRule(
+                    formula=[f'ISNUMBER(FIND("MISSING",{first}))'], fill=RED_FILL, stopIfTrue=True))
+            row += len(df) + 1
+
+
+def write_siblings(df, output_file, formats):
+    """CSV / Parquet copies of a report table next to the .xlsx. Returns the paths."""
+    paths = []
+    for fmt in formats:
+        path = Path(output_file).with_suffix(f".{fmt}")
+        if fmt == "csv":
+            df.to_csv(path, index=False, encoding="utf-8-sig")
+        else:
+            text_cols = {c: "string" for c in df.columns if df[c].dtype == object}
+            df.astype(text_cols).to_parquet(path, index=False)
+        paths.append(path)
+    return paths
@@ -0,0 +1,119 @@
+# subsystem_sweep.py — ALL-PRIMARIES TRACEABILITY SWEEP IN ONE RUN
+#
+# Instead of rerunning the engine once per subsystem (reloading the spec and
+# requerying the DB every time), the spec and the FluxIndex are loaded once
+# and handed to a process pool; each worker only does the per-primary
+# classification. Ambiguous cases are replayed from the decision store (batch
+# semantics — nobody can answer N × prompts). Output: one sheet per primary
+# subsystem plus a Summary sheet with per-primary totals and the
+# primary × found-in-subsystem matrix of FOUND connections.
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from fuzzy_match import add_suggestions
+from instrumentation import log
+from report_writer import ReportWriter, write_siblings
+from traceability_engine import analyze, resolve_from_store
+
+_worker = {}
+
+
+def _init_worker(df_spec, index):
+    _worker["spec"] = df_spec
+    _worker["index"] = index
+
+
+def _classify(primary_ss_name):
+    results, ambiguous_cases = analyze(_worker["spec"], _worker["index"], primary_ss_name)
+    return primary_ss_name, results, ambiguous_cases
+
+
+def sheet_names(subsystems):
+    """Excel-safe (≤31 chars, no []:*?/\\), unique sheet name per subsystem."""
+    names, used = {}, {"summary"}
+    for ss in subsystems:
+        base = re.sub(r"[\[\]:*?/\\]", "_", ss)[:31] or "_"
+        name, n = base, 1
+        while name.lower() in used:
+            suffix = f"~{n}"
+            name, n = base[:31 - len(suffix)] + suffix, n + 1
+        used.add(name.lower())
+        names[ss] = name
+    return names
+
+
+def summarize(reports):
+    """(per-primary totals, primary × found-in-subsystem FOUND matrix)."""
+    totals = []
+    found_frames = []
+    for primary, df in reports.items():
+        status = df["Status"] if not df.empty else pd.Series(dtype=str)
+        total = len(df)
+        found = int(status.str.contains("FOUND").sum())
+        totals.append({
+            "Primary Subsystem": primary,
+            "Total connections": total,
+            "Found": found,
+            "Missing": int(status.str.contains("MISSING").sum()),
+            "Pending": int((status == "PENDING").sum()),
+            "Found %": round(100 * found / total, 1) if total else 0.0,
+        })
+        if found:
+            hit = df[status.str.contains("FOUND")]
+            found_frames.append(hit.assign(Primary=primary)[["Primary", "Found In Subsystem"]])
+    df_totals = pd.DataFrame(totals)
+    if found_frames:
+        found_all = pd.concat(found_frames, ignore_index=True)
+        matrix = pd.crosstab(found_all["Primary"], found_all["Found In Subsystem"])
+        matrix = matrix.reindex(index=list(reports)).fillna(0).astype(int)
+    else:
+        matrix = pd.DataFrame(index=list(reports))
+    matrix.index.name = "Primary \\ Found In"
+    return df_totals, matrix
+
+
+def run_sweep(df_spec, index, subsystems, store, output_file, review_file, workers=None, matcher=None, siblings=()):
+    """Classify every primary subsystem in parallel and write one workbook."""
+    primaries = list(subsystems)
+    workers = workers or os.cpu_count()
+    log(f"\nALL-PRIMARIES SWEEP — {len(primaries)} subsystems on {workers} processes")
+
+    reports = {}
+    pending = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(df_spec, index)) as pool:
+        for primary, results, ambiguous_cases in pool.map(_classify, primaries):
+            open_cases = resolve_from_store(results, ambiguous_cases, store)
+            pending.extend(open_cases)
+            reports[primary] = pd.DataFrame(results)
+            if matcher is not None:
+                add_suggestions(reports[primary], matcher)
+            log(f"   {primary:30} {len(results):7} connections | {len(open_cases)} pending")
+
+    df_totals, matrix = summarize(reports)
+    names = sheet_names(primaries)
+    with ReportWriter(output_file) as report:
+        report.add_sheet("Summary", df_totals, matrix.reset_index())
+        for primary, df in reports.items():
+            report.add_sheet(names[primary], df if not df.empty else pd.DataFrame(columns=["Status"]))
+    if siblings:
+        # One long table for machine consumers: every primary's rows, tagged
+        df_all = pd.concat([df.assign(**{"Primary Subsystem": p}) for p, df in reports.items() if not df.empty],
+                           ignore_index=True) if any(not df.empty for df in reports.values()) else pd.DataFrame()
+        for path in write_siblings(df_all, output_file, siblings):
+            log(f"   Sibling export → {path.resolve()}")
+
+    n = store.write_review_file(review_file, pending)
+    if n:
+        log(f"   {n} open questions written → {review_file.resolve()}")
+
+    print("\n" + "="*80)
+    print("ALL-PRIMARIES TRACEABILITY SWEEP COMPLETE")
+    print("="*80)
+    print(df_totals.to_string(index=False))
+    print(f"\n   REPORT SAVED → {output_file.resolve()}")
+    print("="*80)
+    return reports
@@ -0,0 +1,322 @@
+# trace_service.py — RESIDENT TRACEABILITY QUERY SERVICE (asyncio, HTTP over TCP or a Unix socket)
+#
+# Answers "who emits flux X / who consumes what FCT_Y emits" without paying
+# for interpreter start-up, imports and a full FluxLinks load on every
+# question. The model stays indexed in memory (FluxIndex, the engine's
+# find_emitters / find_all_consumers answer from it), and a background task
+# polls IngestManifest: when a workbook was added, changed or removed, only
+# the FluxLinks rows of its subsystem's workbooks are re-read from the
+# database (an ingest re-creates them all, and a link shared by two sibling
+# workbooks may change owner without the other's hash changing). The index
+# itself is then rebuilt in full from the rows held in memory (≈4 s per
+# 500k links), off the event loop, and swapped in — queries keep being
+# served from the previous model meanwhile.
+#
+#   GET  /emitters?flux=X[&primary=SS]     find_emitters      (FOUND / AMBIGUOUS_* / MISSING)
+#   GET  /consumers?flux=X[&primary=SS]    find_all_consumers (SD_ / subsystem-named filtered)
+#   GET  /fct?fct=FCT_Y[&primary=SS]       every flux FCT_Y emits, with its consumers
+#   POST /batch   {"primary": "SS", "queries": [{"emitters": "X"}, {"consumers": "X"}, {"fct": "FCT_Y"}]}
+#   GET  /health                           model size, manifest version, query counters
+#
+# Every answer is JSON and carries its lookup time in "ms". Batches are
+# answered on a worker thread so a big one does not stall the loop. HTTP/1.1
+# keep-alive is supported, so a client can reuse one connection for many
+# questions; many clients are served concurrently by one asyncio loop.
+import argparse
+import asyncio
+import hashlib
+import json
+import signal
+import sys
+import time
+from datetime import datetime
+from http import HTTPStatus
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "01-Mariadb-setup"))
+from db_access import get_database
+from instrumentation import add_arguments, configure, count, get_metrics, log
+
+from flux_index import FluxIndex, flux_key
+from traceability_engine import find_all_consumers, find_emitters
+
+MANIFEST_SQL = "SELECT source_file, subsystem, content_hash FROM IngestManifest"
+FILE_LINKS_SQL = """
+    SELECT role, link_id, flux_name, func_id, fct_tag, subsystem
+    FROM FluxLinks
+    WHERE source_file = ?
+"""
+MAX_BODY = 16 << 20
+MAX_BATCH = 100_000
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Model:
+    """One immutable snapshot: FluxIndex + FCT → emitted fluxes, built from per-workbook link rows.
+    Always a full rebuild over every workbook's rows (only the database reads are incremental)."""
+
+    def __init__(self, files, version):
+        rows = sorted((r for _, links in files.values() for r in links), key=lambda r: (r[0], r[1]))
+        self.index = FluxIndex.from_links(
+            [r[2:] for r in rows if r[0] == "EMISSION"],
+            [r[2:] for r in rows if r[0] == "CONSUMPTION"], quiet=True)
+        self.emits = {}          # fct key → [(subsystem, fct_tag, flux)] in link order
+        for role, _, flux, _, fct_tag, ss_name in rows:
+            if role == "EMISSION":
+                self.emits.setdefault(flux_key(fct_tag), []).append((ss_name, fct_tag, flux))
+        self.version = version
+        self.workbooks = len(files)
+        self.links = len(rows)
+        self.loaded_at = datetime.now().isoformat(timespec="seconds")
+
+
+class LinkStore:
+    """FluxLinks rows per workbook, kept in step with IngestManifest."""
+
+    def __init__(self, db):
+        self.db = db
+        self.files = {}          # source_file → (content_hash, [(role, link_id, flux, func_id, fct_tag, ss)])
+        self.subsystems = {}     # source_file → subsystem (IngestManifest)
+
+    def refresh(self, force=False):
+        """Re-read every workbook of a subsystem with an added, changed or removed workbook.
+        Returns a new Model, or None if nothing changed."""
+        conn = self.db.connect()
+        try:
+            cur = self.db.cursor(conn)
+            cur.execute(MANIFEST_SQL)
+            manifest = {f: (ss, h) for f, ss, h in cur.fetchall()}
+            removed = [f for f in self.files if f not in manifest]
+            stale = {ss for f, (ss, h) in manifest.items() if self.files.get(f, (None,))[0] != h}
+            stale.update(self.subsystems[f] for f in removed)
+            changed = [f for f, (ss, _) in manifest.items() if ss in stale]
+            if not (changed or removed or force):
+                return None
+            for name in removed:
+                del self.files[name], self.subsystems[name]
+            for name in changed:
+                cur.execute(FILE_LINKS_SQL, (name,))
+                self.subsystems[name], content_hash = manifest[name]
+                self.files[name] = (content_hash, cur.fetchall())
+            conn.rollback()   # read-only: end the snapshot
+        finally:
+            conn.close()
+        version = hashlib.sha256(json.dumps(sorted(manifest.items())).encode("utf-8")).hexdigest()[:16]
+        model = Model(self.files, version)
+        log(f"Model {version}: {model.workbooks} workbooks | {model.links} links "
+            f"({len(changed)} re-read, {len(removed)} removed)")
+        return model
+
+
+def emitters_answer(model, flux, primary):
+    match = find_emitters(model.index, flux, "", primary)
+    if match is None:
+        return {"flux": flux, "status": "MISSING", "emitters": []}
+    if match[0] in ("AMBIGUOUS_PRIMARY", "AMBIGUOUS_OTHER"):
+        options = match[1]
+        return {"flux": flux, "status": match[0],
+                "emitters": [{"subsystem": ss, "fct": fct, "flux": name} for ss, fct, name in options]}
+    ss, fct, name = match[:3]
+    return {"flux": flux, "status": "FOUND", "emitters": [{"subsystem": ss, "fct": fct, "flux": name}],
+            "outside_primary": len(match) > 3}
+
+
+def consumers_answer(model, flux, primary):
+    matches = find_all_consumers(model.index, flux, "", primary)
+    return {"flux": flux, "status": "FOUND" if matches else "MISSING",
+            "consumers": [{"subsystem": ss, "fct": fct, "flux": name} for ss, fct, name in matches or []]}
+
+
+def fct_answer(model, fct, primary):
+    emitted = model.emits.get(flux_key(fct), [])
+    return {"fct": fct, "status": "FOUND" if emitted else "MISSING",
+            "emits": [{"subsystem": ss, "flux": flux,
+                       "consumers": consumers_answer(model, flux, primary)["consumers"]}
+                      for ss, _, flux in emitted]}
+
+
+QUERIES = {"emitters": emitters_answer, "consumers": consumers_answer, "fct": fct_answer}
+
+
+def encode(payload):
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+def encode_batch(payload):
+    """encode() one result at a time: a single json.dumps of a huge batch holds the GIL
+    (and so the event loop) for seconds."""
+    results = payload.pop("results")
+    return encode(payload)[:-1] + b', "results": [' + b", ".join(map(encode, results)) + b"]}"
+
+
+class TraceService:
+    def __init__(self, store, primary=None, poll=2.0):
+        self.store = store
+        self.primary = primary
+        self.poll = poll
+        self.model = None
+        self.started = time.time()
+
+    async def refresh(self, force=False):
+        model = await asyncio.get_running_loop().run_in_executor(None, self.store.refresh, force)
+        if model is not None:
+            self.model = model     # atomic swap: running queries keep their snapshot
+            count("model_refreshes")
+
+    async def watch(self):
+        while True:
+            await asyncio.sleep(self.poll)
+            try:
+                await self.refresh()
+            except Exception as e:   # database briefly unavailable / being re-initialised
+                log(f"Refresh failed: {type(e).__name__}: {e}")
+
+    def _primary(self, value):
+        primary = value or self.primary
+        if not primary:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "no primary subsystem (add primary=… or start with --primary)")
+        return primary
+
+    def answer(self, method, target, body):
+        url = urlsplit(target)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        model = self.model
+        start = time.perf_counter()
+        if url.path == "/health":
+            return {"model": model.version, "loaded_at": model.loaded_at, "workbooks": model.workbooks,
+                    "links": model.links, "fluxes": len(model.index.flux_name),
+                    "uptime_s": round(time.time() - self.started), "counters": get_metrics().counters}
+        if url.path == "/batch":
+            if method != "POST":
+                raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, "POST a JSON body to /batch")
+            try:
+                request = json.loads(body or b"{}")
+                queries = request["queries"]
+            except (ValueError, KeyError, TypeError):
+                raise HttpError(HTTPStatus.BAD_REQUEST, 'body must be {"queries": [{"emitters": "FLUX"}, …]}')
+            if len(queries) > MAX_BATCH:
+                raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"at most {MAX_BATCH} queries per batch")
+            primary = self._primary(request.get("primary"))
+            results = []
+            for query in queries:
+                kind, value = next(iter(query.items())) if isinstance(query, dict) and len(query) == 1 else (None, None)
+                if kind not in QUERIES or not isinstance(value, str):
+                    raise HttpError(HTTPStatus.BAD_REQUEST, f"bad query {query!r} — one of {sorted(QUERIES)}")
+                results.append(QUERIES[kind](model, value, primary))
+            count("queries", len(results))
+            return {"primary": primary, "model": model.version, "results": results,
+                    "ms": round(1000 * (time.perf_counter() - start), 3)}
+        kind = url.path.strip("/")
+        if kind not in QUERIES:
+            raise HttpError(HTTPStatus.NOT_FOUND, f"unknown path {url.path}")
+        key = "fct" if kind == "fct" else "flux"
+        if not params.get(key):
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"missing ?{key}=")
+        result = QUERIES[kind](model, params[key], self._primary(params.get("primary")))
+        count("queries")
+        return {**result, "model": model.version, "ms": round(1000 * (time.perf_counter() - start), 3)}
+
+    async def handle(self, reader, writer):
+        """HTTP/1.1 connection: requests are answered in order until the client closes."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.respond(writer, HTTPStatus.BAD_REQUEST, {"error": "bad request line"}, False)
+                    break
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = headers.get("content-length", "0") or "0"
+                if not (length.isascii() and length.isdigit()):
+                    await self.respond(writer, HTTPStatus.BAD_REQUEST, {"error": "bad Content-Length"}, False)
+                    break
+                length = int(length)
+                if length > MAX_BODY:
+                    await self.respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and (version != "HTTP/1.0" or headers.get("connection", "").lower() == "keep-alive"))
+                try:
+                    if urlsplit(target).path == "/batch":
+                        payload = await asyncio.get_running_loop().run_in_executor(
+                            None, lambda: encode_batch(self.answer(method, target, body)))
+                    else:
+                        payload = self.answer(method, target, body)
+                    status = HTTPStatus.OK
+                except HttpError as e:
+                    status, payload = e.status, {"error": str(e)}
+                    count("errors")
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def respond(writer, status, payload, keep_alive):
+        body = payload if isinstance(payload, bytes) else encode(payload)
+        writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                     f"Content-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body)
+        await writer.drain()
+
+
+async def serve(service, host, port, socket_path):
+    await service.refresh(force=True)
+    if socket_path:
+        socket_path.unlink(missing_ok=True)
+        server = await asyncio.start_unix_server(service.handle, path=str(socket_path))
+        where = f"unix:{socket_path}"
+    else:
+        server = await asyncio.start_server(service.handle, host, port)
+        where = f"http://{host}:{port}"
+    log(f"Traceability service listening on {where} "
+        f"(primary {service.primary or 'per query'}, manifest polled every {service.poll}s)")
+    watcher = asyncio.create_task(service.watch())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        watcher.cancel()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Resident emitter/consumer query service over HTTP or a Unix socket")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--socket", type=Path, metavar="PATH", help="listen on a Unix socket instead of TCP")
+    ap.add_argument("--primary", metavar="SUBSYSTEM", help="default primary subsystem (queries may pass primary=…)")
+    ap.add_argument("--poll", type=float, default=2.0, metavar="SECONDS",
+                    help="how often IngestManifest is checked for re-ingested workbooks")
+    add_arguments(ap)
+    args = ap.parse_args()
+    metrics = configure("trace_service", args)
+
+    service = TraceService(LinkStore(get_database()), args.primary, args.poll)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)   # `kill` stops it like Ctrl-C
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.socket))
+    except KeyboardInterrupt:
+        log("Stopped")
+    finally:
+        metrics.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,84 +1,97 @@
 # traceability_engine.py — EXACT MATCHING + AUTOMATIC MULTIPLE EMISSIONS
+import argparse
+import sys
 import pandas as pd
-import mariadb
-import yaml
 from pathlib import Path
-import os
 
-print("TN-MBSE 2025 — EXACT MATCHING + AUTOMATIC MULTIPLE EMISSIONS")
-print("="*80)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "01-Mariadb-setup"))
+from db_access import get_database
+from instrumentation import add_arguments, configure, count, log, timer
+
+from decisions_store import DecisionStore
+from flux_index import FluxIndex, SpecJoinLookup, SqlFluxLookup
+from fuzzy_match import FluxNameMatcher, add_suggestions
+from report_writer import SIBLING_FORMATS, ReportWriter, write_siblings
 
 # === CONFIG ===
 SPEC_EXCEL = Path("../data/output_diagrams/Spec_translated.xlsx")
-DB_CONFIG = Path("../01-mariadb-setup/config/database.yaml")
+SPEC_PARQUET = Path("../data/output_diagrams/Spec_translated.parquet")
 OUTPUT_FILE = Path("../data/output_diagrams/FINAL_TRACEABILITY_REPORT.xlsx")
+REVIEW_FILE = Path("../data/output_diagrams/PENDING_DECISIONS.csv")
+SWEEP_FILE = Path("../data/output_diagrams/TRACEABILITY_ALL_SUBSYSTEMS.xlsx")
+STATE_FILE = Path("../data/output_diagrams/TRACEABILITY_STATE.json")
+SPEC_DB_SQL = """
+    SELECT d.spec_file, f.fct_tag, f.flow_title, f.direction, f.preview
+    FROM SpecFlows f
+    JOIN SpecDocuments d ON d.id = f.spec_id
+    ORDER BY f.spec_id, f.spec_row
+"""
+LOOKUPS = {"index": FluxIndex.load, "sql": SqlFluxLookup, "join": SpecJoinLookup.load}
 
-# Load spec flows
-if not SPEC_EXCEL.exists():
-    print(f"ERROR: Spec file not found: {SPEC_EXCEL}")
-    exit()
-
-df_spec = pd.read_excel(SPEC_EXCEL)
-print(f"Loaded {len(df_spec)} flows from spec")
-
-# Load DB config
-with open(DB_CONFIG) as f:
-    db_cfg = yaml.safe_load(f)
-
-conn = mariadb.connect(**db_cfg)
-cur = conn.cursor()
-
-# Get all subsystems
-cur.execute("SELECT id, name FROM Subsystems ORDER BY name")
-subsystems = {name: sid for sid, name in cur.fetchall()}
-print(f"Found subsystems: {list(subsystems.keys())}")
-
-# User selects primary subsystem
-print("\nSELECT PRIMARY SUBSYSTEM FOR SEARCH:")
-for i, name in enumerate(subsystems.keys(), 1):
-    print(f"  {i}. {name}")
-choice = int(input("\nEnter number: ")) - 1
-primary_ss_name = list(subsystems.keys())[choice]
-primary_ss_id = subsystems[primary_ss_name]
-
-print(f"\nPRIMARY SUBSYSTEM SELECTED → {primary_ss_name}")
-print("Search logic:")
-print("  - CONSUMED: Find emitters in primary SS → if multiple, ask user")
-print("  - EMITTED: Find ALL consumers automatically (multiple connections OK)")
-print("  - ⚠️  USING EXACT FLUX NAME MATCHING ONLY")
-print()
-
-# Prepare results
-results = []
-ambiguous_cases = []
 
-# Helper: find emitters of a flow (with EXACT matching)
-def find_emitters(flow_name, spec_fct):
-    sql = """
-    SELECT s.name, f.fct_tag, fx.name
-    FROM FluxEmissions fe
-    JOIN Functions f ON fe.emitter_func_id = f.id
-    JOIN Subsystems s ON f.subsystem_id = s.id
-    JOIN Fluxes fx ON fe.flux_id = fx.id
-    WHERE fx.name = ?
-    """
-    cur.execute(sql, (flow_name,))
-    matches = cur.fetchall()
-    
-    if not matches:
+def load_spec():
+    """Spec flows — Parquet handoff from the extractor, Excel as fallback. None if missing."""
+    if SPEC_PARQUET.exists() and (not SPEC_EXCEL.exists() or SPEC_PARQUET.stat().st_mtime >= SPEC_EXCEL.stat().st_mtime):
+        df_spec = pd.read_parquet(SPEC_PARQUET)
+        spec_source = SPEC_PARQUET
+    elif SPEC_EXCEL.exists():
+        df_spec = pd.read_excel(SPEC_EXCEL)
+        spec_source = SPEC_EXCEL
+    else:
+        print(f"ERROR: Spec file not found: {SPEC_PARQUET} / {SPEC_EXCEL}")
         return None
-    
-    # Priority 1: Emitters in primary subsystem
-    primary_ss_matches = [m for m in matches if m[0] == primary_ss_name]
-    
+    log(f"Loaded {len(df_spec)} flows from spec ({spec_source.name})")
+    return df_spec
+
+
+def load_spec_db(cur):
+    """Spec flows from SpecFlows (docx_to_excel_mirror.py --to-db), in spec file order. None if empty."""
+    cur.execute(SPEC_DB_SQL)
+    rows = cur.fetchall()
+    if not rows:
+        print("ERROR: SpecFlows is empty — run docx_to_excel_mirror.py --to-db first")
+        return None
+    df_spec = pd.DataFrame(rows, columns=["Spec File", "Function", "Flow Title", "Direction", "Preview"])
+    # Same order as the extractor's sorted .docx files (a reloaded document gets a new spec_id)
+    df_spec = df_spec.sort_values("Spec File", kind="stable").reset_index(drop=True)
+    log(f"Loaded {len(df_spec)} flows from spec tables ({df_spec['Spec File'].nunique()} documents)")
+    return df_spec
+
+
+def connect():
+    """Pooled connection from the shared data-access layer (db_access.py)."""
+    return get_database().connect()
+
+
+def load_subsystems(cur):
+    cur.execute("SELECT id, name FROM Subsystems ORDER BY name")
+    return {name: sid for sid, name in cur.fetchall()}
+
+
+def primary_from_name(subsystems, name):
+    """Primary subsystem given on the command line (case-insensitive), None if unknown."""
+    return next((ss for ss in subsystems if ss.upper() == name.strip().upper()), None)
+
+
+def choose_primary(subsystems):
+    # User selects primary subsystem
+    print("\nSELECT PRIMARY SUBSYSTEM FOR SEARCH:")
+    for i, name in enumerate(subsystems.keys(), 1):
+        print(f"  {i}. {name}")
+    choice = int(input("\nEnter number: ")) - 1
+    return list(subsystems.keys())[choice]
+
+
+# Helper: find emitters of a flow (with EXACT matching)
+def find_emitters(lookup, flow_name, spec_fct, primary_ss_name):
+    # Priority 1: Emitters in primary subsystem / Priority 2: Emitters anywhere else
+    primary_ss_matches, other_matches = lookup.emitters(flow_name, primary_ss_name)
+
     if len(primary_ss_matches) == 1:
         return primary_ss_matches[0]
     elif len(primary_ss_matches) > 1:
         return ("AMBIGUOUS_PRIMARY", primary_ss_matches, f"FCT_{spec_fct} in {primary_ss_name} consumes FLUX {flow_name} FROM:")
-    
-    # Priority 2: Emitters anywhere else
-    other_matches = [m for m in matches if m[0] != primary_ss_name]
-    
+
     if len(other_matches) == 1:
         return other_matches[0] + (f"(outside {primary_ss_name})",)
     elif len(other_matches) > 1:
@@ -86,270 +99,387 @@ def find_emitters(flow_name, spec_fct):
     else:
         return None
 
+
 # Helper: find ALL consumers of a flow (with EXACT matching) - AUTOMATIC MULTIPLE
-def find_all_consumers(flow_name, spec_fct):
-    sql = """
-    SELECT s.name, f.fct_tag, fx.name
-    FROM FluxConsumptions fc
-    JOIN Functions f ON fc.consumer_func_id = f.id
-    JOIN Subsystems s ON f.subsystem_id = s.id
-    JOIN Fluxes fx ON fc.flux_id = fx.id
-    WHERE fx.name = ?
-    """
-    cur.execute(sql, (flow_name,))
-    matches = cur.fetchall()
-    
-    if not matches:
-        return None
-    
-    # Filter out SD_ functions and subsystem-named functions
-    valid_matches = []
-    for match in matches:
-        ss_name, fct_tag, flux_name = match
-        
-        # Skip SD_ tagged functions
-        if fct_tag.startswith('SD_'):
-            continue
-            
-        # Skip functions named exactly like the subsystem
-        if fct_tag.upper() == primary_ss_name.upper():
-            continue
-            
-        valid_matches.append(match)
-    
-    return valid_matches
+def find_all_consumers(lookup, flow_name, spec_fct, primary_ss_name):
+    # SD_ functions and subsystem-named functions are filtered out by the lookup
+    return lookup.consumers(flow_name, primary_ss_name)
 
-# Main traceability logic - FIRST PASS: Collect all data
-print("\n" + "="*80)
-print("PHASE 1: ANALYZING FLOWS AND COLLECTING AMBIGUOUS CASES")
-print("="*80)
 
-for idx, row in df_spec.iterrows():
-    spec_fct = row["Function"]
-    flow = row["Flow Title"]
-    direction = row["Direction"]
+def classify(rows, lookup, primary_ss_name, results, ambiguous_cases):
+    """PHASE 1 for spec rows (mappings) — appends their connection rows (and ambiguous cases)."""
+    for row in rows:
+        spec_fct = row["Function"]
+        flow = row["Flow Title"]
+        direction = row["Direction"]
 
-    if direction == "CONSUMPTION":
-        # FCT consumes flux → find emitter (EXACT MATCH + USER CHOICE IF MULTIPLE)
-        match = find_emitters(flow, spec_fct)
-        
-        if match is None:
-            results.append({
-                "Spec File": row["Spec File"],
-                "FCT": spec_fct,
-                "Flow": flow,
-                "Direction": direction,
-                "Status": "MISSING",
-                "Found In Subsystem": "",
-                "Found In FCT": "",
-                "Comment": f"No emitter found for consumed flux"
-            })
-        elif match[0] == "AMBIGUOUS_PRIMARY":
-            # Store placeholder - will be resolved by user
-            result_idx = len(results)
-            results.append({
-                "Spec File": row["Spec File"],
-                "FCT": spec_fct,
-                "Flow": flow,
-                "Direction": direction,
-                "Status": "PENDING_USER_CHOICE",
-                "Found In Subsystem": "",
-                "Found In FCT": "",
-                "Comment": f"Awaiting user selection from {len(match[1])} options"
-            })
-            ambiguous_cases.append({
-                "result_idx": result_idx,
-                "spec_file": row["Spec File"],
-                "spec_fct": spec_fct,
-                "flow": flow,
-                "question": match[2],
-                "options": match[1],
-                "type": "CONSUMPTION"
-            })
-        elif match[0] == "AMBIGUOUS_OTHER":
-            # Store placeholder - will be resolved by user
-            result_idx = len(results)
-            results.append({
-                "Spec File": row["Spec File"],
-                "FCT": spec_fct,
-                "Flow": flow,
-                "Direction": direction,
-                "Status": "PENDING_USER_CHOICE",
-                "Found In Subsystem": "",
-                "Found In FCT": "",
-                "Comment": f"Awaiting user selection from {len(match[1])} options"
-            })
-            ambiguous_cases.append({
-                "result_idx": result_idx,
-                "spec_file": row["Spec File"],
-                "spec_fct": spec_fct,
-                "flow": flow,
-                "question": match[2],
-                "options": match[1],
-                "type": "CONSUMPTION"
-            })
-        else:
-            results.append({
-                "Spec File": row["Spec File"],
-                "FCT": spec_fct,
-                "Flow": flow,
-                "Direction": direction,
-                "Status": "FOUND",
-                "Found In Subsystem": match[0],
-                "Found In FCT": match[1],
-                "Comment": match[3] if len(match) > 3 else ""
-            })
-
-    else:  # EMISSION
-        # FCT emits flux → find ALL consumers (AUTOMATIC MULTIPLE CONNECTIONS)
-        matches = find_all_consumers(flow, spec_fct)
-        
-        if not matches:
-            results.append({
-                "Spec File": row["Spec File"],
-                "FCT": spec_fct,
-                "Flow": flow,
-                "Direction": direction,
-                "Status": "MISSING",
-                "Found In Subsystem": "",
-                "Found In FCT": "",
-                "Comment": "No valid consumer found"
-            })
-        else:
-            # Create one row for EACH consumer connection (AUTOMATIC)
-            for match in matches:
-                ss_name, fct_tag, flux_name = match
-                location = "primary SS" if ss_name == primary_ss_name else f"outside {primary_ss_name}"
-                
+        if direction == "CONSUMPTION":
+            # FCT consumes flux → find emitter (EXACT MATCH + USER CHOICE IF MULTIPLE)
+            match = find_emitters(lookup, flow, spec_fct, primary_ss_name)
+
+            if match is None:
+                results.append({
+                    "Spec File": row["Spec File"],
+                    "FCT": spec_fct,
+                    "Flow": flow,
+                    "Direction": direction,
+                    "Status": "MISSING",
+                    "Found In Subsystem": "",
+                    "Found In FCT": "",
+                    "Comment": f"No emitter found for consumed flux"
+                })
+            elif match[0] == "AMBIGUOUS_PRIMARY":
+                # Store placeholder - will be resolved by user
+                result_idx = len(results)
+                results.append({
+                    "Spec File": row["Spec File"],
+                    "FCT": spec_fct,
+                    "Flow": flow,
+                    "Direction": direction,
+                    "Status": "PENDING_USER_CHOICE",
+                    "Found In Subsystem": "",
+                    "Found In FCT": "",
+                    "Comment": f"Awaiting user selection from {len(match[1])} options"
+                })
+                ambiguous_cases.append({
+                    "result_idx": result_idx,
+                    "spec_file": row["Spec File"],
+                    "spec_fct": spec_fct,
+                    "flow": flow,
+                    "question": match[2],
+                    "options": match[1],
+                    "type": "CONSUMPTION"
+                })
+            elif match[0] == "AMBIGUOUS_OTHER":
+                # Store placeholder - will be resolved by user
+                result_idx = len(results)
+                results.append({
+                    "Spec File": row["Spec File"],
+                    "FCT": spec_fct,
+                    "Flow": flow,
+                    "Direction": direction,
+                    "Status": "PENDING_USER_CHOICE",
+                    "Found In Subsystem": "",
+                    "Found In FCT": "",
+                    "Comment": f"Awaiting user selection from {len(match[1])} options"
+                })
+                ambiguous_cases.append({
+                    "result_idx": result_idx,
+                    "spec_file": row["Spec File"],
+                    "spec_fct": spec_fct,
+                    "flow": flow,
+                    "question": match[2],
+                    "options": match[1],
+                    "type": "CONSUMPTION"
+                })
+            else:
                 results.append({
                     "Spec File": row["Spec File"],
                     "FCT": spec_fct,
                     "Flow": flow,
                     "Direction": direction,
                     "Status": "FOUND",
-                    "Found In Subsystem": ss_name,
-                    "Found In FCT": fct_tag,
-                    "Comment": f"Consumer in {location}"
+                    "Found In Subsystem": match[0],
+                    "Found In FCT": match[1],
+                    "Comment": match[3] if len(match) > 3 else ""
+                })
+
+        else:  # EMISSION
+            # FCT emits flux → find ALL consumers (AUTOMATIC MULTIPLE CONNECTIONS)
+            matches = find_all_consumers(lookup, flow, spec_fct, primary_ss_name)
+
+            if not matches:
+                results.append({
+                    "Spec File": row["Spec File"],
+                    "FCT": spec_fct,
+                    "Flow": flow,
+                    "Direction": direction,
+                    "Status": "MISSING",
+                    "Found In Subsystem": "",
+                    "Found In FCT": "",
+                    "Comment": "No valid consumer found"
                 })
+            else:
+                # Create one row for EACH consumer connection (AUTOMATIC)
+                for match in matches:
+                    ss_name, fct_tag, flux_name = match
+                    location = "primary SS" if ss_name == primary_ss_name else f"outside {primary_ss_name}"
+
+                    results.append({
+                        "Spec File": row["Spec File"],
+                        "FCT": spec_fct,
+                        "Flow": flow,
+                        "Direction": direction,
+                        "Status": "FOUND",
+                        "Found In Subsystem": ss_name,
+                        "Found In FCT": fct_tag,
+                        "Comment": f"Consumer in {location}"
+                    })
+
+
+def analyze(df_spec, lookup, primary_ss_name):
+    """PHASE 1 — one result row per connection + the ambiguous consumption cases."""
+    results = []
+    ambiguous_cases = []
+
+    classify((row for _, row in df_spec.iterrows()), lookup, primary_ss_name, results, ambiguous_cases)
+
+    return results, ambiguous_cases
 
-# === PHASE 2: USER RESOLVES AMBIGUOUS CONSUMPTION CASES ===
-if ambiguous_cases:
-    print(f"\n{'='*80}")
-    print(f"PHASE 2: RESOLVING {len(ambiguous_cases)} AMBIGUOUS CONSUMPTION CASES")
-    print(f"(Emissions are handled automatically with multiple connections)")
-    print(f"{'='*80}")
+
+def apply_choice(results, case, chosen, comment):
+    result = results[case['result_idx']]
+    if chosen:
+        result["Found In Subsystem"] = chosen[0]
+        result["Found In FCT"] = chosen[1]
+        result["Status"] = "FOUND"
+    else:
+        result["Status"] = "MISSING"
+        result["Found In Subsystem"] = ""
+        result["Found In FCT"] = ""
+    result["Comment"] = comment
+
+
+def resolve_from_store(results, ambiguous_cases, store):
+    """PHASE 2 (BATCH) — replay recorded decisions; returns the undecided cases."""
+    pending = []
+    for case in ambiguous_cases:
+        decided, chosen = store.lookup(case['spec_fct'], case['flow'], case['options'])
+        if not decided:
+            result = results[case['result_idx']]
+            result["Status"] = "PENDING"
+            result["Comment"] = f"Awaiting decision in {REVIEW_FILE.name} ({len(case['options'])} options)"
+            pending.append(case)
+        elif chosen:
+            apply_choice(results, case, chosen, f"Recorded decision from {len(case['options'])} options")
+        else:
+            apply_choice(results, case, None, "Recorded decision: no correct emitter found")
+    return pending
+
+
+def resolve_interactively(results, ambiguous_cases, store=None):
+    """PHASE 2 — USER RESOLVES AMBIGUOUS CONSUMPTION CASES (answers are recorded in the store)"""
+    if ambiguous_cases:
+        print(f"\n{'='*80}")
+        print(f"PHASE 2: RESOLVING {len(ambiguous_cases)} AMBIGUOUS CONSUMPTION CASES")
+        print(f"(Emissions are handled automatically with multiple connections)")
+        print(f"{'='*80}")
     
-    for i, case in enumerate(ambiguous_cases):
-        print(f"\n{'─'*60}")
-        print(f"CASE {i+1}/{len(ambiguous_cases)}")
-        print(f"{'─'*60}")
-        print(f"Spec Function: FCT_{case['spec_fct']}")
-        print(f"Consuming Flux: {case['flow']}")
-        print(f"\n{case['question']}")
-        print(f"\nAvailable emitters:")
+        for i, case in enumerate(ambiguous_cases):
+            print(f"\n{'─'*60}")
+            print(f"CASE {i+1}/{len(ambiguous_cases)}")
+            print(f"{'─'*60}")
+            print(f"Spec Function: FCT_{case['spec_fct']}")
+            print(f"Consuming Flux: {case['flow']}")
+            print(f"\n{case['question']}")
+            print(f"\nAvailable emitters:")
         
-        for j, opt in enumerate(case["options"], 1):
-            ss, fct, flux = opt
-            print(f"  {j}. Function: {fct}")
-            print(f"     Subsystem: {ss}")
-            print(f"     Emits: {flux}")
-            print()
+            for j, opt in enumerate(case["options"], 1):
+                ss, fct, flux = opt
+                print(f"  {j}. Function: {fct}")
+                print(f"     Subsystem: {ss}")
+                print(f"     Emits: {flux}")
+                print()
         
-        print(f"  {len(case['options'])+1}. ❌ MARK AS MISSING (no correct option)")
+            print(f"  {len(case['options'])+1}. ❌ MARK AS MISSING (no correct option)")
         
-        while True:
-            try:
-                choice = int(input(f"\nYour choice (1-{len(case['options'])+1}): "))
-                if 1 <= choice <= len(case['options'])+1:
-                    break
-                print(f"Please enter a number between 1 and {len(case['options'])+1}")
-            except ValueError:
-                print("Please enter a valid number")
+            while True:
+                try:
+                    choice = int(input(f"\nYour choice (1-{len(case['options'])+1}): "))
+                    if 1 <= choice <= len(case['options'])+1:
+                        break
+                    print(f"Please enter a number between 1 and {len(case['options'])+1}")
+                except ValueError:
+                    print("Please enter a valid number")
         
-        result_idx = case['result_idx']
-        
-        if choice <= len(case['options']):
-            chosen = case['options'][choice-1]
-            results[result_idx]["Found In Subsystem"] = chosen[0]
-            results[result_idx]["Found In FCT"] = chosen[1]
-            results[result_idx]["Status"] = "FOUND"
-            results[result_idx]["Comment"] = f"User selected from {len(case['options'])} options"
-            print(f"✅ Selected: {chosen[1]} in {chosen[0]}")
+            if choice <= len(case['options']):
+                chosen = case['options'][choice-1]
+                apply_choice(results, case, chosen, f"User selected from {len(case['options'])} options")
+                print(f"✅ Selected: {chosen[1]} in {chosen[0]}")
+            else:
+                chosen = None
+                apply_choice(results, case, None, "User marked as missing - no correct emitter found")
+                print(f"❌ Marked as MISSING")
+
+            if store:
+                store.record(case['spec_fct'], case['flow'], case['options'], chosen)
+                store.conn.commit()
+
+
+def export_report(df_final, output_file, siblings=(), df_changes=None):
+    # Streamed workbook, Status colours as conditional formatting
+    with ReportWriter(output_file) as report:
+        report.add_sheet('Traceability', df_final)
+        if df_changes is not None:
+            report.add_sheet('Status Changes', df_changes)
+    for path in write_siblings(df_final, output_file, siblings):
+        log(f"   Sibling export → {path.resolve()}")
+
+
+def run_trace(cur, df_spec, primary_ss_name, store, lookup_mode="index", batch=False, suggest=False, siblings=(),
+              incremental=False, output_folder=OUTPUT_FILE.parent):
+    """Phases 1-2 and the report for one primary. Returns (df_final, pending cases)."""
+    output_file = output_folder / OUTPUT_FILE.name
+    review_file = output_folder / REVIEW_FILE.name
+
+    with timer("traceability/flux index load"):
+        lookup = LOOKUPS[lookup_mode](cur)
+
+    # Main traceability logic - FIRST PASS: Collect all data
+    log("\n" + "="*80)
+    log("PHASE 1: ANALYZING FLOWS AND COLLECTING AMBIGUOUS CASES")
+    log("="*80)
+    with timer("traceability/lookup"):
+        if incremental:
+            from incremental_trace import ResultStore, status_changes
+            result_store = ResultStore(output_folder / STATE_FILE.name).load()
+            results, ambiguous_cases = result_store.analyze(df_spec, lookup, primary_ss_name)
+            count("rows_reclassified", result_store.recomputed)
+            log(f"Incremental: {result_store.recomputed} spec rows reclassified | {result_store.reused} carried over")
         else:
-            results[result_idx]["Status"] = "MISSING"
-            results[result_idx]["Found In Subsystem"] = ""
-            results[result_idx]["Found In FCT"] = ""
-            results[result_idx]["Comment"] = "User marked as missing - no correct emitter found"
-            print(f"❌ Marked as MISSING")
-
-# Final DataFrame and export
-df_final = pd.DataFrame(results)
-
-# Color coding
-def color_status(val):
-    if "FOUND" in val:
-        return 'background-color: #d4edda'  # green
-    elif "MISSING" in val:
-        return 'background-color: #f8d7da'  # red
+            results, ambiguous_cases = analyze(df_spec, lookup, primary_ss_name)
+    count("ambiguous_cases", len(ambiguous_cases))
+
+    pending = []
+    if batch:
+        pending = resolve_from_store(results, ambiguous_cases, store)
+        log(f"\nPHASE 2 (BATCH): {len(ambiguous_cases) - len(pending)} ambiguous cases replayed | {len(pending)} PENDING")
+        n = store.write_review_file(review_file, pending)
+        if n:
+            log(f"   {n} open questions written → {review_file.resolve()}")
+    elif ambiguous_cases:
+        # Already-decided cases are replayed, only new questions are asked
+        open_cases = resolve_from_store(results, ambiguous_cases, store)
+        resolve_interactively(results, open_cases, store)
+
+    # Final DataFrame and export
+    df_final = pd.DataFrame(results)
+    if suggest:
+        with timer("traceability/suggestions"):
+            df_final = add_suggestions(df_final, FluxNameMatcher.load(cur))
+    df_changes = None
+    if incremental:
+        df_changes = status_changes(result_store.final, df_final)
+        result_store.save(df_final)
+        log(f"Status changes since last run: {len(df_changes)}")
+    with timer("traceability/report write"):
+        export_report(df_final, output_file, siblings, df_changes)
+    count("connections", len(df_final))
+    count("found", int(df_final['Status'].str.contains('FOUND').sum()) if len(df_final) else 0)
+    count("pending", len(pending))
+    return df_final, len(pending)
+
+
+def print_summary(df_spec, df_final, primary_ss_name, output_file, pending=0, review_file=REVIEW_FILE):
+    # Summary statistics
+    total_connections = len(df_final)
+    found_connections = len(df_final[df_final['Status'].str.contains('FOUND')])
+    missing_connections = len(df_final[df_final['Status'].str.contains('MISSING')])
+    unique_flows_checked = df_spec['Flow Title'].nunique()
+
+    print("\n" + "="*80)
+    print("FINAL TRACEABILITY REPORT COMPLETE")
+    print("="*80)
+    print(f"   Primary Subsystem      : {primary_ss_name}")
+    print(f"   Unique flows checked   : {unique_flows_checked}")
+    print(f"   Total connections      : {total_connections}")
+    print(f"   ✅ Found connections    : {found_connections} ({100*found_connections/total_connections:.1f}%)")
+    print(f"   ❌ Missing connections  : {missing_connections} ({100*missing_connections/total_connections:.1f}%)")
+    if pending:
+        print(f"   ⏳ Pending decisions    : {pending} → answer {review_file.resolve()} and rerun with --import-decisions")
+    print(f"\n   REPORT SAVED → {output_file.resolve()}")
+    print("="*80)
+    print("PROCESSING LOGIC:")
+    print("   ✅ CONSUMED: Exact matching + user choice if multiple emitters")
+    print("   ✅ EMITTED: Exact matching + automatic multiple consumers")
+    print("   ✅ Filtered out SD_ and subsystem-named functions")
+    if pending:
+        print("   ⏳ Undecided ambiguous consumption cases left as PENDING (batch mode)")
     else:
-        return 'background-color: #fff3cd'  # amber
+        print("   ✅ All ambiguous consumption cases resolved (interactively or from recorded decisions)")
+    print("\n📊 OPEN THE EXCEL FILE TO REVIEW TRACEABILITY MATRIX")
+    print("="*80)
 
-# Save with styling
-with pd.ExcelWriter(OUTPUT_FILE, engine='openpyxl') as writer:
-    df_final.to_excel(writer, index=False, sheet_name='Traceability')
-    
-    # Get the workbook and worksheet
-    workbook = writer.book
-    worksheet = writer.sheets['Traceability']
-    
-    # Apply styling
-    from openpyxl.styles import PatternFill
-    
-    green_fill = PatternFill(start_color='d4edda', end_color='d4edda', fill_type='solid')
-    red_fill = PatternFill(start_color='f8d7da', end_color='f8d7da', fill_type='solid')
-    
-    # Find Status column (should be column E, index 5)
-    status_col_idx = list(df_final.columns).index('Status') + 1
-    
-    for row_idx, row in enumerate(df_final.itertuples(), start=2):
-        if 'FOUND' in row.Status:
-            worksheet.cell(row=row_idx, column=status_col_idx).fill = green_fill
-        elif 'MISSING' in row.Status:
-            worksheet.cell(row=row_idx, column=status_col_idx).fill = red_fill
-    
-    # Auto-adjust column widths
-    for column in worksheet.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(cell.value)
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        worksheet.column_dimensions[column_letter].width = adjusted_width
-
-# Summary statistics
-total_connections = len(df_final)
-found_connections = len(df_final[df_final['Status'].str.contains('FOUND')])
-missing_connections = len(df_final[df_final['Status'].str.contains('MISSING')])
-unique_flows_checked = df_spec['Flow Title'].nunique()
-
-print("\n" + "="*80)
-print("FINAL TRACEABILITY REPORT COMPLETE")
-print("="*80)
-print(f"   Primary Subsystem      : {primary_ss_name}")
-print(f"   Unique flows checked   : {unique_flows_checked}")
-print(f"   Total connections      : {total_connections}")
-print(f"   ✅ Found connections    : {found_connections} ({100*found_connections/total_connections:.1f}%)")
-print(f"   ❌ Missing connections  : {missing_connections} ({100*missing_connections/total_connections:.1f}%)")
-print(f"\n   REPORT SAVED → {OUTPUT_FILE.resolve()}")
-print("="*80)
-print("PROCESSING LOGIC:")
-print("   ✅ CONSUMED: Exact matching + user choice if multiple emitters")
-print("   ✅ EMITTED: Exact matching + automatic multiple consumers")
-print("   ✅ Filtered out SD_ and subsystem-named functions")
-print("   ✅ User resolved all ambiguous consumption cases interactively")
-print("\n📊 OPEN THE EXCEL FILE TO REVIEW TRACEABILITY MATRIX")
-print("="*80)
\ No newline at end of file
+
+def main():
+    ap = argparse.ArgumentParser(description="Spec ↔ MariaDB traceability engine")
+    ap.add_argument("--lookup", choices=list(LOOKUPS), default="index",
+                    help="index: load all links in two queries and answer from memory (default); sql: one FluxLinks range scan per spec row; "
+                         "join: spec rows from SpecFlows (docx_to_excel_mirror.py --to-db) matched in one SpecFlows ⟕ FluxLinks query")
+    ap.add_argument("--primary", metavar="SUBSYSTEM", help="primary subsystem (skips the interactive choice)")
+    ap.add_argument("--batch", action="store_true",
+                    help="never prompt: replay recorded decisions, write undecided cases to the review file as PENDING")
+    ap.add_argument("--import-decisions", type=Path, metavar="CSV",
+                    help="store the answered rows of a review file before running")
+    ap.add_argument("--all-primaries", type=int, nargs="?", const=0, default=None, metavar="N",
+                    help="sweep every subsystem as primary in N processes (default: all cores), batch decisions, one sheet each")
+    ap.add_argument("--suggest", action="store_true",
+                    help="add a 'Suggested Flux' column with near-miss flux names for MISSING rows")
+    ap.add_argument("--siblings", nargs="+", choices=SIBLING_FORMATS, default=[], metavar="FORMAT",
+                    help="also write the report table as csv and/or parquet next to the .xlsx")
+    ap.add_argument("--incremental", action="store_true",
+                    help=f"only reclassify spec rows whose inputs changed since the last run ({STATE_FILE.name}), "
+                         "add a 'Status Changes' sheet")
+    add_arguments(ap)
+    args = ap.parse_args()
+    if args.batch and not args.primary:
+        ap.error("--batch needs --primary")
+    if args.incremental and (args.lookup != "index" or args.all_primaries is not None):
+        ap.error("--incremental needs the index lookup and a single primary")
+    metrics = configure("traceability", args)
+
+    log("TN-MBSE 2025 — EXACT MATCHING + AUTOMATIC MULTIPLE EMISSIONS")
+    log("="*80)
+
+    conn = connect()
+    cur = get_database().cursor(conn)
+
+    with timer("traceability/spec load"):
+        df_spec = load_spec_db(cur) if args.lookup == "join" else load_spec()
+    if df_spec is None:
+        return
+    count("spec_rows", len(df_spec))
+
+    # Get all subsystems
+    subsystems = load_subsystems(cur)
+    log(f"Found subsystems: {list(subsystems.keys())}")
+
+    store = DecisionStore(conn, cur).load()
+    if args.import_decisions:
+        imported, invalid = store.import_review_file(args.import_decisions)
+        log(f"Imported {imported} decisions from {args.import_decisions} ({invalid} invalid answers ignored)")
+
+    if args.all_primaries is not None:
+        from subsystem_sweep import run_sweep
+        matcher = FluxNameMatcher.load(cur) if args.suggest else None
+        with timer("traceability/flux index load"):
+            index = FluxIndex.load(cur)
+        with timer("traceability/sweep"):
+            run_sweep(df_spec, index, subsystems, store, SWEEP_FILE, REVIEW_FILE, args.all_primaries,
+                      matcher, args.siblings)
+        metrics.finish()
+        return
+
+    if args.primary:
+        primary_ss_name = primary_from_name(subsystems, args.primary)
+        if primary_ss_name is None:
+            print(f"ERROR: unknown subsystem '{args.primary}'")
+            return
+    else:
+        primary_ss_name = choose_primary(subsystems)
+
+    log(f"\nPRIMARY SUBSYSTEM SELECTED → {primary_ss_name}")
+    log("Search logic:")
+    log("  - CONSUMED: Find emitters in primary SS → if multiple, ask user")
+    log("  - EMITTED: Find ALL consumers automatically (multiple connections OK)")
+    log("  - ⚠️  USING EXACT FLUX NAME MATCHING ONLY")
+    log("")
+
+    df_final, pending = run_trace(cur, df_spec, primary_ss_name, store, args.lookup, args.batch, args.suggest,
+                                  args.siblings, args.incremental)
+    print_summary(df_spec, df_final, primary_ss_name, OUTPUT_FILE, pending)
+    metrics.finish()
+
+
+if __name__ == "__main__":
+    main()
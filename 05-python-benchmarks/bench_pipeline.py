@@ -0,0 +1,190 @@
+# bench_pipeline.py — SYNTHETIC-SCALE BENCHMARK OF THE FOUR PIPELINE STAGES
+#
+# For every scale: generate a synthetic model (synthetic_model.py) into a
+# scratch copy of the data/ layout, then run the real stage scripts one after
+# the other — schema init, Excel ingestion, DOCX extraction, traceability — as
+# subprocesses whose working directory mirrors the repo layout, so their
+# "../data/…" paths land in the scratch folder. The database is SQLite by
+# default (db_access.py backend), so no server is needed.
+#
+# Wall time and peak RSS (os.wait4 rusage of each stage process; 0 on
+# Windows, which has no wait4) are appended to results/benchmarks.jsonl
+# together with the git commit, so every run can be compared with the
+# previous one of the same scale (--compare).
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "01-Mariadb-setup"))
+from instrumentation import rusage_peak_bytes
+
+from synthetic_model import ModelParams, generate
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+RESULTS_FILE = Path(__file__).resolve().parent / "results" / "benchmarks.jsonl"
+SCALES = {"small": 1, "medium": 10, "large": 50}
+REGRESSION_PCT = 20.0
+NOISE_S = 0.1          # slowdowns smaller than this are never flagged
+
+
+def stages(primary):
+    """(name, stage folder, script + args) in pipeline order."""
+    return [
+        ("schema init", "01-Mariadb-setup", ["init_mariadb.py"]),
+        ("excel ingest", "02-python-excel-parser", ["parser_excel_to_mariadb.py", "--bulk"]),
+        ("docx extraction", "03-python-doxTo-excel", ["docx_to_excel_mirror.py", "--no-cache", "--no-excel"]),
+        ("traceability", "04-python-tracability", ["traceability_engine.py", "--primary", primary, "--batch"]),
+    ]
+
+
+def git_commit():
+    def git(*args):
+        out = subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True)
+        return out.stdout.strip() if out.returncode == 0 else ""
+    return git("rev-parse", "--short", "HEAD") or "unknown", bool(git("status", "--porcelain", "--untracked-files=no"))
+
+
+def run_stage(workspace, folder, command, env):
+    """Run one stage script; returns (seconds, peak RSS MiB, exit status, stderr tail)."""
+    cwd = workspace / folder
+    cwd.mkdir(exist_ok=True)
+    script = REPO_ROOT / folder / command[0]
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, str(script), *command[1:]], cwd=cwd, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    stderr = proc.stderr.read()
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        peak_mb = rusage_peak_bytes(usage) / 2**20
+    else:
+        proc.wait()
+        peak_mb = 0.0
+    seconds = time.perf_counter() - start
+    return seconds, peak_mb, proc.returncode, stderr[-2000:]
+
+
+def bench_scale(name, params, workspace, backend, repeat):
+    print(f"\n{'='*80}\nSCALE {name}: {params.functions} functions × {params.subsystems} subsystems | "
+          f"{params.fluxes} fluxes | fan-out {params.fan_out} | ambiguity {params.ambiguity:.0%}")
+    print("="*80)
+    workspace.mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+    model, sizes = generate(params, workspace / "data")
+    print(f"   Generated in {time.perf_counter() - t0:.1f}s → " + " | ".join(f"{k}: {v}" for k, v in sizes.items()))
+
+    env = {**os.environ, "MBSE_DB_BACKEND": backend, "PYTHONUNBUFFERED": "1"}
+    if backend == "sqlite":
+        env["MBSE_SQLITE_PATH"] = str(workspace / "bench.sqlite")
+
+    results = {}
+    for _ in range(repeat):
+        for stage, folder, command in stages(model.primary):
+            seconds, peak_mb, code, stderr = run_stage(workspace, folder, command, env)
+            best = results.get(stage)
+            if code:
+                print(f"   ❌ {stage} failed (exit {code}):\n{stderr}")
+                results[stage] = {"seconds": seconds, "peak_rss_mb": round(peak_mb, 1), "ok": False}
+                return sizes, results
+            if best is None or seconds < best["seconds"]:
+                results[stage] = {"seconds": round(seconds, 3), "peak_rss_mb": round(peak_mb, 1), "ok": True}
+    for stage, r in results.items():
+        print(f"   {stage:16} {r['seconds']:9.3f}s   peak RSS {r['peak_rss_mb']:8.1f} MiB")
+    return sizes, results
+
+
+def load_results(path=RESULTS_FILE):
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def compare(records, threshold=REGRESSION_PCT):
+    """Latest run of each (scale, params, backend) against the run before it."""
+    by_key = {}
+    for rec in records:
+        key = (rec["scale"], json.dumps(rec["params"], sort_keys=True), rec["backend"])
+        by_key.setdefault(key, []).append(rec)
+    regressions = 0
+    for (scale, _, backend), runs in by_key.items():
+        if len(runs) < 2:
+            continue
+        prev, last = runs[-2], runs[-1]
+        print(f"\n{scale} ({backend}): {prev['commit']} ({prev['timestamp']}) → {last['commit']} ({last['timestamp']})")
+        for stage, r in last["stages"].items():
+            p = prev["stages"].get(stage)
+            if not p or not (p["ok"] and r["ok"]):
+                continue
+            dt = 100 * (r["seconds"] - p["seconds"]) / p["seconds"] if p["seconds"] else 0.0
+            dm = 100 * (r["peak_rss_mb"] - p["peak_rss_mb"]) / p["peak_rss_mb"] if p["peak_rss_mb"] else 0.0
+            slower = dt > threshold and r["seconds"] - p["seconds"] > NOISE_S
+            flag = "  ⚠️  REGRESSION" if slower or dm > threshold else ""
+            regressions += bool(flag)
+            print(f"   {stage:16} {p['seconds']:9.3f}s → {r['seconds']:9.3f}s ({dt:+6.1f}%) | "
+                  f"{p['peak_rss_mb']:7.1f} → {r['peak_rss_mb']:7.1f} MiB ({dm:+6.1f}%){flag}")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark init / Excel ingest / DOCX extraction / traceability at several scales")
+    ap.add_argument("--scales", nargs="+", default=["small", "medium"], metavar="SCALE",
+                    help=f"presets {', '.join(f'{k} (×{v})' for k, v in SCALES.items())} or plain multipliers")
+    defaults = ModelParams()
+    for name, value in asdict(defaults).items():
+        if name not in ("functions", "fluxes"):
+            ap.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    ap.add_argument("--functions", type=int, default=defaults.functions, help="functions per subsystem at ×1")
+    ap.add_argument("--fluxes", type=int, default=defaults.fluxes, help="fluxes at ×1")
+    ap.add_argument("--backend", choices=["sqlite", "mariadb"], default="sqlite",
+                    help="sqlite: scratch file per scale (default); mariadb: the configured server — its database is DROPPED")
+    ap.add_argument("--repeat", type=int, default=1, help="run the pipeline N times per scale, keep the fastest")
+    ap.add_argument("--workdir", type=Path, help="keep generated inputs/outputs here (default: temporary folder)")
+    ap.add_argument("--results", type=Path, default=RESULTS_FILE, help="JSON-lines history to append to")
+    ap.add_argument("--compare", action="store_true", help="only compare the last two runs of each scale and exit")
+    ap.add_argument("--threshold", type=float, default=REGRESSION_PCT, help="regression threshold in %%")
+    args = ap.parse_args()
+
+    if args.compare:
+        regressions = compare(load_results(args.results), args.threshold)
+        sys.exit(1 if regressions else 0)
+
+    base = ModelParams(**{name: getattr(args, name) for name in asdict(defaults)})
+    commit, dirty = git_commit()
+    root = args.workdir or Path(tempfile.mkdtemp(prefix="mbse_bench_"))
+    try:
+        for scale in args.scales:
+            factor = SCALES.get(scale) or float(scale)
+            params = base.scaled(factor)
+            sizes, results = bench_scale(scale, params, root / f"scale_{scale}", args.backend, args.repeat)
+            record = {
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "commit": commit + ("+dirty" if dirty else ""),
+                "python": platform.python_version(),
+                "backend": args.backend,
+                "scale": scale,
+                "params": asdict(params),
+                "sizes": sizes,
+                "stages": results,
+            }
+            args.results.parent.mkdir(parents=True, exist_ok=True)
+            with open(args.results, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print(f"\nRESULTS APPENDED → {args.results.resolve()}")
+    compare(load_results(args.results), args.threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# synthetic_model.py — REALISTIC SYNTHETIC INPUTS AT ANY SCALE
+#
+# Builds a random functional model (subsystems → functions → emitted/consumed
+# fluxes) and writes it the way the real inputs look:
+#   input_excel/<SS>_OID<n>.xlsx   title rows + blank column before the
+#                                  Function/Flow/Direction header, a few
+#                                  invalid rows (empty flow, unknown direction)
+#   specs_docx/SPEC_<n>.docx       FCT_ heading paragraphs, "Effectivity of FA:
+#                                  SD_…" summary sections (skipped by the
+#                                  extractor) and "Effectivity of FA: FCT_…"
+#                                  sections with Flow Title/Direction tables
+# The specs describe the functions of the primary subsystem (the first one);
+# a share of their flows is renamed so the engine has MISSING rows to report.
+# Same parameters + seed → same files.
+import argparse
+import random
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from docx import Document
+from openpyxl import Workbook
+
+
+@dataclass(frozen=True)
+class ModelParams:
+    subsystems: int = 6
+    functions: int = 40          # per subsystem
+    fluxes: int = 400
+    fan_out: int = 3             # average consumers per flux
+    ambiguity: float = 0.1       # share of fluxes with 2-3 emitters
+    specs: int = 4               # .docx files
+    spec_missing: float = 0.05   # share of spec flows with no counterpart in the model
+    invalid_rows: float = 0.01   # share of workbook rows the parser must skip
+    seed: int = 2025
+
+    def scaled(self, factor):
+        """Same shape, `factor` × functions and fluxes."""
+        return ModelParams(**{**asdict(self),
+                              "functions": max(1, round(self.functions * factor)),
+                              "fluxes": max(1, round(self.fluxes * factor))})
+
+
+@dataclass
+class Model:
+    subsystems: list             # names, first one is the primary
+    functions: dict              # subsystem → [fct_tag]
+    emissions: list              # (subsystem, fct_tag, flux)
+    consumptions: list
+
+    @property
+    def primary(self):
+        return self.subsystems[0]
+
+
+def build_model(params):
+    rng = random.Random(params.seed)
+    subsystems = [f"SS{i:02d}" for i in range(1, params.subsystems + 1)]
+    functions = {ss: [f"FCT_{ss}_{i:04d}" for i in range(1, params.functions + 1)] for ss in subsystems}
+    everyone = [(ss, fct) for ss in subsystems for fct in functions[ss]]
+
+    emissions, consumptions = [], []
+    for j in range(1, params.fluxes + 1):
+        flux = f"Flux Signal {j:06d}"
+        n_emitters = rng.choice((2, 3)) if rng.random() < params.ambiguity else 1
+        emitters = rng.sample(everyone, min(n_emitters, len(everyone)))
+        # 1 .. 2*fan_out-1 consumers, average fan_out
+        n_consumers = rng.randint(1, max(1, 2 * params.fan_out - 1))
+        consumers = rng.sample(everyone, min(n_consumers, len(everyone)))
+        emissions.extend((ss, fct, flux) for ss, fct in emitters)
+        consumptions.extend((ss, fct, flux) for ss, fct in consumers)
+    return Model(subsystems, functions, emissions, consumptions)
+
+
+def write_workbooks(model, params, folder):
+    """One <SS>_OID<n>.xlsx per subsystem. Returns the number of data rows written."""
+    rng = random.Random(params.seed + 1)
+    folder.mkdir(parents=True, exist_ok=True)
+    rows_by_ss = {ss: [] for ss in model.subsystems}
+    for ss, fct, flux in model.emissions:
+        rows_by_ss[ss].append((fct, flux, rng.choice(("Emission", "emission", "EMISSION"))))
+    for ss, fct, flux in model.consumptions:
+        rows_by_ss[ss].append((fct, flux, rng.choice(("Consumption", "consumption", "CONSUMPTION"))))
+
+    total = 0
+    for n, ss in enumerate(model.subsystems, 1):
+        rows = rows_by_ss[ss]
+        rng.shuffle(rows)
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Flows")
+        ws.append([f"{ss} — functional interface list"])
+        ws.append(["Generated by synthetic_model.py"])
+        ws.append([])
+        ws.append([None, "Function", "Flow", "Direction", "Comment"])
+        for fct, flux, direction in rows:
+            r = rng.random()
+            if r < params.invalid_rows / 2:
+                ws.append([None, fct, None, direction, "empty flow"])
+            elif r < params.invalid_rows:
+                ws.append([None, fct, flux, "Bidirectional", "unknown direction"])
+            ws.append([None, fct, flux, direction, ""])
+            total += 1
+        wb.save(folder / f"{ss}_OID{1000 + n}.xlsx")
+    return total
+
+
+def write_specs(model, params, folder):
+    """SPEC_<n>.docx covering the primary subsystem's functions. Returns the spec flow count."""
+    rng = random.Random(params.seed + 2)
+    folder.mkdir(parents=True, exist_ok=True)
+    flows_of = {}
+    for ss, fct, flux in model.emissions:
+        if ss == model.primary:
+            flows_of.setdefault(fct, []).append((flux, "Emission"))
+    for ss, fct, flux in model.consumptions:
+        if ss == model.primary:
+            flows_of.setdefault(fct, []).append((flux, "Consumption"))
+
+    fcts = sorted(flows_of)
+    n_specs = max(1, min(params.specs, len(fcts) or 1))
+    total = 0
+    for n in range(n_specs):
+        doc = Document()
+        doc.add_heading(f"Specification {n + 1} — {model.primary}", level=1)
+        for fct in fcts[n::n_specs]:
+            doc.add_paragraph(fct)
+            doc.add_paragraph("Description: generated function used for benchmarking.")
+
+            # Data-dictionary summary — the extractor must skip it
+            doc.add_paragraph(f"Effectivity of FA: SD_{model.primary}_SUMMARY")
+            summary = doc.add_table(rows=1, cols=2)
+            summary.rows[0].cells[0].text, summary.rows[0].cells[1].text = "Flow Title", "Direction"
+            for flux, direction in flows_of[fct][:3]:
+                cells = summary.add_row().cells
+                cells[0].text, cells[1].text = flux, direction
+
+            doc.add_paragraph(f"Effectivity of FA : {fct}")
+            table = doc.add_table(rows=1, cols=3)
+            for cell, text in zip(table.rows[0].cells, ("Flow Title", "Direction", "Description")):
+                cell.text = text
+            for flux, direction in flows_of[fct]:
+                if rng.random() < params.spec_missing:
+                    flux = flux.replace("Signal", "Sgnal")   # near miss → MISSING
+                cells = table.add_row().cells
+                cells[0].text, cells[1].text, cells[2].text = flux, direction, f"{direction} of {flux}"
+                total += 1
+        doc.save(folder / f"SPEC_{n + 1:03d}.docx")
+    return total
+
+
+def generate(params, data_dir):
+    """Write workbooks + specs under data_dir (the repo's data/ layout). Returns (model, sizes)."""
+    data_dir = Path(data_dir)
+    model = build_model(params)
+    sizes = {
+        "subsystems": len(model.subsystems),
+        "functions": sum(len(f) for f in model.functions.values()),
+        "links": len(model.emissions) + len(model.consumptions),
+        "workbook_rows": write_workbooks(model, params, data_dir / "input_excel"),
+        "spec_flows": write_specs(model, params, data_dir / "specs_docx"),
+    }
+    (data_dir / "output_diagrams").mkdir(parents=True, exist_ok=True)
+    return model, sizes
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate synthetic subsystem workbooks and .docx specs")
+    ap.add_argument("data_dir", type=Path, help="output folder (gets input_excel/, specs_docx/, output_diagrams/)")
+    defaults = ModelParams()
+    for name, value in asdict(defaults).items():
+        ap.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    args = ap.parse_args()
+    params = ModelParams(**{name: getattr(args, name) for name in asdict(defaults)})
+    model, sizes = generate(params, args.data_dir)
+    print(f"Primary subsystem {model.primary} | " + " | ".join(f"{k}: {v}" for k, v in sizes.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+# run_pipeline.py — ONE ENTRY POINT: INIT → EXCEL INGEST ∥ SPEC EXTRACTION → TRACEABILITY
+#
+# Runs the stages in one process as a small dependency graph:
+#
+#   init ──▶ ingest ──┐
+#                     ├──▶ traceability ──▶ diagrams (--diagrams)
+#   extraction ───────┘
+#
+#   init          schema.sql → empty database
+#   ingest        input_excel/*.xlsx → database (incremental, bulk)
+#   extraction    specs_docx/*.docx → spec DataFrame (+ Spec_translated.parquet)
+#   traceability  database + spec → FINAL_TRACEABILITY_REPORT.xlsx (batch decisions)
+#   diagrams      database + report → output_diagrams/diagrams/*.png (changed subgraphs only)
+#
+# Excel ingest and DOCX extraction are independent and run concurrently
+# (threads; each can also fan out to its own worker processes with --workers).
+# The extracted spec table is handed to the traceability stage as a DataFrame
+# instead of being re-read from Spec_translated.parquet.
+#
+# Every stage hashes its inputs (input files, the stage's own source code,
+# options) into a key stored in PIPELINE_STATE.json. A stage whose key is
+# unchanged, whose outputs still exist and whose upstream stages did not run
+# is skipped; a skipped stage's output is loaded from disk only when a
+# downstream stage needs it. Schema init DESTROYS the database (only the
+# recorded decisions are carried over), so it only runs on a changed
+# schema.sql, a database without tables, or --force init — an existing
+# database is adopted as is on the first pipeline run.
+#
+# All paths come from --data-dir (default: the repository's data/ folder), so
+# the pipeline runs from any working directory.
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+for folder in ("01-Mariadb-setup", "02-python-excel-parser", "03-python-doxTo-excel", "04-python-tracability"):
+    sys.path.insert(0, str(REPO_ROOT / folder))
+
+import pandas as pd  # noqa: E402
+
+from db_access import get_database  # noqa: E402
+from decisions_store import DecisionStore  # noqa: E402
+from diagram_generator import FORMATS, generate  # noqa: E402
+from docx_to_excel_mirror import extract_specs, save_outputs  # noqa: E402
+from extraction_cache import ExtractionCache, file_sha256  # noqa: E402
+from init_mariadb import SCHEMA_FILE, init_database  # noqa: E402
+from instrumentation import add_arguments, configure, count, log, timer  # noqa: E402
+from parser_excel_to_mariadb import ingest, print_report  # noqa: E402
+from report_writer import SIBLING_FORMATS  # noqa: E402
+from traceability_engine import OUTPUT_FILE, REVIEW_FILE, load_subsystems, primary_from_name, print_summary, run_trace  # noqa: E402
+
+STATE_NAME = "PIPELINE_STATE.json"
+
+
+@dataclass
+class Stage:
+    name: str
+    deps: tuple
+    key: Callable[[], Optional[str]]        # None → inputs cannot be judged, always run
+    run: Callable[[dict], object]           # upstream results → this stage's result
+    outputs: Callable[[], list] = list      # files that must exist for a skip
+    load: Optional[Callable[[], object]] = None   # result of a skipped stage, for its dependants
+    adopt: bool = False                     # first pipeline run: existing outputs count as up to date
+    trigger: Optional[Callable[[], Optional[str]]] = None   # reason to run whatever the key says
+    runs: bool = field(default=False, init=False)
+    reason: str = field(default="", init=False)
+
+
+def digest(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+
+def files_digest(paths):
+    return digest(*(f"{p.name}:{file_sha256(p)}" for p in sorted(paths)))
+
+
+def source_digest(folder):
+    """Hash of a stage folder's Python sources — a code change re-runs the stage."""
+    return files_digest((REPO_ROOT / folder).glob("*.py"))
+
+
+def database_ready(db):
+    """True when the pipeline's tables exist (a fresh MariaDB / SQLite file has none)."""
+    try:
+        with db.transaction() as conn:
+            db.cursor(conn).execute("SELECT COUNT(*) FROM IngestManifest")
+        return True
+    except Exception:
+        return False
+
+
+def decisions_digest(db):
+    """Recorded answers feed the traceability report: a new answer re-runs it."""
+    try:
+        with db.transaction() as conn:
+            store = DecisionStore(conn, db.cursor(conn)).load()
+    except Exception:
+        return None
+    return digest(*sorted(map(repr, store.decisions.items())))
+
+
+def load_state(path):
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    return {}
+
+
+def save_state(path, state):
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def build_stages(args, data_dir):
+    db = get_database()
+    excel_folder = data_dir / "input_excel"
+    specs_folder = data_dir / "specs_docx"
+    output_folder = data_dir / "output_diagrams"
+    spec_parquet = output_folder / "Spec_translated.parquet"
+
+    def init_key():
+        return digest(files_digest([SCHEMA_FILE]), db.backend, db.location)
+
+    def init_trigger():
+        return None if database_ready(db) else "database has no tables"
+
+    def run_init(_):
+        init_database(db)
+
+    def run_ingest(_):
+        # Incremental: only new/changed workbooks are parsed, deleted ones are purged
+        return ingest(excel_folder, bulk=True, parallel=args.workers, incremental=True)
+
+    def run_extraction(_):
+        cache = ExtractionCache(data_dir / "extraction_cache", args.engine)
+        df = extract_specs(sorted(specs_folder.glob("*.docx")), args.engine, args.workers, cache)
+        save_outputs(df, output_folder, excel=args.spec_excel)
+        return df
+
+    def traceability_key():
+        decisions = decisions_digest(db)
+        if decisions is None:   # no decision store yet: judged again after the run
+            return None
+        return digest(source_digest("04-python-tracability"), args.primary, args.suggest, sorted(args.siblings), decisions)
+
+    def run_traceability(results):
+        df_spec = results["extraction"]
+        with db.transaction() as conn:
+            cur = db.cursor(conn)
+            subsystems = load_subsystems(cur)
+            primary = primary_from_name(subsystems, args.primary)
+            if primary is None:
+                raise ValueError(f"unknown subsystem '{args.primary}' (found: {', '.join(subsystems)})")
+            store = DecisionStore(conn, cur).load()
+            df_final, pending = run_trace(cur, df_spec, primary, store, batch=True, suggest=args.suggest,
+                                          siblings=args.siblings, incremental=True, output_folder=output_folder)
+        return df_spec, df_final, primary, pending
+
+    def run_diagrams(results):
+        # The report just written is handed over; a skipped traceability stage's is read back
+        _, df_final, primary, _ = results.get("traceability", (None, None, args.primary, None))
+        return generate(db, output_folder / "diagrams", primary, df_final, output_folder / OUTPUT_FILE.name,
+                        fmt=args.diagrams, parallel=args.workers)
+
+    stages = [
+        Stage("init", (), init_key, run_init, adopt=True, trigger=init_trigger),
+        Stage("ingest", ("init",),
+              lambda: digest(files_digest(excel_folder.glob("*.xlsx")), source_digest("02-python-excel-parser")),
+              run_ingest),
+        Stage("extraction", (),
+              lambda: digest(files_digest(specs_folder.glob("*.docx")), source_digest("03-python-doxTo-excel"),
+                             args.engine),
+              run_extraction,
+              outputs=lambda: [spec_parquet],
+              load=lambda: pd.read_parquet(spec_parquet)),
+        Stage("traceability", ("ingest", "extraction"), traceability_key, run_traceability,
+              outputs=lambda: [output_folder / OUTPUT_FILE.name]),
+    ]
+    if args.diagrams:
+        stages.append(Stage("diagrams", ("traceability",),
+                            lambda: digest(source_digest("04-python-tracability"), args.primary, args.diagrams),
+                            run_diagrams,
+                            outputs=lambda: [output_folder / "diagrams" / f"INTER_SUBSYSTEM.{args.diagrams}"]))
+    return stages
+
+
+def plan(stages, state, force):
+    """Mark the stages to run (in dependency order). Returns {stage: key}."""
+    by_name = {s.name: s for s in stages}
+    keys = {}
+    for stage in stages:
+        keys[stage.name] = stage.key()
+        upstream = [d for d in stage.deps if by_name[d].runs]
+        if stage.name in force:
+            stage.reason = "forced"
+        elif stage.trigger and (why := stage.trigger()):
+            stage.reason = why
+        elif keys[stage.name] is None:
+            stage.reason = "no usable previous state"
+        elif upstream:
+            stage.reason = f"{', '.join(upstream)} runs"
+        elif stage.name not in state and stage.adopt:
+            state[stage.name] = {"key": keys[stage.name], "adopted": datetime.now().isoformat(timespec="seconds")}
+        elif state.get(stage.name, {}).get("key") != keys[stage.name]:
+            stage.reason = "inputs changed" if stage.name in state else "never ran"
+        elif any(not p.exists() for p in stage.outputs()):
+            stage.reason = "outputs missing"
+        stage.runs = bool(stage.reason)
+    return keys
+
+
+def execute(stages, keys, state, state_file):
+    """Run the planned stages, each as soon as its dependencies are done."""
+    by_name = {s.name: s for s in stages}
+    results, failed = {}, set()
+    needed = {d for s in stages if s.runs for d in s.deps}
+    for stage in stages:
+        if not stage.runs and stage.name in needed and stage.load:
+            results[stage.name] = stage.load()
+
+    pending = [s for s in stages if s.runs]
+    running = {}
+    with ThreadPoolExecutor(max_workers=len(stages)) as pool:
+        while pending or running:
+            for stage in list(pending):
+                if any(d in failed for d in stage.deps):
+                    log(f"⏭️  {stage.name}: not run — an upstream stage failed")
+                    failed.add(stage.name)
+                    pending.remove(stage)
+                elif all(not by_name[d].runs or d in results for d in stage.deps):
+                    log(f"▶️  {stage.name} ({stage.reason})")
+                    running[pool.submit(run_stage, stage, results)] = stage
+                    pending.remove(stage)
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    results[stage.name], seconds = future.result()
+                except Exception as e:
+                    failed.add(stage.name)
+                    print(f"❌ {stage.name} FAILED: {type(e).__name__}: {e}")
+                    continue
+                if keys[stage.name] is None:
+                    keys[stage.name] = stage.key()   # inputs unjudgeable before the run (fresh database)
+                state[stage.name] = {"key": keys[stage.name],
+                                     "finished": datetime.now().isoformat(timespec="seconds"),
+                                     "seconds": round(seconds, 3)}
+                save_state(state_file, state)
+                log(f"✅ {stage.name} done in {seconds:.1f}s")
+    return results, failed
+
+
+def run_stage(stage, results):
+    start = time.perf_counter()
+    with timer(f"pipeline/{stage.name}"):
+        result = stage.run(results)
+    count("stages_run")
+    return result, time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run init → Excel ingest ∥ spec extraction → traceability, skipping unchanged stages")
+    ap.add_argument("--primary", required=True, metavar="SUBSYSTEM", help="primary subsystem of the traceability report")
+    ap.add_argument("--data-dir", type=Path, default=REPO_ROOT / "data",
+                    help="folder with input_excel/, specs_docx/, output_diagrams/ (default: the repository's data/)")
+    ap.add_argument("--workers", type=int, nargs="?", const=0, default=None, metavar="N",
+                    help="let Excel ingest and extraction use N worker processes each (default: all cores)")
+    ap.add_argument("--engine", choices=["lxml", "python-docx"], default="lxml", help="DOCX extraction engine")
+    ap.add_argument("--spec-excel", action="store_true", help="also write Spec_translated.xlsx")
+    ap.add_argument("--suggest", action="store_true", help="near-miss flux suggestions for MISSING rows")
+    ap.add_argument("--siblings", nargs="+", choices=SIBLING_FORMATS, default=[], metavar="FORMAT",
+                    help="also write the report as csv and/or parquet")
+    ap.add_argument("--diagrams", nargs="?", const="png", choices=FORMATS, metavar="FORMAT",
+                    help="also render the flow diagrams (png, svg or pdf; default png)")
+    ap.add_argument("--force", nargs="*", metavar="STAGE",
+                    help="run the given stages (all when none given) even if their inputs are unchanged")
+    ap.add_argument("--dry-run", action="store_true", help="only show which stages would run and why")
+    add_arguments(ap)
+    args = ap.parse_args()
+    metrics = configure("pipeline", args)
+
+    data_dir = args.data_dir.resolve()
+    (data_dir / "output_diagrams").mkdir(parents=True, exist_ok=True)
+    state_file = data_dir / "output_diagrams" / STATE_NAME
+    stages = build_stages(args, data_dir)
+    names = [s.name for s in stages]
+    force = set(names if args.force == [] else args.force or [])
+    if force - set(names):
+        ap.error(f"unknown stage(s) {sorted(force - set(names))} — stages: {names}")
+
+    print("MBSE PIPELINE — " + " → ".join(names))
+    print(f"   Data      : {data_dir}")
+    print(f"   Database  : {get_database().backend} {get_database().location}")
+    state = load_state(state_file)
+    with timer("pipeline/plan"):
+        keys = plan(stages, state, force)
+    for stage in stages:
+        print(f"   {stage.name:16} {'RUN  — ' + stage.reason if stage.runs else 'skip — unchanged'}")
+    if args.dry_run:
+        return
+
+    results, failed = execute(stages, keys, state, state_file)
+
+    if "ingest" in results:
+        print_report(*results["ingest"])
+    if "traceability" in results:
+        df_spec, df_final, primary, pending = results["traceability"]
+        output_folder = data_dir / "output_diagrams"
+        print_summary(df_spec, df_final, primary, output_folder / OUTPUT_FILE.name, pending, output_folder / REVIEW_FILE.name)
+    print("\nPIPELINE " + ("FAILED: " + ", ".join(sorted(failed)) if failed else "COMPLETE"))
+    metrics.finish()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()